@@ -0,0 +1,105 @@
+"""
+Benchmark the columnar chart aggregations against the pandas controllers.
+
+Usage (from the repository root):
+
+    python benchmarks/bench_aggregations.py --rows 10000 100000 1000000
+
+`get_pie_df` and `get_line_df` write to the frame they are given, so they are
+timed on the copy the dashboard had to make for them; the copy is included
+in their time.
+"""
+
+import argparse
+import os
+import sys
+import time
+import warnings
+from functools import partial
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "src"))
+os.environ.setdefault("MONGO_URI", "mongodb://localhost:27017")
+
+from controllers import (
+    aggregate_bar,
+    aggregate_line,
+    aggregate_pie,
+    get_bar_df,
+    get_line_df,
+    get_pie_df,
+)
+
+
+def make_cards(num_rows: int, seed: int = 42) -> pd.DataFrame:
+    """
+    Synthetic cards: string timestamps over two years, a few thousand
+    concepts and list-valued types.
+    """
+    rng = np.random.default_rng(seed)
+    seconds = rng.integers(0, 2 * 365 * 86400, num_rows)
+    timestamps = pd.to_datetime(1_700_000_000 + seconds, unit="s")
+    types = [["Creature"], ["Instant"], ["Artifact", "Creature"], ["Sorcery"]]
+    return pd.DataFrame(
+        {
+            "_id": np.arange(num_rows).astype(str),
+            "concept": rng.integers(0, 5000, num_rows).astype(str),
+            "updatedAt": timestamps.strftime("%Y-%m-%d %H:%M:%S"),
+            "type": [types[i] for i in rng.integers(0, len(types), num_rows)],
+        }
+    )
+
+
+def best_of(func, repeat: int = 3) -> float:
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - started)
+    return min(timings)
+
+
+def main():
+    # get_line_df assigns to the column slice it is given
+    warnings.simplefilter("ignore", pd.errors.SettingWithCopyWarning)
+
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--rows", type=int, nargs="+", default=[10000, 100000])
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    cases = {
+        "pie": (
+            lambda df: get_pie_df(df.copy(), "type"),
+            lambda df: aggregate_pie(df, "type"),
+        ),
+        "line": (
+            lambda df: get_line_df(
+                df[["concept", "updatedAt"]], "concept", "updatedAt"
+            ),
+            lambda df: aggregate_line(df, "concept", "updatedAt"),
+        ),
+        "bar": (
+            lambda df: get_bar_df(df, "concept"),
+            lambda df: aggregate_bar(df, "concept"),
+        ),
+    }
+
+    print(f"{'chart':<8}{'rows':>10}{'pandas s':>12}{'columnar s':>12}{'speedup':>10}")
+    for num_rows in args.rows:
+        df = make_cards(num_rows)
+        for name, (baseline, columnar) in cases.items():
+            baseline_time = best_of(partial(baseline, df), args.repeat)
+            columnar_time = best_of(partial(columnar, df), args.repeat)
+            print(
+                f"{name:<8}{num_rows:>10}{baseline_time:>12.4f}{columnar_time:>12.4f}"
+                f"{baseline_time / columnar_time:>9.1f}x",
+                flush=True,
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,109 @@
+"""
+Guard the import time of the dashboard (`import main`) with a budget.
+
+Usage (from the repository root):
+
+    python benchmarks/bench_import.py
+    python benchmarks/bench_import.py --budget 1.0 --repeat 7 --top 20
+
+Every run imports `src/main.py` in a fresh interpreter with `-X importtime`
+and reports the median cumulative time, the slowest top-level packages and
+any heavy dependency (torch, transformers, scikit-learn, networkx, ...)
+loaded on the way. Those must only load when the stage needing them first
+runs, so the first KPIs of the page do not wait for them.
+
+Exits with code 1 when the median exceeds `--budget` seconds or when a heavy
+dependency is imported.
+"""
+
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+from collections import defaultdict
+from pathlib import Path
+
+SRC_DIR = Path(__file__).resolve().parents[1] / "src"
+HEAVY_MODULES = [
+    "torch",
+    "sentence_transformers",
+    "transformers",
+    "sklearn",
+    "networkx",
+    "plotly.express",
+]
+# Prints the heavy modules loaded by the import, one per line
+PROBE = (
+    "import sys, main; "
+    f"print('\\n'.join(m for m in {HEAVY_MODULES!r} if m in sys.modules))"
+)
+
+
+def import_once() -> tuple[float, dict, list]:
+    """
+    Import `main` in a fresh interpreter.
+
+    Returns:
+        seconds (float): Cumulative import time of `main`.
+        packages (dict): Self time of the imports, by top-level package.
+        heavy (list): Heavy modules loaded by the import.
+    """
+    env = {**os.environ, "MONGO_URI": os.environ.get("MONGO_URI", "mongodb://x")}
+    result = subprocess.run(  # noqa: S603
+        [sys.executable, "-X", "importtime", "-c", PROBE],
+        cwd=SRC_DIR,
+        env=env,
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+
+    seconds, packages = 0.0, defaultdict(float)
+    for line in result.stderr.splitlines():
+        # "import time:  self [us] | cumulative | imported package"
+        if not line.startswith("import time:") or "[us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:") :].split("|")
+        name = name.strip()
+        packages[name.split(".")[0]] += int(self_us) / 1e6
+        if name == "main":
+            seconds = int(cumulative_us) / 1e6
+    return seconds, dict(packages), result.stdout.split()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--budget", type=float, default=1.5, help="Seconds")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--top", type=int, default=10)
+    args = parser.parse_args()
+
+    runs = [import_once() for _ in range(args.repeat)]
+    seconds = statistics.median(run[0] for run in runs)
+    # Package times of the median run
+    _, packages, heavy = sorted(runs, key=lambda run: run[0])[len(runs) // 2]
+
+    print(
+        f"import main: {seconds:.3f}s (median of {args.repeat}, budget {args.budget}s)"
+    )
+    print(f"{'package':<28}{'self s':>10}")
+    for name, package_seconds in sorted(
+        packages.items(), key=lambda item: item[1], reverse=True
+    )[: args.top]:
+        print(f"{name:<28}{package_seconds:>10.3f}")
+
+    failed = False
+    if heavy:
+        print(f"Heavy modules loaded at import: {', '.join(heavy)}")
+        failed = True
+    if seconds > args.budget:
+        print(f"Over budget by {seconds - args.budget:.3f}s")
+        failed = True
+    if failed:
+        sys.exit(1)
+    print("Within budget.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,114 @@
+"""
+Benchmark the vectorized force layout against the networkx layouts.
+
+Usage (from the repository root):
+
+    python benchmarks/bench_layout.py --sizes 500 5000 50000
+
+The networkx layouts are skipped above their node caps, as
+`kamada_kawai_layout` needs O(n^2) memory (and hours at 5k nodes) and
+`spring_layout` O(n^2) time per iteration.
+"""
+
+import argparse
+import os
+import sys
+import time
+import tracemalloc
+from pathlib import Path
+
+import networkx as nx
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "src"))
+os.environ.setdefault("MONGO_URI", "mongodb://localhost:27017")
+
+from views.layout import force_layout
+
+
+def make_graph(num_nodes: int, seed: int = 42) -> nx.Graph:
+    """
+    Clustered graph resembling a concept similarity graph: dense communities
+    of ~50 concepts with a few edges between them.
+    """
+    num_communities = max(1, num_nodes // 50)
+    sizes = [num_nodes // num_communities] * num_communities
+    sizes[-1] += num_nodes - sum(sizes)
+    return nx.random_partition_graph(sizes, 0.1, 1 / num_nodes, seed=seed)
+
+
+def edge_length_ratio(G: nx.Graph, pos: dict, seed: int = 42) -> float:
+    """
+    Mean edge length divided by the mean distance of random node pairs.
+    Lower means connected nodes are drawn closer together.
+    """
+    nodes = list(G.nodes())
+    coords = np.array([pos[node] for node in nodes])
+    index = {node: i for i, node in enumerate(nodes)}
+    edges = np.array([(index[u], index[v]) for u, v in G.edges()])
+    pairs = np.random.default_rng(seed).integers(0, len(nodes), (10000, 2))
+
+    def mean_length(p):
+        return np.linalg.norm(coords[p[:, 0]] - coords[p[:, 1]], axis=1).mean()
+
+    return float(mean_length(edges) / mean_length(pairs))
+
+
+def run(name: str, layout, G: nx.Graph) -> dict:
+    tracemalloc.start()
+    started = time.perf_counter()
+    pos = layout(G)
+    elapsed = time.perf_counter() - started
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return {
+        "layout": name,
+        "nodes": G.number_of_nodes(),
+        "edges": G.number_of_edges(),
+        "seconds": elapsed,
+        "peak_mb": peak / 2**20,
+        "edge_ratio": edge_length_ratio(G, pos),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[500, 5000, 50000])
+    parser.add_argument("--iterations", type=int, default=50)
+    parser.add_argument("--max-spring-nodes", type=int, default=5000)
+    parser.add_argument("--max-kamada-kawai-nodes", type=int, default=2000)
+    args = parser.parse_args()
+
+    caps = {
+        "nx.spring_layout": args.max_spring_nodes,
+        "nx.kamada_kawai_layout": args.max_kamada_kawai_nodes,
+    }
+    layouts = {
+        "force_layout": lambda G: force_layout(G, iterations=args.iterations),
+        "nx.spring_layout": lambda G: nx.spring_layout(
+            G, iterations=args.iterations, seed=42
+        ),
+        "nx.kamada_kawai_layout": nx.kamada_kawai_layout,
+    }
+
+    print(
+        f"{'layout':<24}{'nodes':>8}{'edges':>9}{'seconds':>10}"
+        f"{'peak MB':>10}{'edge ratio':>12}"
+    )
+    for size in args.sizes:
+        G = make_graph(size)
+        for name, layout in layouts.items():
+            if size > caps.get(name, size):
+                print(f"{name:<24}{size:>8}{'skipped':>9}")
+                continue
+            result = run(name, layout, G)
+            print(
+                f"{result['layout']:<24}{result['nodes']:>8}{result['edges']:>9}"
+                f"{result['seconds']:>10.2f}{result['peak_mb']:>10.1f}"
+                f"{result['edge_ratio']:>12.3f}",
+                flush=True,
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,353 @@
+"""
+Benchmark the dashboard pipeline stages on synthetic kengrams.
+
+Usage (from the repository root):
+
+    # Time and memory-profile every stage, print and save the results
+    python benchmarks/bench_pipeline.py run --sizes 1000 10000 --output results.json
+
+    # Record the results as the baselines (benchmarks/baselines.json)
+    python benchmarks/bench_pipeline.py run --sizes 1000 10000 100000 --save-baseline
+
+    # Flag the stages slower or hungrier than their baseline (exit code 1)
+    python benchmarks/bench_pipeline.py compare results.json
+    python benchmarks/bench_pipeline.py run --sizes 1000 10000 --compare
+
+Each stage is timed cold (best of `--repeat` after a warm-up call, with the
+dashboard caches cleared before every call) and its peak Python allocation
+is measured with `tracemalloc` in a separate call. Mongo is replaced by the cards from
+`synthetic.make_kengrams`, split over the two databases.
+
+`build_similarity_graph` needs the NLP dependencies (torch and
+sentence-transformers); it is skipped when they are not installed and above
+`--max-similarity-concepts` concepts, as it compares every pair of concepts
+in Python.
+"""
+
+import argparse
+import importlib.util
+import inspect
+import json
+import logging
+import os
+import platform
+import shutil
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime, timezone
+from pathlib import Path
+
+import networkx as nx
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "src"))
+os.environ.setdefault("MONGO_URI", "mongodb://localhost:27017")
+# Keep the dashboard's disk caches away from the real ones
+os.environ["CACHE_DIR"] = tempfile.mkdtemp(prefix="bench-cache-")
+# Every size is pulled from its fake Mongo, not served from a card snapshot
+os.environ["CARDS_SNAPSHOT"] = "0"
+
+from synthetic import make_embeddings, make_kengrams, make_sentiments
+
+import controllers.functions
+from controllers import count_card_names, dedup_cards, get_cards_df
+from utils.cache import memory_cache
+from views import make_sentiment_over_time, visualize_graph
+from views.cache import figure_cache
+
+CACHE_DIR = os.environ["CACHE_DIR"]
+# Streamlit warns about the missing session on every element drawn by a stage
+logging.getLogger("streamlit.runtime.scriptrunner_utils.script_run_context").addFilter(
+    lambda record: False
+)
+BASELINE_PATH = Path(__file__).with_name("baselines.json")
+STAGES = [
+    "get_cards_df",
+    "dedup_cards",
+    "count_card_names",
+    "build_similarity_graph",
+    "visualize_graph",
+    "make_sentiment_over_time",
+]
+
+
+def reset_caches() -> None:
+    """
+    Clear the in-memory and on-disk caches of the dashboard.
+    """
+    figure_cache.clear()
+    visualize_graph.clear()
+    # The stage results, dedup mappings, layouts and communities
+    memory_cache.clear()
+    shutil.rmtree(CACHE_DIR, ignore_errors=True)
+    os.makedirs(CACHE_DIR, exist_ok=True)
+
+
+def similarity_graph(num_concepts: int, seed: int = 42) -> nx.Graph:
+    """
+    Stand-in for the concept similarity graph: communities of ~50 concepts
+    with a few edges between them.
+    """
+    num_communities = max(1, num_concepts // 50)
+    sizes = [num_concepts // num_communities] * num_communities
+    sizes[-1] += num_concepts - sum(sizes)
+    G = nx.random_partition_graph(sizes, 0.1, 1 / num_concepts, seed=seed)
+    rng = np.random.default_rng(seed)
+    for u, v in G.edges():
+        G.edges[u, v]["weight"] = float(rng.uniform(0.5, 1.0))
+    return G
+
+
+class Pipeline:
+    """
+    The inputs of every stage for one dataset size, each built once.
+    """
+
+    def __init__(self, num_cards: int, seed: int = 42):
+        self.num_cards = num_cards
+        self.seed = seed
+        raw = make_kengrams(num_cards, seed)
+        half = num_cards // 2
+        self.collections = {
+            "ragDB": raw.iloc[:half].reset_index(drop=True),
+            "nerDB": raw.iloc[half:].reset_index(drop=True),
+        }
+        controllers.functions.get_mongo_cards = self.get_mongo_cards
+        self._cards = None
+        self._deduped = None
+
+    def get_mongo_cards(self, db: str, target_collection: str):
+        return self.collections[db]
+
+    @property
+    def cards(self):
+        if self._cards is None:
+            self._cards = get_cards_df()
+        return self._cards
+
+    @property
+    def deduped(self):
+        if self._deduped is None:
+            self._deduped, _ = dedup_cards(self.cards.copy())
+            reset_caches()
+        return self._deduped
+
+    @property
+    def concepts(self) -> list:
+        return sorted(set(self.deduped["concept"].dropna().tolist()))
+
+    def stage(self, name: str, max_similarity_concepts: int):
+        """
+        A callable running stage `name`, or the reason it is skipped.
+        """
+        if name == "get_cards_df":
+            return get_cards_df
+        if name == "dedup_cards":
+            cards = self.cards.copy()
+            return lambda: dedup_cards(cards)
+        if name == "count_card_names":
+            deduped = self.deduped
+            return lambda: count_card_names(deduped, "concept")
+        if name == "build_similarity_graph":
+            concepts = self.concepts
+            if len(concepts) > max_similarity_concepts:
+                return f"{len(concepts)} concepts > {max_similarity_concepts}"
+            # controllers.nlp imports them when the stage runs
+            for module in ("torch", "sentence_transformers"):
+                if importlib.util.find_spec(module) is None:
+                    return f"NLP dependencies missing ({module})"
+            from controllers.nlp import build_similarity_graph
+
+            embeddings = make_embeddings(len(concepts), seed=self.seed)
+            version = f"bench-{self.num_cards}"
+            # The stage itself, below the tracing, single-flight and caching
+            # decorators, so that every repeat builds the graph
+            stage = inspect.unwrap(build_similarity_graph)
+            return lambda: stage(concepts, embeddings, 0.5, 10000, version=version)
+        if name == "visualize_graph":
+            concepts = self.concepts
+            G = similarity_graph(len(concepts), seed=self.seed)
+            return lambda: visualize_graph(G, concepts)
+        if name == "make_sentiment_over_time":
+            timestamps = self.deduped[["createdAt"]]
+            sentiments = make_sentiments(len(timestamps), seed=self.seed)
+            return lambda: make_sentiment_over_time(
+                df=timestamps, sentiments=sentiments
+            )
+        raise ValueError(f"Unknown stage: {name}")
+
+
+def measure(func, repeat: int) -> dict:
+    """
+    Best cold wall time and peak traced allocation of `func`.
+
+    A first untimed call warms up the lazy imports and initializations of
+    the libraries, which would otherwise count against the smallest size.
+    """
+    reset_caches()
+    func()
+
+    timings = []
+    for _ in range(repeat):
+        reset_caches()
+        started = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - started)
+
+    reset_caches()
+    tracemalloc.start()
+    func()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return {"seconds": round(min(timings), 5), "peak_mb": round(peak / 2**20, 2)}
+
+
+def machine() -> dict:
+    return {
+        "platform": platform.platform(),
+        "processor": platform.processor() or platform.machine(),
+        "cpus": os.cpu_count(),
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+    }
+
+
+def run(args) -> dict:
+    results = {}
+    print(f"{'stage':<26}{'cards':>10}{'seconds':>12}{'peak MB':>10}")
+    for num_cards in args.sizes:
+        pipeline = Pipeline(num_cards, args.seed)
+        for name in args.stages:
+            func = pipeline.stage(name, args.max_similarity_concepts)
+            if isinstance(func, str):
+                results.setdefault(name, {})[str(num_cards)] = {"skipped": func}
+                print(f"{name:<26}{num_cards:>10}  skipped: {func}", flush=True)
+                continue
+            result = measure(func, args.repeat)
+            results.setdefault(name, {})[str(num_cards)] = result
+            print(
+                f"{name:<26}{num_cards:>10}{result['seconds']:>12.4f}"
+                f"{result['peak_mb']:>10.1f}",
+                flush=True,
+            )
+    return {
+        "created": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "machine": machine(),
+        "seed": args.seed,
+        "results": results,
+    }
+
+
+def compare(
+    current: dict,
+    baseline: dict,
+    tolerance: float,
+    memory_tolerance: float,
+    min_seconds: float,
+) -> list:
+    """
+    Print the current results against the baseline and return the
+    regressions.
+
+    A stage regresses when it is more than `tolerance` slower (and at least
+    `min_seconds` slower, to ignore timer noise) or allocates more than
+    `memory_tolerance` more at its peak.
+    """
+    regressions = []
+    print(
+        f"{'stage':<26}{'cards':>10}{'base s':>10}{'new s':>10}{'ratio':>8}"
+        f"{'base MB':>10}{'new MB':>10}"
+    )
+    for name, sizes in current["results"].items():
+        for size, result in sizes.items():
+            base = baseline["results"].get(name, {}).get(size)
+            if base is None or "skipped" in base or "skipped" in result:
+                continue
+            ratio = result["seconds"] / max(base["seconds"], 1e-9)
+            slower = (
+                ratio > 1 + tolerance
+                and result["seconds"] - base["seconds"] > min_seconds
+            )
+            hungrier = result["peak_mb"] > base["peak_mb"] * (1 + memory_tolerance)
+            flags = ("  SLOWER" if slower else "") + (
+                "  MORE MEMORY" if hungrier else ""
+            )
+            print(
+                f"{name:<26}{size:>10}{base['seconds']:>10.4f}{result['seconds']:>10.4f}"
+                f"{ratio:>7.2f}x{base['peak_mb']:>10.1f}{result['peak_mb']:>10.1f}{flags}"
+            )
+            if flags:
+                regressions.append((name, size, flags.strip()))
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    run_parser = commands.add_parser("run", help="Benchmark the stages")
+    run_parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 10000])
+    run_parser.add_argument("--stages", nargs="+", default=STAGES, choices=STAGES)
+    run_parser.add_argument("--repeat", type=int, default=3)
+    run_parser.add_argument("--seed", type=int, default=42)
+    run_parser.add_argument("--max-similarity-concepts", type=int, default=3000)
+    run_parser.add_argument("--output", type=Path, help="Write the results here")
+    run_parser.add_argument(
+        "--save-baseline",
+        action="store_true",
+        help="Merge the results into the baselines",
+    )
+    run_parser.add_argument(
+        "--compare", action="store_true", help="Compare the results with the baselines"
+    )
+
+    compare_parser = commands.add_parser("compare", help="Flag regressions")
+    compare_parser.add_argument("results", type=Path)
+
+    for command in (run_parser, compare_parser):
+        command.add_argument("--baseline", type=Path, default=BASELINE_PATH)
+        command.add_argument("--tolerance", type=float, default=0.25)
+        command.add_argument("--memory-tolerance", type=float, default=0.10)
+        command.add_argument("--min-seconds", type=float, default=0.025)
+    args = parser.parse_args()
+
+    if args.command == "run":
+        current = run(args)
+        if args.output:
+            args.output.write_text(json.dumps(current, indent=2))
+        if args.save_baseline:
+            baseline = (
+                json.loads(args.baseline.read_text())
+                if args.baseline.exists()
+                else {"results": {}}
+            )
+            for name, sizes in current["results"].items():
+                baseline["results"].setdefault(name, {}).update(sizes)
+            baseline.update(
+                {key: current[key] for key in ("created", "machine", "seed")}
+            )
+            args.baseline.write_text(json.dumps(baseline, indent=2) + "\n")
+            print(f"Baselines saved to {args.baseline}")
+        if not args.compare:
+            return
+    else:
+        current = json.loads(args.results.read_text())
+
+    baseline = json.loads(args.baseline.read_text())
+    if baseline.get("machine") != current.get("machine"):
+        print("Warning: the baselines were recorded on another machine.")
+    regressions = compare(
+        current, baseline, args.tolerance, args.memory_tolerance, args.min_seconds
+    )
+    if regressions:
+        print(f"{len(regressions)} regression(s):")
+        for name, size, flags in regressions:
+            print(f"  {name} at {size} cards: {flags}")
+        sys.exit(1)
+    print("No regressions.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,283 @@
+"""
+Concurrent-session load test of the Streamlit dashboard.
+
+Usage (from the repository root):
+
+    python benchmarks/load.py --sessions 20 --cards 10000
+    python benchmarks/load.py --sessions 5 --sections Overview "Raw Data" \\
+        --output load.json
+
+Every session is a headless `AppTest` of `src/main.py` running in its own
+thread of this process, so the sessions share the Streamlit caches and the
+job runner exactly as the sessions of one server replica do. Mongo is
+replaced by an in-memory stand-in serving `synthetic.make_kengrams` cards.
+
+Each session loads the page, then opens every section in turn. For each
+section the harness records the latency of the first rerun and of the rerun
+that completes it (background NLP jobs keep a section in progress across
+reruns, which are repeated every `JOB_POLL_INTERVAL`). It samples the CPU
+use and resident memory of the process meanwhile and reports latency
+percentiles per section, the peak RSS and the CPU saturation.
+"""
+
+import argparse
+import json
+import os
+import resource
+import sys
+import tempfile
+import threading
+import time
+from pathlib import Path
+from unittest.mock import MagicMock
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "src"))
+os.environ.setdefault("MONGO_URI", "mongodb://localhost:27017")
+# Keep the dashboard's disk caches away from the real ones
+os.environ.setdefault("CACHE_DIR", tempfile.mkdtemp(prefix="load-cache-"))
+
+from streamlit.runtime import Runtime
+from streamlit.runtime.caching.storage.dummy_cache_storage import (
+    MemoryCacheStorageManager,
+)
+from streamlit.runtime.media_file_manager import MediaFileManager
+from streamlit.runtime.memory_media_file_storage import MemoryMediaFileStorage
+from streamlit.testing.v1 import AppTest
+from synthetic import make_kengrams
+
+import models.mongo
+from utils import constants
+
+APP_PATH = Path(__file__).resolve().parents[1] / "src" / "main.py"
+PERCENTILES = [50, 90, 95, 99]
+
+
+class FakeCollection:
+    """
+    Collection answering the dashboard's aggregation with stored documents.
+    """
+
+    def __init__(self, documents: list):
+        self.documents = documents
+
+    def aggregate(self, pipeline: list):
+        if pipeline != [{"$match": {}}]:
+            raise NotImplementedError(f"Unsupported pipeline: {pipeline}")
+        return iter(self.documents)
+
+
+class FakeMongoClient:
+    """
+    In-memory stand-in for `pymongo.MongoClient`: `client[db][collection]`.
+    """
+
+    def __init__(self, databases: dict):
+        self.databases = databases
+
+    def __getitem__(self, db: str) -> dict:
+        return self.databases[db]
+
+    def close(self):
+        pass
+
+
+def install_fake_mongo(num_cards: int, seed: int = 42) -> None:
+    """
+    Serve synthetic kengrams, split over the two databases, to the dashboard.
+    """
+    raw = make_kengrams(num_cards, seed)
+    half = num_cards // 2
+    databases = {
+        "ragDB": {"kengrams": FakeCollection(raw.iloc[:half].to_dict("records"))},
+        "nerDB": {"kengrams": FakeCollection(raw.iloc[half:].to_dict("records"))},
+    }
+    models.mongo.MongoDBClient._instance = None
+    models.mongo.MongoClient = lambda connection_url: FakeMongoClient(databases)
+
+
+def share_runtime() -> None:
+    """
+    Keep one mock Streamlit runtime for the concurrent sessions.
+
+    Every `AppTest.run` installs its own mock `Runtime` singleton and removes
+    it when done, which breaks the other sessions still running. Fall back to
+    a shared one whenever no run has installed its own.
+
+    This patches private internals of Streamlit's testing (checked against
+    streamlit 1.41.1): `AppTest.run` setting and clearing `Runtime._instance`,
+    and the elements reaching the runtime through `Runtime.instance()` and
+    `Runtime.exists()`. `tests/test_load.py` runs two sessions to catch a
+    Streamlit upgrade breaking it.
+    """
+    shared = MagicMock(spec=Runtime)
+    shared.media_file_mgr = MediaFileManager(MemoryMediaFileStorage("/mock/media"))
+    shared.cache_storage_manager = MemoryCacheStorageManager()
+    Runtime.instance = classmethod(lambda cls: cls._instance or shared)
+    Runtime.exists = classmethod(lambda cls: True)
+
+
+class ResourceSampler(threading.Thread):
+    """
+    Samples the CPU use (share of all cores) and RSS of this process.
+    """
+
+    def __init__(self, interval: float = 0.5):
+        super().__init__(daemon=True)
+        self.interval = interval
+        self.cpu = []
+        self.rss_mb = []
+        self._stopped = threading.Event()
+
+    def run(self):
+        page_size = os.sysconf("SC_PAGE_SIZE")
+        last_wall, last_cpu = time.perf_counter(), time.process_time()
+        while not self._stopped.wait(self.interval):
+            wall, cpu = time.perf_counter(), time.process_time()
+            self.cpu.append((cpu - last_cpu) / ((wall - last_wall) * os.cpu_count()))
+            last_wall, last_cpu = wall, cpu
+            try:
+                with open("/proc/self/statm") as statm:
+                    self.rss_mb.append(int(statm.read().split()[1]) * page_size / 2**20)
+            except OSError:
+                pass
+
+    def stop(self):
+        self._stopped.set()
+        self.join()
+
+
+def in_progress(at: AppTest) -> bool:
+    """
+    Whether a background job of the section is still running.
+    """
+    return len(at.get("progress")) > 0
+
+
+def run_session(
+    index: int,
+    sections: list,
+    timeout: float,
+    latencies: dict,
+    errors: list,
+    lock: threading.Lock,
+) -> None:
+    """
+    One user: load the page, then open every section until it is complete.
+    """
+
+    def record(section, kind, seconds):
+        with lock:
+            latencies.setdefault(section, {}).setdefault(kind, []).append(seconds)
+
+    try:
+        at = AppTest.from_file(str(APP_PATH), default_timeout=timeout)
+        started = time.perf_counter()
+        at.run()
+        record("(page load)", "first", time.perf_counter() - started)
+        record("(page load)", "complete", time.perf_counter() - started)
+
+        for section in sections or at.radio[0].options:
+            started = time.perf_counter()
+            at.radio[0].set_value(section).run()
+            record(section, "first", time.perf_counter() - started)
+            deadline = started + timeout
+            while in_progress(at) and time.perf_counter() < deadline:
+                time.sleep(constants.JOB_POLL_INTERVAL)
+                at.run()
+            record(section, "complete", time.perf_counter() - started)
+            for element in list(at.exception) + list(at.error):
+                with lock:
+                    errors.append((index, section, str(element.value)[:200]))
+    except Exception as e:
+        with lock:
+            errors.append((index, "(session)", repr(e)[:200]))
+
+
+def percentiles(values: list) -> dict:
+    values = np.asarray(values)
+    summary = {f"p{p}": float(np.percentile(values, p)) for p in PERCENTILES}
+    summary["max"] = float(values.max())
+    summary["count"] = len(values)
+    return summary
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--sessions", type=int, default=20)
+    parser.add_argument("--cards", type=int, default=10000)
+    parser.add_argument("--sections", nargs="+", help="Defaults to every section")
+    parser.add_argument(
+        "--ramp", type=float, default=0.0, help="Seconds between session starts"
+    )
+    parser.add_argument("--timeout", type=float, default=600.0)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--output", type=Path, help="Write the report here")
+    args = parser.parse_args()
+
+    install_fake_mongo(args.cards, args.seed)
+    share_runtime()
+
+    latencies, errors, lock = {}, [], threading.Lock()
+    sampler = ResourceSampler()
+    sampler.start()
+    started = time.perf_counter()
+    threads = []
+    for index in range(args.sessions):
+        thread = threading.Thread(
+            target=run_session,
+            args=(index, args.sections, args.timeout, latencies, errors, lock),
+            name=f"session-{index}",
+        )
+        thread.start()
+        threads.append(thread)
+        time.sleep(args.ramp)
+    for thread in threads:
+        thread.join()
+    duration = time.perf_counter() - started
+    sampler.stop()
+
+    cpu = np.asarray(sampler.cpu or [0.0])
+    report = {
+        "sessions": args.sessions,
+        "cards": args.cards,
+        "duration_s": duration,
+        "latency_s": {
+            section: {kind: percentiles(values) for kind, values in kinds.items()}
+            for section, kinds in latencies.items()
+        },
+        # ru_maxrss is in kilobytes on Linux
+        "peak_rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+        "cpu": {
+            "cores": os.cpu_count(),
+            "mean_utilization": float(cpu.mean()),
+            "max_utilization": float(cpu.max()),
+            "saturated_share": float((cpu > 0.9).mean()),
+        },
+        "errors": errors,
+    }
+
+    print(f"{args.sessions} sessions on {args.cards} cards in {duration:.1f}s")
+    header = "".join(f"{f'p{p}':>9}" for p in PERCENTILES)
+    print(f"{'section':<22}{'rerun':<10}{header}{'max':>9}")
+    for section, kinds in report["latency_s"].items():
+        for kind, summary in kinds.items():
+            values = "".join(f"{summary[f'p{p}']:>9.3f}" for p in PERCENTILES)
+            print(f"{section:<22}{kind:<10}{values}{summary['max']:>9.3f}")
+    print(f"Peak RSS: {report['peak_rss_mb']:.0f} MB")
+    print(
+        f"CPU ({report['cpu']['cores']} cores): "
+        f"{report['cpu']['mean_utilization']:.0%} mean, "
+        f"{report['cpu']['max_utilization']:.0%} max, "
+        f"saturated {report['cpu']['saturated_share']:.0%} of the time"
+    )
+    if errors:
+        print(f"{len(errors)} error(s), first: {errors[0]}")
+
+    if args.output:
+        args.output.write_text(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
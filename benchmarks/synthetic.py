@@ -0,0 +1,218 @@
+"""
+Seeded generator of synthetic kengrams, shaped like the documents returned by
+`models.get_mongo_cards` for the `kengrams` collection.
+
+The distributions follow the real data closely enough for benchmarks:
+
+- concept names are reused with a Zipf distribution over a vocabulary that
+  grows sublinearly with the number of cards, and a few percent are spelled
+  differently (case, punctuation, typos) so that deduplication has work;
+- `type` is a list of one or two card types, `colors` mixes color names,
+  guild names, single letters and blanks as the raw collection does;
+- flavor texts are drawn from a smaller pool of templated sentences, most
+  texts being shared by several cards;
+- `createdAt` grows over two years with more recent cards, `updatedAt`
+  follows it by an exponential delay; both are epoch milliseconds.
+
+Usage:
+
+    from synthetic import make_kengrams
+    raw = make_kengrams(100_000, seed=42)
+"""
+
+import numpy as np
+import pandas as pd
+
+ADJECTIVES = [
+    "Ancient", "Burning", "Silent", "Hollow", "Gilded", "Feral", "Arcane",
+    "Shattered", "Verdant", "Grim", "Radiant", "Sunken", "Restless", "Crimson",
+    "Frozen", "Wandering", "Hidden", "Iron", "Storm", "Dread",
+]  # fmt: skip
+NOUNS = [
+    "Dragon", "Sculptor", "Oracle", "Wurm", "Lantern", "Archive", "Tide",
+    "Colossus", "Warden", "Familiar", "Spire", "Harbinger", "Wisp", "Golem",
+    "Pact", "Covenant", "Mirror", "Engine", "Sentinel", "Bloom",
+]  # fmt: skip
+TYPES = ["Creature", "Instant", "Sorcery", "Artifact", "Enchantment", "Land"]
+TYPE_WEIGHTS = [0.4, 0.15, 0.15, 0.12, 0.12, 0.06]
+RAW_COLORS = [
+    "White", "Blue", "Black", "Red", "Green", "white", " blue ", "R", "G", "U",
+    "Azorius", "Izzet", "Golgari", "Esper", "Jund", "Colorless", "",
+]  # fmt: skip
+FLAVOR_OPENINGS = [
+    "Every answer", "The network", "A single spark", "What was forgotten",
+    "The oldest idea", "No thought", "Each connection", "The last signal",
+]  # fmt: skip
+FLAVOR_VERBS = [
+    "remembers", "outgrows", "betrays", "illuminates", "devours", "protects",
+    "questions", "rewrites",
+]  # fmt: skip
+FLAVOR_ENDINGS = [
+    "the mind that made it.", "everything it touches.", "the silence between us.",
+    "a brighter tomorrow.", "the fear of the unknown.", "its own reflection.",
+    "the hope we lost.", "the truth, eventually.",
+]  # fmt: skip
+START_MS = 1_700_000_000_000
+SPAN_MS = 2 * 365 * 86_400_000
+
+
+SYLLABLES = [
+    "ka", "vor", "thi", "mel", "dra", "os", "quen", "ril", "zan", "bel", "tor",
+    "ul", "ves", "nix", "ara", "gol", "phe", "sy", "lum", "crae", "dor", "evi",
+    "jha", "mok", "pra", "sel", "tua", "wyn", "xal", "yor",
+]  # fmt: skip
+
+
+def concept_vocabulary(size: int, rng: np.random.Generator) -> np.ndarray:
+    """
+    `size` distinct concept names such as "Ancient Dragon" or, past those,
+    invented ones such as "Velnix Oracle".
+    """
+    names = [f"{adjective} {noun}" for adjective in ADJECTIVES for noun in NOUNS]
+    names = list(rng.permutation(np.array(names, dtype=object)))
+    seen = set(names)
+    while len(names) < size:
+        # Invented words of two to four syllables
+        lengths = rng.integers(2, 5, size)
+        syllables = rng.integers(0, len(SYLLABLES), (size, 4))
+        nouns = rng.integers(0, len(NOUNS), size)
+        for length, word, noun in zip(lengths, syllables, nouns, strict=True):
+            name = "".join(SYLLABLES[i] for i in word[:length]).title()
+            name = f"{name} {NOUNS[noun]}"
+            if name not in seen:
+                seen.add(name)
+                names.append(name)
+    return np.array(names[:size], dtype=object)
+
+
+def misspell(names: np.ndarray, rng: np.random.Generator) -> np.ndarray:
+    """
+    Variants of concept names as they show up in the raw data.
+    """
+    variants = []
+    for name, kind in zip(names, rng.integers(0, 4, len(names)), strict=True):
+        if kind == 0:
+            variants.append(name.lower())
+        elif kind == 1:
+            variants.append(f"{name}!")
+        elif kind == 2 and len(name) > 4:
+            i = int(rng.integers(1, len(name) - 1))
+            variants.append(name[:i] + name[i + 1 :])
+        else:
+            variants.append(f"The {name}")
+    return np.array(variants, dtype=object)
+
+
+def make_kengrams(
+    num_cards: int, seed: int = 42, misspelled: float = 0.05
+) -> pd.DataFrame:
+    """
+    Synthetic raw kengram documents.
+
+    Args:
+        num_cards (int): Number of cards.
+        seed (int): Random seed; the same seed gives the same cards.
+        misspelled (float): Share of cards whose concept name is a variant.
+
+    Returns:
+        pd.DataFrame: Columns `_id`, `name`, `type`, `colors`, `flavorText`,
+        `retrievalCount`, `chatId`, `createdAt` and `updatedAt`.
+    """
+
+    rng = np.random.default_rng(seed)
+
+    # Concept names: Zipf reuse of a vocabulary growing as n^0.8, the
+    # ranks beyond the vocabulary spread uniformly over it
+    vocabulary = concept_vocabulary(max(50, int(num_cards**0.8)), rng)
+    ranks = rng.zipf(1.1, num_cards) - 1
+    beyond = ranks >= len(vocabulary)
+    ranks[beyond] = rng.integers(0, len(vocabulary), beyond.sum())
+    names = vocabulary[ranks]
+    variants = rng.random(num_cards) < misspelled
+    names[variants] = misspell(names[variants], rng)
+
+    # One or two types per card
+    first = rng.choice(len(TYPES), num_cards, p=TYPE_WEIGHTS)
+    second = rng.choice(len(TYPES), num_cards, p=TYPE_WEIGHTS)
+    dual = (rng.random(num_cards) < 0.15) & (first != second)
+    type_lists = {
+        (a, b): [TYPES[a], TYPES[b]] if a != b else [TYPES[a]]
+        for a in range(len(TYPES))
+        for b in range(len(TYPES))
+    }
+    types = [
+        type_lists[a, b if d else a]
+        for a, b, d in zip(first, second, dual, strict=True)
+    ]
+
+    # Raw colors: mostly one value, some lists and some missing
+    raw_colors = np.array(RAW_COLORS, dtype=object)
+    colors = raw_colors[rng.integers(0, len(raw_colors), num_cards)].tolist()
+    multi = np.flatnonzero(rng.random(num_cards) < 0.1)
+    for i, pair in zip(multi, rng.integers(0, 5, (len(multi), 2)), strict=True):
+        colors[i] = [RAW_COLORS[pair[0]], RAW_COLORS[pair[1]]]
+    for i in np.flatnonzero(rng.random(num_cards) < 0.02):
+        colors[i] = None
+
+    # Flavor texts: a pool of templated sentences, reused by several cards,
+    # with occasional trailing variations
+    pool_size = max(20, num_cards // 8)
+    parts = [
+        rng.integers(0, len(words), pool_size)
+        for words in (FLAVOR_OPENINGS, FLAVOR_VERBS, FLAVOR_ENDINGS)
+    ]
+    pool = np.array(
+        [
+            f"{FLAVOR_OPENINGS[a]} {FLAVOR_VERBS[b]} {FLAVOR_ENDINGS[c]}"
+            + ("" if i < len(FLAVOR_OPENINGS) * 8 else f" ({i})")
+            for i, (a, b, c) in enumerate(zip(*parts, strict=True))
+        ],
+        dtype=object,
+    )
+    flavor = pool[rng.integers(0, pool_size, num_cards)]
+    flavor[rng.random(num_cards) < 0.03] = None
+
+    # Timestamps: growing activity (density ~ t) over two years
+    created = START_MS + (np.sqrt(rng.random(num_cards)) * SPAN_MS).astype(np.int64)
+    updated = created + rng.exponential(3 * 86_400_000, num_cards).astype(np.int64)
+
+    return pd.DataFrame(
+        {
+            "_id": [f"{i:024x}" for i in rng.permutation(num_cards) + seed * 10**9],
+            "name": names,
+            "type": types,
+            "colors": colors,
+            "flavorText": flavor,
+            "retrievalCount": rng.negative_binomial(2, 0.3, num_cards),
+            "chatId": rng.integers(0, max(1, num_cards // 50), num_cards).astype(str),
+            "createdAt": created,
+            "updatedAt": np.minimum(updated, START_MS + SPAN_MS),
+        }
+    )
+
+
+def make_sentiments(num_texts: int, seed: int = 42) -> list:
+    """
+    Sentiment pipeline outputs (`label` and `score`) for `num_texts` texts.
+    """
+    rng = np.random.default_rng(seed)
+    labels = ["Very Negative", "Negative", "Neutral", "Positive", "Very Positive"]
+    chosen = rng.choice(len(labels), num_texts, p=[0.1, 0.2, 0.35, 0.25, 0.1])
+    scores = rng.uniform(0.4, 1.0, num_texts)
+    return [
+        {"label": labels[c], "score": float(s)}
+        for c, s in zip(chosen, scores, strict=True)
+    ]
+
+
+def make_embeddings(num_concepts: int, dim: int = 384, seed: int = 42) -> np.ndarray:
+    """
+    Unit-norm embeddings grouped in clusters of ~50 concepts, as float32.
+    """
+    rng = np.random.default_rng(seed)
+    num_clusters = max(1, num_concepts // 50)
+    centers = rng.normal(size=(num_clusters, dim))
+    embeddings = centers[rng.integers(0, num_clusters, num_concepts)]
+    embeddings = embeddings + rng.normal(scale=0.6, size=(num_concepts, dim))
+    embeddings /= np.linalg.norm(embeddings, axis=1, keepdims=True)
+    return embeddings.astype(np.float32)
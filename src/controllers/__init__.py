@@ -7,6 +7,14 @@ Initialization file for the controllers package.
 """
 
 # Re-export controller functions
+from .aggregations import (
+    aggregate_bar,
+    aggregate_daily_mean,
+    aggregate_line,
+    aggregate_pie,
+)
+from .dedup import dedup_cards
+from .explorer import explore_cards, raw_cards
 from .functions import (
     count_card_names,
     count_primary_colors,
@@ -14,13 +22,29 @@ from .functions import (
     get_cards_df,
     get_line_df,
     get_pie_df,
+    version_token,
 )
+from .inference import InferenceClient, InferenceServer, get_inference_client
+from .jobs import JobRunner, get_job_runner
 
 __all__ = [
+    "InferenceClient",
+    "InferenceServer",
+    "JobRunner",
+    "aggregate_bar",
+    "aggregate_daily_mean",
+    "aggregate_line",
+    "aggregate_pie",
     "count_card_names",
     "count_primary_colors",
+    "dedup_cards",
+    "explore_cards",
     "get_bar_df",
     "get_cards_df",
+    "get_inference_client",
+    "get_job_runner",
     "get_line_df",
     "get_pie_df",
+    "raw_cards",
+    "version_token",
 ]
@@ -0,0 +1,173 @@
+"""
+Side-effect-free aggregations feeding the dashboard charts.
+
+Unlike `get_pie_df`, `get_line_df` and `get_bar_df`, these functions never
+write to (or copy) the frame they are given: they read the columns they need
+and aggregate integer codes with NumPy.
+"""
+
+from typing import Union
+
+import numpy as np
+import pandas as pd
+
+
+def _list_cells_joined(values: pd.Series) -> np.ndarray:
+    """
+    Values of a column with list cells replaced by their sorted concatenation.
+
+    Only the distinct lists are joined in Python; the returned array is a new
+    object, the column itself is left untouched.
+    """
+
+    array = values.to_numpy()
+    if values.dtype != object:
+        return array
+
+    is_list = np.fromiter(
+        (isinstance(value, list) for value in array), dtype=bool, count=len(array)
+    )
+    if not is_list.any():
+        return array
+    # Join each distinct list once
+    codes, uniques = pd.factorize(np.fromiter(map(tuple, array[is_list]), dtype=object))
+    joined = np.array(["".join(sorted(items)) for items in uniques], dtype=object)
+    array = array.copy()
+    array[is_list] = joined[codes]
+    return array
+
+
+def _count_codes(values) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Distinct non-missing values and their counts, most frequent first.
+    """
+
+    codes, uniques = pd.factorize(values)
+    counts = np.bincount(codes[codes >= 0], minlength=len(uniques))
+    order = np.argsort(-counts, kind="stable")
+    return np.asarray(uniques, dtype=object)[order], counts[order]
+
+
+def aggregate_pie(data: pd.DataFrame, column: str) -> pd.DataFrame:
+    """
+    Prepares the data for a pie chart without modifying `data`.
+
+    List cells count as the concatenation of their sorted items and labels
+    are truncated to 15 characters, as in `get_pie_df`.
+
+    Args:
+        data (pd.DataFrame): The data to plot.
+        column (str): The column to plot from the DataFrame.
+
+    Returns:
+        pd.DataFrame: The `column` values and their `count`.
+    """
+
+    labels, counts = _count_codes(_list_cells_joined(data[column]))
+    pie_counts = pd.DataFrame({column: labels, "count": counts})
+
+    # Truncate legend labels
+    pie_counts[column] = pie_counts[column].str[:15]
+    return pie_counts
+
+
+def _day_codes(values: pd.Series) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Days since the epoch of a timestamp column and a mask of parseable values.
+    """
+
+    timestamps = pd.to_datetime(values, errors="coerce")
+    if isinstance(timestamps.dtype, pd.DatetimeTZDtype):
+        timestamps = timestamps.dt.tz_localize(None)
+    days = timestamps.to_numpy(dtype="datetime64[ns]").astype("datetime64[D]")
+    valid = ~np.isnat(days)
+    return np.where(valid, days.astype(np.int64), 0), valid
+
+
+def aggregate_line(data: pd.DataFrame, x: str, y: str) -> pd.DataFrame:
+    """
+    Prepares the data for a line chart without modifying `data`.
+
+    Counts the distinct values of `x` per day of the `y` timestamps. Each
+    (day, value) pair is packed into one int64 key, so the distinct count is
+    a single `np.unique` over integers.
+
+    Args:
+        data (pd.DataFrame): The data to plot.
+        x (str): The column whose distinct values are counted.
+        y (str): The timestamp column.
+
+    Returns:
+        pd.DataFrame: The days (`y`, datetime64) and their `count`.
+    """
+
+    days, valid = _day_codes(data[y])
+    codes, uniques = pd.factorize(data[x])
+
+    pairs = np.unique(days[valid] * (len(uniques) + 1) + (codes[valid] + 1))
+    pair_days = pairs // (len(uniques) + 1)
+    # Missing `x` values (code -1, packed as 0) do not count as a value, but
+    # their days are kept with a count of 0
+    line_days = np.unique(pair_days)
+    counted = pairs % (len(uniques) + 1) > 0
+    counts = np.bincount(
+        np.searchsorted(line_days, pair_days[counted]), minlength=len(line_days)
+    )
+    return pd.DataFrame(
+        {y: line_days.astype("datetime64[D]").astype("datetime64[ns]"), "count": counts}
+    )
+
+
+def aggregate_bar(data: Union[pd.DataFrame, dict], column: str = None) -> pd.DataFrame:
+    """
+    Prepares the data for a bar chart without modifying `data`.
+
+    Args:
+        data (Union[pd.DataFrame, dict]): The data to plot. If a DataFrame,
+            the column argument must be provided.
+        column (str): The column to plot from the DataFrame.
+
+    Returns:
+        pd.DataFrame: The values (or dict keys) and their `count`.
+    """
+
+    if isinstance(data, pd.DataFrame):
+        labels, counts = _count_codes(data[column].to_numpy())
+        return pd.DataFrame({column: labels, "count": counts})
+
+    bar_counts = pd.DataFrame({"key": list(data.keys()), "count": list(data.values())})
+    return bar_counts.sort_values("count", ascending=False, kind="stable")
+
+
+def aggregate_daily_mean(timestamps: pd.Series, values) -> pd.DataFrame:
+    """
+    Mean of `values` per day of `timestamps`, with empty days as NaN.
+
+    Args:
+        timestamps (pd.Series): The timestamp of each value.
+        values: The values to average, aligned with `timestamps`.
+
+    Returns:
+        pd.DataFrame: Consecutive days (named after `timestamps`) and the
+        mean `value` of each.
+    """
+
+    days, valid = _day_codes(timestamps)
+    values = np.asarray(values, dtype=float)
+    name = timestamps.name or "day"
+    if not valid.any():
+        return pd.DataFrame({name: pd.to_datetime([]), "value": []})
+
+    offsets = days[valid] - days[valid].min()
+    sums = np.bincount(offsets, weights=values[valid])
+    counts = np.bincount(offsets)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        means = sums / counts
+
+    line_days = days[valid].min() + np.arange(len(sums))
+    return pd.DataFrame(
+        {
+            name: line_days.astype("datetime64[D]").astype("datetime64[ns]"),
+            "value": means,
+        }
+    )
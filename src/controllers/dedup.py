@@ -0,0 +1,388 @@
+"""
+Near-duplicate detection for concepts and cards.
+
+Concept names and flavor texts are compared with MinHash signatures over
+character shingles. Locality-sensitive hashing (LSH) proposes candidate pairs,
+which are verified against the estimated Jaccard similarity (and optionally the
+cosine similarity of their embeddings) before being merged into groups.
+"""
+
+import hashlib
+import json
+import os
+import re
+import time
+import unicodedata
+from typing import Callable, Optional
+
+import numpy as np
+import pandas as pd
+from loguru import logger
+from scipy.sparse import coo_matrix
+from scipy.sparse.csgraph import connected_components
+
+from utils import constants, traced
+from utils.cache import memory_cache
+
+# Configure Loguru
+logger.remove()  # Remove default logger to customize settings
+logger.add(
+    "logs/function_logs.log",
+    rotation="10MB",
+    level="INFO",
+    format="{time} {level} {message}",
+)
+
+_NON_ALNUM = re.compile(r"[\W_]+")
+
+
+def normalize_text(text: str) -> str:
+    """
+    Normalize a string before shingling: unicode folding, case folding and
+    punctuation/whitespace collapsing.
+
+    Args:
+        text (str): The string to normalize.
+
+    Returns:
+        str: The normalized string.
+    """
+
+    text = unicodedata.normalize("NFKC", str(text)).casefold()
+    return _NON_ALNUM.sub(" ", text).strip()
+
+
+def _shingles(texts: list, k: int) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Build the set of byte k-gram shingles of every text.
+
+    Each k-gram (k <= 4) is packed into a uint32, so no hashing is needed.
+
+    Returns:
+        owners (np.ndarray): Index of the text each shingle belongs to (sorted).
+        shingles (np.ndarray): The packed shingles, unique per owner.
+    """
+
+    encoded = []
+    for text in texts:
+        padded = f" {text} ".encode("utf-8")
+        encoded.append(padded.ljust(k, b" "))
+
+    lengths = np.fromiter((len(e) for e in encoded), dtype=np.int64, count=len(texts))
+    buffer = np.frombuffer(b"".join(encoded), dtype=np.uint8).astype(np.uint32)
+    offsets = np.concatenate(([0], np.cumsum(lengths)[:-1]))
+
+    windows = lengths - k + 1
+    owners = np.repeat(np.arange(len(texts), dtype=np.uint64), windows)
+    window_offsets = np.concatenate(([0], np.cumsum(windows)[:-1]))
+    starts = (
+        np.arange(windows.sum())
+        - np.repeat(window_offsets, windows)
+        + np.repeat(offsets, windows)
+    )
+
+    shingles = np.zeros(len(starts), dtype=np.uint32)
+    for j in range(k):
+        shingles |= buffer[starts + j] << np.uint32(8 * (k - 1 - j))
+
+    # Keep each shingle once per owner; the keys come back sorted by owner
+    keys = np.unique((owners << np.uint64(32)) | shingles.astype(np.uint64))
+    return keys >> np.uint64(32), keys & np.uint64(0xFFFFFFFF)
+
+
+def minhash_signatures(
+    texts: list, num_perm: int = 64, k: int = 3, seed: int = 42
+) -> np.ndarray:
+    """
+    Compute MinHash signatures of the character k-gram sets of each text.
+
+    Args:
+        texts (list): The (normalized) texts.
+        num_perm (int): Number of hash permutations (signature length).
+        k (int): Shingle size in bytes, at most 4.
+        seed (int): Seed of the hash family, signatures are only comparable
+            when computed with the same seed.
+
+    Returns:
+        np.ndarray: A (len(texts), num_perm) uint64 array of signatures.
+    """
+
+    if not 1 <= k <= 4:
+        raise ValueError("Shingle size k must be between 1 and 4.")
+
+    signatures = np.empty((len(texts), num_perm), dtype=np.uint64)
+    if not texts:
+        return signatures
+
+    owners, shingles = _shingles(texts, k)
+    owner_starts = np.flatnonzero(np.r_[True, owners[1:] != owners[:-1]])
+
+    # Multiply-shift hashing: h(x) = ((a * x + b) mod 2^64) >> 32
+    rng = np.random.default_rng(seed)
+    a = rng.integers(1, 2**63, size=num_perm, dtype=np.uint64) | np.uint64(1)
+    b = rng.integers(0, 2**63, size=num_perm, dtype=np.uint64)
+
+    # Bound the (shingles x permutations) working set to ~32 MB
+    chunk = max(1, (1 << 22) // len(shingles))
+    for start in range(0, num_perm, chunk):
+        stop = min(num_perm, start + chunk)
+        hashed = (shingles[:, None] * a[start:stop] + b[start:stop]) >> np.uint64(32)
+        signatures[:, start:stop] = np.minimum.reduceat(hashed, owner_starts, axis=0)
+
+    return signatures
+
+
+def lsh_candidate_pairs(signatures: np.ndarray, bands: int = 16) -> np.ndarray:
+    """
+    Find candidate near-duplicate pairs by banding the MinHash signatures.
+
+    Rows sharing a band bucket are paired with the first row of that bucket,
+    which keeps the number of candidates linear in the bucket size.
+
+    Args:
+        signatures (np.ndarray): Signatures from `minhash_signatures`.
+        bands (int): Number of bands, must divide the signature length.
+
+    Returns:
+        np.ndarray: A (m, 2) array of unique row index pairs with i < j.
+    """
+
+    n, num_perm = signatures.shape
+    if num_perm % bands:
+        raise ValueError("The number of bands must divide the signature length.")
+    rows = num_perm // bands
+
+    multipliers = np.random.default_rng(0).integers(
+        1, 2**63, size=rows, dtype=np.uint64
+    ) | np.uint64(1)
+
+    pairs = []
+    for band in range(bands):
+        block = signatures[:, band * rows : (band + 1) * rows]
+        keys = (block * multipliers).sum(axis=1)
+
+        order = np.argsort(keys, kind="stable")
+        sorted_keys = keys[order]
+        run_starts = np.r_[True, sorted_keys[1:] != sorted_keys[:-1]]
+        leaders = order[run_starts][np.cumsum(run_starts) - 1]
+
+        members = order != leaders
+        pairs.append(np.column_stack([leaders[members], order[members]]))
+
+    if not pairs or n < 2:
+        return np.empty((0, 2), dtype=np.int64)
+
+    pairs = np.sort(np.concatenate(pairs), axis=1)
+    return np.unique(pairs, axis=0)
+
+
+def find_near_duplicates(
+    texts: list,
+    threshold: float = 0.6,
+    num_perm: int = 64,
+    bands: int = 16,
+    k: int = 3,
+    embeddings: Optional[np.ndarray] = None,
+    embedding_threshold: float = 0.85,
+    seed: int = 42,
+) -> np.ndarray:
+    """
+    Group near-duplicate texts.
+
+    Args:
+        texts (list): The (normalized) texts, assumed to be unique.
+        threshold (float): Minimum estimated Jaccard similarity to merge a pair.
+        num_perm (int): MinHash signature length.
+        bands (int): Number of LSH bands.
+        k (int): Shingle size in bytes.
+        embeddings (np.ndarray, optional): Embeddings aligned with `texts`. When
+            given, pairs must also reach `embedding_threshold` cosine similarity.
+        embedding_threshold (float): Minimum cosine similarity of confirmed pairs.
+        seed (int): Seed of the MinHash family.
+
+    Returns:
+        np.ndarray: A group label per text; labels are 0..n_groups-1.
+    """
+
+    n = len(texts)
+    if n == 0:
+        return np.empty(0, dtype=np.int64)
+
+    signatures = minhash_signatures(texts, num_perm=num_perm, k=k, seed=seed)
+    pairs = lsh_candidate_pairs(signatures, bands=bands)
+
+    if len(pairs):
+        similarity = (signatures[pairs[:, 0]] == signatures[pairs[:, 1]]).mean(axis=1)
+        pairs = pairs[similarity >= threshold]
+
+    if len(pairs) and embeddings is not None:
+        norms = np.linalg.norm(embeddings, axis=1)
+        norms[norms == 0] = 1.0
+        unit = embeddings / norms[:, None]
+        cosine = np.einsum("ij,ij->i", unit[pairs[:, 0]], unit[pairs[:, 1]])
+        pairs = pairs[cosine >= embedding_threshold]
+
+    adjacency = coo_matrix(
+        (np.ones(len(pairs), dtype=np.int8), (pairs[:, 0], pairs[:, 1])),
+        shape=(n, n),
+    )
+    _, labels = connected_components(adjacency, directed=False)
+    return labels
+
+
+def build_canonical_mapping(
+    values: pd.Series,
+    embed: Optional[Callable[[list], np.ndarray]] = None,
+    **params,
+) -> dict:
+    """
+    Map every distinct value to the canonical spelling of its near-duplicate group.
+
+    The canonical spelling is the most frequent raw value of the group.
+
+    Args:
+        values (pd.Series): The raw values (one per card).
+        embed (Callable, optional): Function returning embeddings for a list of
+            strings, used to confirm MinHash matches.
+        **params: Forwarded to `find_near_duplicates`.
+
+    Returns:
+        dict: Raw value -> canonical value.
+    """
+
+    counts = values.value_counts()  # sorted by descending frequency
+    if counts.empty:
+        return {}
+    raw = counts.index.to_numpy(dtype=object)
+
+    codes, uniques = pd.factorize(
+        pd.Series([normalize_text(v) for v in raw], dtype=object)
+    )
+    uniques = list(uniques)
+    embeddings = embed(uniques) if embed is not None else None
+    labels = find_near_duplicates(uniques, embeddings=embeddings, **params)[codes]
+
+    # First occurrence of each label is its most frequent raw value
+    _, first = np.unique(labels, return_index=True)
+    canonical = raw[first][labels]
+
+    return dict(zip(raw.tolist(), canonical.tolist(), strict=True))
+
+
+def load_or_build_mapping(
+    values: pd.Series,
+    kind: str,
+    embed: Optional[Callable[[list], np.ndarray]] = None,
+    version: Optional[str] = None,
+    **params,
+) -> dict:
+    """
+    Return the canonical mapping of `values`, reusing a stored one when the
+    vocabulary and parameters have not changed.
+
+    Mappings are stored as JSON under `CACHE_DIR/dedup/` and kept in the
+    stage memory cache, under `version` when given so that the vocabulary of
+    a known version is not hashed again.
+
+    Args:
+        values (pd.Series): The raw values (one per card).
+        kind (str): Name of the mapping, e.g. "concepts".
+        embed (Callable, optional): See `build_canonical_mapping`.
+        version (str, optional): Version of `values`.
+        **params: Forwarded to `find_near_duplicates`.
+
+    Returns:
+        dict: Raw value -> canonical value.
+    """
+
+    settings = f"{kind}|{embed is not None}|{sorted(params.items())}"
+    if version is not None:
+        memo_key = f"dedup:{settings}|{version}"
+        mapping = memory_cache.get(memo_key)
+        if mapping is not None:
+            return mapping
+
+    started = time.perf_counter()
+    vocabulary = sorted(values.dropna().astype(str).unique())
+    digest = hashlib.blake2b(digest_size=16)
+    digest.update(settings.encode())
+    digest.update("\x1f".join(vocabulary).encode("utf-8"))
+    key = f"{kind}-{digest.hexdigest()}"
+    if version is None:
+        memo_key = f"dedup:{key}"
+        mapping = memory_cache.get(memo_key)
+        if mapping is not None:
+            return mapping
+
+    path = os.path.join(constants.CACHE_DIR, "dedup", f"{key}.json")
+    if os.path.exists(path):
+        logger.info(f"Loading stored {kind} mapping | Path: {path}")
+        with open(path, encoding="utf-8") as f:
+            mapping = json.load(f)
+    else:
+        logger.info(f"Building {kind} mapping | Values: {len(vocabulary)}")
+        mapping = build_canonical_mapping(values.astype(str), embed=embed, **params)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(mapping, f)
+        os.replace(tmp_path, path)
+
+    memory_cache.put(
+        memo_key, mapping, cache="dedup", cost=time.perf_counter() - started
+    )
+    return mapping
+
+
+@traced("dedup", size="df")
+def dedup_cards(
+    df: pd.DataFrame,
+    name_column: str = "name",
+    text_column: str = "flavorText",
+    embed: Optional[Callable[[list], np.ndarray]] = None,
+) -> tuple[pd.DataFrame, dict]:
+    """
+    Collapse near-duplicate concept names and flavor texts.
+
+    Adds a `concept` column with the canonical concept name of each card and a
+    `flavorGroup` column with the representative flavor text of each card. The
+    source columns are left untouched.
+
+    Args:
+        df (pd.DataFrame): The cards dataframe.
+        name_column (str): Column holding the concept names.
+        text_column (str): Column holding the flavor texts.
+        embed (Callable, optional): Embedding function used to confirm concept
+            matches.
+
+    Returns:
+        df (pd.DataFrame): The dataframe with the added columns.
+        report (dict): Vocabulary sizes before and after deduplication.
+    """
+
+    report = {}
+
+    version = df.attrs.get("version")
+    names = df[name_column]
+    concept_mapping = load_or_build_mapping(
+        names, "concepts", embed=embed, version=version
+    )
+    df["concept"] = names.astype(str).map(concept_mapping).where(names.notna())
+    report["names"] = int(names.nunique())
+    report["concepts"] = int(df["concept"].nunique())
+
+    if text_column in df.columns:
+        texts = df[text_column]
+        text_mapping = load_or_build_mapping(
+            texts, "texts", version=version, threshold=0.8, num_perm=64, bands=8
+        )
+        df["flavorGroup"] = texts.astype(str).map(text_mapping).where(texts.notna())
+        report["texts"] = int(texts.nunique())
+        report["text_groups"] = int(df["flavorGroup"].nunique())
+
+    report["reduction"] = (
+        1 - report["concepts"] / report["names"] if report["names"] else 0.0
+    )
+    logger.info(f"Deduplicated cards | Report: {report}")
+
+    return df, report
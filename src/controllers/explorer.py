@@ -0,0 +1,188 @@
+"""
+Server-side filtering, sorting and paging of the raw cards.
+
+The raw data explorer sends the browser one page of rows, with long texts
+and lists shortened, whatever the number of cards. The cards with every
+column (`raw_cards`) and the rows matching a query, ordered (`matching_rows`,
+per filter and sort) are built once per data version and kept in the stage
+cache; turning pages then only slices that order.
+"""
+
+from typing import Optional
+
+import numpy as np
+import pandas as pd
+
+from controllers.functions import get_cards_df
+from utils import cache_miss, constants, memory_cached, traced
+
+
+def _text(series: pd.Series) -> pd.Series:
+    """
+    The values of a column as strings (lists joined), missing values empty.
+    """
+    if isinstance(series.dtype, pd.CategoricalDtype):
+        return series.astype(str).where(series.notna(), "")
+    return series.map(
+        lambda value: (
+            ", ".join(map(str, value))
+            if isinstance(value, (list, tuple, np.ndarray))
+            else ""
+            if value is None or (isinstance(value, float) and np.isnan(value))
+            else str(value)
+        )
+    )
+
+
+def _contains(series: pd.Series, text: str) -> np.ndarray:
+    """
+    Mask of the values containing `text`, ignoring case.
+    """
+    if isinstance(series.dtype, pd.CategoricalDtype):
+        # Match the distinct values once, then select their codes
+        categories = series.cat.categories.astype(str)
+        matched = categories.str.contains(text, case=False, regex=False)
+        codes = series.cat.codes.to_numpy()
+        return np.append(matched, False)[codes]
+    return _text(series).str.contains(text, case=False, regex=False).to_numpy()
+
+
+def _sort_key(series: pd.Series) -> pd.Series:
+    """
+    Values ordering a column: categoricals by their lexical order, lists and
+    mixed objects by their text.
+    """
+    if isinstance(series.dtype, pd.CategoricalDtype):
+        ranks = np.argsort(np.argsort(series.cat.categories.astype(str)))
+        codes = series.cat.codes.to_numpy()
+        return pd.Series(np.where(codes >= 0, ranks[codes], np.nan), index=series.index)
+    if series.dtype == object:
+        return _text(series).where(series.notna())
+    return series
+
+
+@traced("explore", size="_cards")
+@memory_cached(ttl=3600)
+@cache_miss
+def raw_cards(_cards: pd.DataFrame, *, version: str) -> pd.DataFrame:
+    """
+    The cards with every stored column.
+
+    The sections load only `CARD_COLUMNS`; the explorer shows every column
+    as stored, joined to `_cards` on `_id`. Columns only `_cards` has (added
+    by the dashboard) are kept. `_cards` is not hashed by the cache:
+    `version` identifies it.
+
+    Args:
+        _cards (pd.DataFrame): The cards of the dashboard.
+        version (str): Version of `_cards`.
+
+    Returns:
+        pd.DataFrame: The rows of `_cards`, in order, with every column.
+    """
+    stored = get_cards_df().drop_duplicates("_id")
+    added = [column for column in _cards.columns if column not in stored.columns]
+    df = _cards[["_id", *added]].merge(stored, on="_id", how="left")
+    df = df[[*stored.columns, *added]]
+    df.attrs["version"] = version
+    return df
+
+
+@traced("explore", size="_df")
+@memory_cached(ttl=3600)
+@cache_miss
+def matching_rows(
+    _df: pd.DataFrame,
+    filter_column: Optional[str] = None,
+    filter_text: str = "",
+    sort_by: Optional[str] = None,
+    ascending: bool = True,
+    *,
+    version: str,
+) -> np.ndarray:
+    """
+    Positions of the rows matching a filter, in display order.
+
+    `_df` is not hashed by the cache: `version` identifies it.
+
+    Args:
+        _df (pd.DataFrame): The cards.
+        filter_column (str, optional): Column to filter on.
+        filter_text (str): Text the column must contain, ignoring case.
+        sort_by (str, optional): Column to sort by; rows keep their order by
+            default. Missing values come last.
+        ascending (bool): Sort direction.
+        version (str): Version of `_df`.
+
+    Returns:
+        np.ndarray: Row positions.
+    """
+    positions = np.arange(len(_df))
+    if filter_column and filter_text:
+        positions = positions[_contains(_df[filter_column], filter_text)]
+    if sort_by:
+        key = _sort_key(_df[sort_by].iloc[positions])
+        order = np.argsort(
+            key.rank(
+                method="first", ascending=ascending, na_option="bottom"
+            ).to_numpy(),
+            kind="stable",
+        )
+        positions = positions[order]
+    return positions
+
+
+def format_page(
+    rows: pd.DataFrame, max_chars: int = constants.EXPLORER_MAX_CHARS
+) -> pd.DataFrame:
+    """
+    Rows ready to send: list columns joined and long texts shortened.
+    """
+    page = rows.copy()
+    for column in page.columns:
+        if page[column].dtype == object or isinstance(
+            page[column].dtype, pd.CategoricalDtype
+        ):
+            text = _text(page[column])
+            page[column] = text.where(
+                text.str.len() <= max_chars, text.str[: max_chars - 1] + "…"
+            )
+    return page
+
+
+def explore_cards(
+    df: pd.DataFrame,
+    filter_column: Optional[str] = None,
+    filter_text: str = "",
+    sort_by: Optional[str] = None,
+    ascending: bool = True,
+    page: int = 0,
+    page_size: int = constants.EXPLORER_PAGE_SIZE,
+) -> tuple[pd.DataFrame, int]:
+    """
+    One page of the cards matching a filter, sorted.
+
+    Args:
+        df (pd.DataFrame): The cards, with their version in
+            `df.attrs["version"]`.
+        filter_column, filter_text, sort_by, ascending: See `matching_rows`.
+        page (int): Page number, from 0; past the last page, the last one.
+        page_size (int): Rows per page.
+
+    Returns:
+        page (pd.DataFrame): The formatted rows of the page (see
+        `format_page`).
+        total (int): The number of matching rows.
+    """
+    positions = matching_rows(
+        df,
+        filter_column,
+        filter_text.strip(),
+        sort_by,
+        ascending,
+        version=str(df.attrs["version"]),
+    )
+    # Past the last page, the last page is returned
+    page = max(0, min(page, (len(positions) - 1) // page_size))
+    window = positions[page * page_size : (page + 1) * page_size]
+    return format_page(df.iloc[window]), len(positions)
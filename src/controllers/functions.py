@@ -4,13 +4,14 @@ Controller functions for processing data.
 """
 
 from collections import Counter
-from typing import Union
+from typing import Optional, Union
 
 import pandas as pd
 from loguru import logger
 
-from models import get_mongo_cards
-from utils import clean_colors, clean_timestamp
+from models import get_card_snapshots, get_mongo_cards
+from models.snapshot import SnapshotError
+from utils import clean_colors, clean_timestamp, constants, span
 
 # Configure Loguru
 logger.remove()  # Remove default logger to customize settings
@@ -22,25 +23,77 @@ logger.add(
 )
 
 
-def get_cards_df() -> pd.DataFrame:
+def get_cards_df(columns: Optional[list] = None) -> pd.DataFrame:
     """
     Builds the dataframe for viewing in dashboard. Merges all relevant collections.
 
+    A card snapshot younger than `CARDS_SNAPSHOT_MAX_AGE` is loaded instead
+    of querying Mongo. Otherwise the cards are merged from Mongo, stored as
+    the newest snapshot and read back from it, so both paths return the same
+    column types (see `models.snapshot`).
+
+    Args:
+        columns (list, optional): Columns to load; all by default.
+
     Returns:
         df_cards (pd.DataFrame): The dataframe containing all the cards.
     """
 
+    snapshots = get_card_snapshots()
+    if snapshots is not None:
+        df_cards = snapshots.load(columns, max_age=constants.CARDS_SNAPSHOT_MAX_AGE)
+        if df_cards is not None:
+            return df_cards
+
     ragdb_cards = get_mongo_cards(db="ragDB", target_collection="kengrams")
     nerdb_cards = get_mongo_cards(db="nerDB", target_collection="kengrams")
 
     df_cards = pd.concat([ragdb_cards, nerdb_cards], ignore_index=True)
-    df_cards["colors"] = df_cards["colors"].apply(lambda x: clean_colors(x))
-
-    df_cards["updatedAt"] = df_cards["updatedAt"].apply(lambda x: clean_timestamp(x))
-    df_cards["createdAt"] = df_cards["createdAt"].apply(lambda x: clean_timestamp(x))
+    with span("normalize", size=len(df_cards)):
+        df_cards["colors"] = df_cards["colors"].apply(lambda x: clean_colors(x))
+
+        df_cards["updatedAt"] = df_cards["updatedAt"].apply(
+            lambda x: clean_timestamp(x)
+        )
+        df_cards["createdAt"] = df_cards["createdAt"].apply(
+            lambda x: clean_timestamp(x)
+        )
+
+    # Identify the data cheaply for the caches downstream
+    df_cards.attrs["version"] = version_token(df_cards)
+
+    if snapshots is not None:
+        try:
+            snapshots.write(df_cards)
+            return snapshots.load(columns)
+        except (SnapshotError, OSError) as e:
+            logger.warning(f"Card snapshot not written | {e}")
+
+    if columns is not None:
+        df_cards = df_cards[[c for c in columns if c in df_cards.columns]]
     return df_cards
 
 
+def version_token(df: pd.DataFrame, updated_column: str = "updatedAt") -> str:
+    """
+    Version of the cards, derived from their count and latest update.
+
+    Adding or updating a card changes the token. Cached stages take it as
+    their cache key instead of hashing the cards or their embeddings.
+
+    Args:
+        df (pd.DataFrame): The cards.
+        updated_column (str): The update timestamp column.
+
+    Returns:
+        str: The version token.
+    """
+
+    latest = pd.to_datetime(df[updated_column], errors="coerce").max()
+    latest = "none" if pd.isna(latest) else latest.isoformat()
+    return f"{len(df)}@{latest}"
+
+
 def get_pie_df(data: pd.DataFrame = None, column: str = None) -> pd.DataFrame:
     """
     Prepares the data for a pie chart.
@@ -0,0 +1,410 @@
+"""
+Shared local inference server with cross-session micro-batching.
+
+One server process holds a single copy of the embedding model and of the
+sentiment pipeline for every Streamlit replica on the host. Requests from
+all sessions are queued text by text and run in micro-batches: a batch
+starts with the oldest waiting text and takes the texts arriving within
+`INFERENCE_MAX_WAIT` seconds, up to `INFERENCE_MAX_BATCH_SIZE` texts.
+
+Start it (from the `src` directory) and point the app at it with:
+
+    python -m controllers.inference --port 8765
+    INFERENCE_URL=http://127.0.0.1:8765 streamlit run main.py
+
+`compute_embeddings` and `analyze_sentiment_emotion` then call the server
+through `InferenceClient` and fall back to in-process models when it cannot
+be reached.
+
+Endpoints (JSON over HTTP):
+
+- `POST /embed` with `{"texts": [...], "model": name}` returns
+  `{"shape": [n, d], "data": base64 float32}`;
+- `POST /sentiment` with `{"texts": [...]}` returns `{"results": [...]}`;
+- `GET /health` returns the batch statistics.
+"""
+
+import argparse
+import base64
+import http.server
+import json
+import queue
+import threading
+import time
+import urllib.error
+import urllib.request
+from typing import Callable, Optional
+
+import numpy as np
+from loguru import logger
+
+from utils import constants
+
+# Configure Loguru
+logger.remove()  # Remove default logger to customize settings
+logger.add(
+    "logs/inference_logs.log",
+    rotation="10MB",
+    level="INFO",
+    format="{time} {level} {message}",
+)
+
+
+class InferenceUnavailable(Exception):
+    """
+    The inference server cannot be reached or failed to answer.
+    """
+
+
+class _Request:
+    """
+    Texts of one request and their results, filled in by the batches.
+    """
+
+    def __init__(self, size: int):
+        self.results = [None] * size
+        self.remaining = size
+        self.error = None
+        self.done = threading.Event()
+        if size == 0:
+            self.done.set()
+
+
+class MicroBatcher:
+    """
+    Runs a batch function over the texts of concurrent requests together.
+
+    Args:
+        fn (Callable): Maps a list of texts to a list of results.
+        max_batch_size (int): Most texts per call of `fn`.
+        max_wait (float): Seconds a batch waits for more texts after its
+            first one.
+        name (str): Name used in logs.
+    """
+
+    def __init__(
+        self,
+        fn: Callable[[list], list],
+        max_batch_size: int = constants.INFERENCE_MAX_BATCH_SIZE,
+        max_wait: float = constants.INFERENCE_MAX_WAIT,
+        name: str = "batcher",
+    ):
+        self.fn = fn
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait
+        self.name = name
+        self.batches = 0
+        self.items = 0
+        self._queue: queue.Queue = queue.Queue()
+        self._thread = threading.Thread(
+            target=self._run, name=f"{name}-batcher", daemon=True
+        )
+        self._thread.start()
+
+    def submit(self, texts: list, timeout: Optional[float] = None) -> list:
+        """
+        Queue the texts and wait for their results.
+
+        Args:
+            texts (list): The texts.
+            timeout (float, optional): Seconds to wait for the results.
+
+        Returns:
+            list: The result of each text, in order.
+        """
+        request = _Request(len(texts))
+        for index, text in enumerate(texts):
+            self._queue.put((request, index, text))
+        if not request.done.wait(timeout):
+            raise TimeoutError(f"{self.name}: no result after {timeout}s")
+        if request.error is not None:
+            raise request.error
+        return request.results
+
+    def stats(self) -> dict:
+        return {
+            "batches": self.batches,
+            "items": self.items,
+            "mean_batch_size": self.items / self.batches if self.batches else 0.0,
+            "queued": self._queue.qsize(),
+        }
+
+    def _next_batch(self) -> list:
+        batch = [self._queue.get()]
+        deadline = time.monotonic() + self.max_wait
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.monotonic()
+            try:
+                # Texts already queued join the batch even past the deadline
+                batch.append(
+                    self._queue.get(timeout=remaining)
+                    if remaining > 0
+                    else self._queue.get_nowait()
+                )
+            except queue.Empty:
+                break
+        return batch
+
+    def _call(self, texts: list) -> list:
+        results = self.fn(texts)
+        if len(results) != len(texts):
+            raise ValueError(
+                f"{self.name}: {len(results)} results for {len(texts)} texts"
+            )
+        return results
+
+    def _run(self) -> None:
+        while True:
+            batch = self._next_batch()
+            self.batches += 1
+            self.items += len(batch)
+            try:
+                results = self._call([text for _, _, text in batch])
+                outcomes = [(result, None) for result in results]
+            except Exception as e:
+                logger.error(f"{self.name}: batch of {len(batch)} failed: {e}")
+                # Run the texts one by one, so that only the requests with a
+                # failing text get an error
+                outcomes = []
+                for _, _, text in batch:
+                    try:
+                        outcomes.append((self._call([text])[0], None))
+                    except Exception as text_error:
+                        outcomes.append((None, text_error))
+
+            for (request, index, _), (result, error) in zip(
+                batch, outcomes, strict=True
+            ):
+                if error is not None:
+                    request.error = error
+                request.results[index] = result
+                request.remaining -= 1
+                if request.remaining == 0 or error is not None:
+                    request.done.set()
+
+
+class InferenceModels:
+    """
+    The models of the server, loaded on their first request.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._embedding_models = {}
+        self._sentiment_pipeline = None
+
+    def embed(self, texts: list, model_name: str) -> list:
+        with self._lock:
+            if model_name not in self._embedding_models:
+                from sentence_transformers import SentenceTransformer
+
+                logger.info(f"Loading embedding model | {model_name}")
+                self._embedding_models[model_name] = SentenceTransformer(model_name)
+            model = self._embedding_models[model_name]
+        embeddings = model.encode(texts, batch_size=32, convert_to_numpy=True)
+        return list(embeddings.astype(np.float32))
+
+    def sentiment(self, texts: list) -> list:
+        with self._lock:
+            if self._sentiment_pipeline is None:
+                from transformers import pipeline
+
+                logger.info(f"Loading sentiment model | {constants.SENTIMENT_MODEL}")
+                self._sentiment_pipeline = pipeline(
+                    "text-classification",
+                    model=constants.SENTIMENT_MODEL,
+                    batch_size=16,
+                )
+            sentiment_pipeline = self._sentiment_pipeline
+        return sentiment_pipeline(texts)
+
+
+class InferenceServer(http.server.ThreadingHTTPServer):
+    """
+    HTTP server answering each request from the micro-batchers.
+
+    Args:
+        address (tuple): (host, port) to listen on.
+        models (InferenceModels, optional): The models; any object with the
+            `embed(texts, model_name)` and `sentiment(texts)` methods.
+        max_batch_size (int): Most texts per model call.
+        max_wait (float): Seconds a batch waits for more texts.
+    """
+
+    daemon_threads = True
+
+    def __init__(
+        self,
+        address: tuple,
+        models=None,
+        max_batch_size: int = constants.INFERENCE_MAX_BATCH_SIZE,
+        max_wait: float = constants.INFERENCE_MAX_WAIT,
+    ):
+        super().__init__(address, _InferenceHandler)
+        self.models = models or InferenceModels()
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait
+        self._batchers: dict[tuple, MicroBatcher] = {}
+        self._batchers_lock = threading.Lock()
+
+    def batcher(self, task: str, model_name: Optional[str] = None) -> MicroBatcher:
+        """
+        The micro-batcher of a task and model, created on first use.
+        """
+        with self._batchers_lock:
+            key = (task, model_name)
+            if key not in self._batchers:
+                if task == "embed":
+
+                    def fn(texts):
+                        return self.models.embed(texts, model_name)
+
+                else:
+                    fn = self.models.sentiment
+                self._batchers[key] = MicroBatcher(
+                    fn,
+                    self.max_batch_size,
+                    self.max_wait,
+                    name=f"{task}:{model_name}" if model_name else task,
+                )
+            return self._batchers[key]
+
+    def stats(self) -> dict:
+        with self._batchers_lock:
+            batchers = list(self._batchers.values())
+        return {batcher.name: batcher.stats() for batcher in batchers}
+
+
+class _InferenceHandler(http.server.BaseHTTPRequestHandler):
+    server: InferenceServer
+
+    def _send_json(self, status: int, payload: dict) -> None:
+        body = json.dumps(payload).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        if self.path == "/health":
+            self._send_json(200, {"status": "ok", "batchers": self.server.stats()})
+        else:
+            self._send_json(404, {"error": f"Unknown path: {self.path}"})
+
+    def do_POST(self):
+        try:
+            length = int(self.headers.get("Content-Length", 0))
+            request = json.loads(self.rfile.read(length))
+            texts = [str(text) for text in request["texts"]]
+        except (ValueError, KeyError, TypeError) as e:
+            self._send_json(400, {"error": f"Invalid request: {e}"})
+            return
+
+        try:
+            if self.path == "/embed":
+                model_name = request.get("model", constants.EMBEDDING_MODEL)
+                embeddings = self.server.batcher("embed", model_name).submit(
+                    texts, timeout=constants.INFERENCE_TIMEOUT
+                )
+                array = np.array(embeddings, dtype=np.float32).reshape(len(texts), -1)
+                self._send_json(
+                    200,
+                    {
+                        "shape": list(array.shape),
+                        "data": base64.b64encode(array.tobytes()).decode("ascii"),
+                    },
+                )
+            elif self.path == "/sentiment":
+                results = self.server.batcher("sentiment").submit(
+                    texts, timeout=constants.INFERENCE_TIMEOUT
+                )
+                self._send_json(200, {"results": results})
+            else:
+                self._send_json(404, {"error": f"Unknown path: {self.path}"})
+        except Exception as e:
+            self._send_json(500, {"error": str(e)})
+
+    def log_message(self, format, *args):
+        # Requests are counted by the batchers instead
+        pass
+
+
+class InferenceClient:
+    """
+    Client of the inference server.
+
+    Args:
+        url (str): Base URL of the server, e.g. "http://127.0.0.1:8765".
+        timeout (float): Seconds to wait for each request.
+    """
+
+    def __init__(self, url: str, timeout: float = constants.INFERENCE_TIMEOUT):
+        self.url = url.rstrip("/")
+        self.timeout = timeout
+
+    def _post(self, path: str, payload: dict) -> dict:
+        request = urllib.request.Request(  # noqa: S310
+            f"{self.url}{path}",
+            data=json.dumps(payload).encode("utf-8"),
+            headers={"Content-Type": "application/json"},
+            method="POST",
+        )
+        try:
+            with urllib.request.urlopen(request, timeout=self.timeout) as response:  # noqa: S310
+                return json.loads(response.read())
+        except urllib.error.HTTPError as e:
+            raise InferenceUnavailable(
+                f"{path} failed with {e.code}: {e.read().decode(errors='replace')}"
+            ) from e
+        except (urllib.error.URLError, OSError) as e:
+            raise InferenceUnavailable(f"{self.url} unreachable: {e}") from e
+
+    def embed(self, texts: list, model_name: str = constants.EMBEDDING_MODEL):
+        """
+        Embeddings of the texts, as a (n, d) float32 array.
+        """
+        response = self._post("/embed", {"texts": texts, "model": model_name})
+        data = np.frombuffer(base64.b64decode(response["data"]), dtype=np.float32)
+        return data.reshape(response["shape"])
+
+    def sentiment(self, texts: list) -> list:
+        """
+        Sentiment ({"label": ..., "score": ...}) of each text.
+        """
+        return self._post("/sentiment", {"texts": texts})["results"]
+
+
+def get_inference_client() -> Optional[InferenceClient]:
+    """
+    Client of the server at `INFERENCE_URL`, or None when it is not set.
+    """
+    if not constants.INFERENCE_URL:
+        return None
+    return InferenceClient(constants.INFERENCE_URL)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Shared local inference server")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument(
+        "--max-batch-size", type=int, default=constants.INFERENCE_MAX_BATCH_SIZE
+    )
+    parser.add_argument(
+        "--max-wait-ms", type=float, default=constants.INFERENCE_MAX_WAIT * 1000
+    )
+    args = parser.parse_args()
+
+    server = InferenceServer(
+        (args.host, args.port),
+        max_batch_size=args.max_batch_size,
+        max_wait=args.max_wait_ms / 1000,
+    )
+    logger.info(f"Serving inference on http://{args.host}:{args.port}")
+    print(f"Serving inference on http://{args.host}:{args.port}")
+    server.serve_forever()
+
+
+if __name__ == "__main__":
+    main()
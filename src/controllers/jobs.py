@@ -0,0 +1,326 @@
+"""
+Background job runner for the long NLP stages.
+
+Stages run on a thread pool instead of the Streamlit script thread. Jobs are
+registered under a key, so every session asking for the same work (same
+stage, same data version) shares one job. Sessions poll the job for its
+progress and partial results and keep it alive with their polls; a job
+nobody polls any more is cancelled, so a closed tab stops its work.
+
+Finished jobs do not keep their results: a job is dropped once every
+session waiting for it has read it, or `JOB_RESULT_TTL` after it finished,
+and the stage caches serve the result to later submissions. A failed job is
+kept with its error for `JOB_RETRY_BACKOFF`, unless retried explicitly, so a
+stage that keeps failing is not run again on every rerun.
+"""
+
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Optional
+
+import streamlit as st
+from loguru import logger
+from streamlit.runtime.scriptrunner import get_script_run_ctx
+
+from utils import constants
+
+# Configure Loguru
+logger.remove()  # Remove default logger to customize settings
+logger.add(
+    "logs/job_logs.log",
+    rotation="10MB",
+    level="INFO",
+    format="{time} {level} {message}",
+)
+
+PENDING = "pending"
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"
+CANCELLED = "cancelled"
+
+
+class JobCancelled(Exception):
+    """
+    Raised inside a stage when its job was cancelled.
+    """
+
+
+class Job:
+    """
+    State of one submitted stage.
+
+    The stage receives `report` as its progress callback. Calling it records
+    the progress and raises `JobCancelled` once the job is cancelled, so
+    stages stop at their next progress update.
+    """
+
+    def __init__(self, key: str):
+        self.key = key
+        self.status = PENDING
+        self.progress = 0.0
+        self.message = ""
+        self.partial = None
+        self.result = None
+        self.error: Optional[BaseException] = None
+        self.subscribers: dict[str, float] = {}
+        self.created_at = time.monotonic()
+        self.finished_at: Optional[float] = None
+        self._cancelled = threading.Event()
+        self._finished = threading.Event()
+
+    @property
+    def finished(self) -> bool:
+        return self.status in (DONE, FAILED, CANCELLED)
+
+    @property
+    def cancelled(self) -> bool:
+        return self._cancelled.is_set()
+
+    def report(
+        self, progress: float, message: Optional[str] = None, partial: Any = None
+    ) -> None:
+        """
+        Progress callback handed to the stage.
+
+        Args:
+            progress (float): Completed fraction, in [0, 1].
+            message (str, optional): Status message.
+            partial: Partial result sessions may render while waiting.
+        """
+        if self._cancelled.is_set():
+            raise JobCancelled(self.key)
+        self.progress = min(1.0, max(0.0, float(progress)))
+        if message is not None:
+            self.message = message
+        if partial is not None:
+            self.partial = partial
+
+    def cancel(self) -> None:
+        self._cancelled.set()
+
+    def finish(self, status: str) -> None:
+        self.finished_at = time.monotonic()
+        self.status = status
+        self._finished.set()
+
+    def wait(self, timeout: Optional[float] = None) -> bool:
+        """
+        Wait for the job to finish; returns whether it did.
+        """
+        return self._finished.wait(timeout)
+
+
+class JobRunner:
+    """
+    Thread pool with a registry of deduplicated, cancellable jobs.
+
+    Args:
+        max_workers (int): Number of stages running at once.
+        heartbeat_timeout (float): Seconds after which a session that stopped
+            polling a job no longer keeps it alive.
+        result_ttl (float): Seconds a finished job is kept for the sessions
+            that have not read it.
+        retry_backoff (float): Seconds before a failed job is run again.
+    """
+
+    def __init__(
+        self,
+        max_workers: int = constants.JOB_WORKERS,
+        heartbeat_timeout: float = constants.JOB_HEARTBEAT_TIMEOUT,
+        result_ttl: float = constants.JOB_RESULT_TTL,
+        retry_backoff: float = constants.JOB_RETRY_BACKOFF,
+    ):
+        self.heartbeat_timeout = heartbeat_timeout
+        self.result_ttl = result_ttl
+        self.retry_backoff = retry_backoff
+        self._executor = ThreadPoolExecutor(
+            max_workers=max_workers, thread_name_prefix="job"
+        )
+        self._jobs: dict[str, Job] = {}
+        self._lock = threading.Lock()
+        self._reaper = threading.Thread(target=self._reap_forever, daemon=True)
+        self._reaper.start()
+
+    def submit(
+        self, key: str, fn: Callable, *args, session_id: str = "default", **kwargs
+    ) -> Job:
+        """
+        Run `fn(*args, _progress=job.report, **kwargs)` unless a live job with
+        the same key exists, and subscribe the session to the job.
+
+        Cancelled jobs are submitted again; failed jobs once `retry_backoff`
+        has passed or after `retry`.
+
+        Args:
+            key (str): Identity of the work, e.g. stage name and data version.
+            fn (Callable): The stage; it must accept a `_progress` callback.
+            session_id (str): The subscribing session.
+
+        Returns:
+            Job: The new or existing job.
+        """
+        with self._lock:
+            job = self._jobs.get(key)
+            if (
+                job is None
+                or job.status == CANCELLED
+                or job.cancelled
+                or (
+                    job.status == FAILED
+                    and time.monotonic() - job.finished_at >= self.retry_backoff
+                )
+            ):
+                job = Job(key)
+                self._jobs[key] = job
+                self._executor.submit(self._run, job, fn, args, kwargs)
+                logger.info(f"Job submitted | {key}")
+            job.subscribers[session_id] = time.monotonic()
+            return job
+
+    def _run(self, job: Job, fn: Callable, args, kwargs) -> None:
+        if job.cancelled:
+            job.finish(CANCELLED)
+            return
+        job.status = RUNNING
+        started = time.perf_counter()
+        try:
+            job.result = fn(*args, _progress=job.report, **kwargs)
+            job.progress = 1.0
+            job.finish(DONE)
+            logger.info(f"Job done | {job.key} in {time.perf_counter() - started:.2f}s")
+        except JobCancelled:
+            job.finish(CANCELLED)
+            logger.info(f"Job cancelled | {job.key}")
+        except Exception as e:
+            job.error = e
+            job.finish(FAILED)
+            logger.error(f"Job failed | {job.key}: {e}")
+
+    def poll(self, key: str, session_id: str = "default") -> Optional[Job]:
+        """
+        Current state of a job, refreshing the session's heartbeat.
+        """
+        with self._lock:
+            job = self._jobs.get(key)
+            if job is not None:
+                job.subscribers[session_id] = time.monotonic()
+            return job
+
+    def unsubscribe(self, key: str, session_id: str = "default") -> None:
+        """
+        Stop keeping a job alive; it is cancelled when nobody else does.
+        """
+        with self._lock:
+            job = self._jobs.get(key)
+            if job is not None:
+                job.subscribers.pop(session_id, None)
+        self.reap()
+
+    def release(self, key: str, session_id: str = "default") -> None:
+        """
+        Tell the runner a session has read the result of a finished job; the
+        job is dropped once no session waits for it any more.
+        """
+        with self._lock:
+            job = self._jobs.get(key)
+            if job is not None and job.status == DONE:
+                job.subscribers.pop(session_id, None)
+                if not job.subscribers:
+                    del self._jobs[key]
+
+    def retry(self, key: str) -> None:
+        """
+        Forget a failed job, so the next submission runs it again.
+        """
+        with self._lock:
+            job = self._jobs.get(key)
+            if job is not None and job.status == FAILED:
+                del self._jobs[key]
+
+    def cancel(self, key: str) -> None:
+        with self._lock:
+            job = self._jobs.get(key)
+        if job is not None and not job.finished:
+            job.cancel()
+
+    def reap(self) -> list[str]:
+        """
+        Drop stale subscribers, cancel unfinished jobs left without any and
+        drop finished jobs nobody waits for any more.
+
+        Returns:
+            list[str]: Keys of the jobs cancelled.
+        """
+        now = time.monotonic()
+        cancelled = []
+        with self._lock:
+            for key, job in list(self._jobs.items()):
+                job.subscribers = {
+                    session: seen
+                    for session, seen in job.subscribers.items()
+                    if now - seen <= self.heartbeat_timeout
+                }
+                if not job.finished:
+                    if not job.subscribers and not job.cancelled:
+                        job.cancel()
+                        cancelled.append(job.key)
+                elif job.status == FAILED:
+                    if now - job.finished_at >= self.retry_backoff:
+                        del self._jobs[key]
+                elif not job.subscribers or now - job.finished_at >= self.result_ttl:
+                    del self._jobs[key]
+        for key in cancelled:
+            logger.info(f"Job abandoned by every session | {key}")
+        return cancelled
+
+    def _reap_forever(self) -> None:
+        while True:
+            time.sleep(max(0.5, self.heartbeat_timeout / 3))
+            self.reap()
+
+    def stats(self) -> dict:
+        """
+        Number of registered jobs per status.
+        """
+        with self._lock:
+            counts: dict[str, int] = {}
+            for job in self._jobs.values():
+                counts[job.status] = counts.get(job.status, 0) + 1
+            return counts
+
+
+def scaled(progress: Callable, start: float, end: float) -> Callable:
+    """
+    Progress callback of a sub-stage covering `[start, end]` of a job.
+
+    Args:
+        progress (Callable): The job's progress callback.
+        start (float): Job progress when the sub-stage begins.
+        end (float): Job progress when the sub-stage ends.
+
+    Returns:
+        Callable: A callback taking the sub-stage's own progress.
+    """
+
+    def report(fraction, message=None, partial=None):
+        progress(start + (end - start) * fraction, message, partial)
+
+    return report
+
+
+def current_session_id() -> str:
+    """
+    ID of the Streamlit session running the current script.
+    """
+    ctx = get_script_run_ctx()
+    return ctx.session_id if ctx is not None else "default"
+
+
+@st.cache_resource(show_spinner=False)
+def get_job_runner() -> JobRunner:
+    """
+    The job runner shared by every session.
+    """
+    return JobRunner()
@@ -1,39 +1,137 @@
 """
 NLP Analysis functions
 
+torch, sentence-transformers, transformers, scikit-learn and networkx are
+imported by the stages using them, so that importing this module (and the
+app) does not load them before a stage first runs.
+
+When `INFERENCE_URL` is set, the embedding and sentiment stages send their
+texts to the shared inference server (see `controllers.inference`) instead
+of loading the models in this process, and fall back to local models when
+the server cannot be reached.
 """
 
-import networkx as nx
+import numpy as np
 import pandas as pd
 import streamlit as st
-import torch
-from sentence_transformers import SentenceTransformer, util
-from sklearn.cluster import KMeans
-from sklearn.manifold import TSNE
-from transformers import pipeline
+from loguru import logger
+
+from controllers.inference import InferenceUnavailable, get_inference_client
+from utils import cache_miss, constants, memory_cached, singleflight, traced
+
+# Configure Loguru
+logger.remove()  # Remove default logger to customize settings
+logger.add(
+    "logs/nlp_logs.log",
+    rotation="10MB",
+    level="INFO",
+    format="{time} {level} {message}",
+)
 
 pd.set_option("display.max_columns", None)
 
 
+class _PlaceholderProgress:
+    """
+    Progress callback drawing into `st.empty()` placeholders, used when a
+    stage runs on the script thread rather than as a job.
+    """
+
+    def __init__(self, message):
+        self.status_placeholder = st.empty()
+        self.progress_placeholder = st.empty()
+        self.status_placeholder.write(message)
+        self.progress_placeholder.progress(0)
+
+    def __call__(self, progress, message=None, partial=None):
+        if message is not None:
+            self.status_placeholder.write(message)
+        self.progress_placeholder.progress(min(1.0, progress))
+
+    def clear(self):
+        self.status_placeholder.empty()
+        self.progress_placeholder.empty()
+
+
+def _infer_remotely(infer, descriptions, report, partial=False):
+    """
+    Run the texts through the inference server in chunks.
+
+    Args:
+        infer (Callable): Client method mapping a list of texts to results.
+        descriptions (list): The texts.
+        report (Callable): Progress callback, called after every chunk.
+        partial (bool): Whether to report the results so far as partial.
+
+    Returns:
+        list: The results of each chunk, or None if the server cannot be
+        reached.
+    """
+    chunk_size = constants.INFERENCE_CHUNK_SIZE
+    chunks, done = [], []
+    try:
+        for i in range(0, len(descriptions), chunk_size):
+            chunk = infer(list(descriptions[i : i + chunk_size]))
+            chunks.append(chunk)
+            if partial:
+                done.extend(chunk)
+            report(
+                min(1.0, (i + chunk_size) / len(descriptions)),
+                partial=done if partial else None,
+            )
+    except InferenceUnavailable as e:
+        logger.warning(f"Inference server unavailable, running locally | {e}")
+        return None
+    return chunks
+
+
 @st.cache_resource(ttl=3600, show_spinner=False)
-def load_embedding_model(model_name="sentence-transformers/all-MiniLM-L12-v2"):
+def load_embedding_model(model_name=constants.EMBEDDING_MODEL):
     """
     Load the SentenceTransformer model for embedding generation.
     """
+    from sentence_transformers import SentenceTransformer
+
     model = SentenceTransformer(model_name)
     return model
 
 
-@st.cache_data(ttl=3600, show_spinner=False)
+@traced("embed", size="_descriptions")
+@singleflight
+@memory_cached(ttl=3600, copy=True)
+@cache_miss
 def compute_embeddings(
-    descriptions, model_name="sentence-transformers/all-MiniLM-L12-v2"
+    _descriptions, model_name=constants.EMBEDDING_MODEL, *, version, _progress=None
 ):
-    # Create placeholder elements
-    status_placeholder = st.empty()
-    progress_placeholder = st.empty()
+    """
+    Embed texts in batches.
+
+    `_descriptions` is not hashed by the cache: `version` identifies it.
+
+    Returns the embeddings and the model, which is None when the inference
+    server computed them.
+    """
+    descriptions = _descriptions
+    # Report progress to the job running this stage, or to placeholders
+    placeholders = (
+        None if _progress else _PlaceholderProgress("Computing embeddings...")
+    )
+    report = _progress or placeholders
+
+    client = get_inference_client()
+    if client is not None:
+        chunks = _infer_remotely(
+            lambda texts: client.embed(texts, model_name), descriptions, report
+        )
+        if chunks is not None:
+            if placeholders:
+                placeholders.clear()
+            embeddings = (
+                np.concatenate(chunks) if chunks else np.empty((0, 0), np.float32)
+            )
+            return embeddings, None
 
-    status_placeholder.write("Computing embeddings...")
-    progress_placeholder.progress(0)
+    import torch
 
     model = load_embedding_model(model_name)
     # Process in batches to show progress
@@ -44,7 +142,7 @@ def compute_embeddings(
         batch = descriptions[i : i + batch_size]
         batch_embeddings = model.encode(batch, convert_to_tensor=True)
         embeddings_list.append(batch_embeddings)
-        progress_placeholder.progress(min(1.0, (i + batch_size) / len(descriptions)))
+        report(min(1.0, (i + batch_size) / len(descriptions)))
 
     # Combine all batches
     if len(embeddings_list) > 1:
@@ -53,27 +151,43 @@ def compute_embeddings(
         embeddings = embeddings_list[0]
 
     # Clear placeholders when done
-    status_placeholder.empty()
-    progress_placeholder.empty()
+    if placeholders:
+        placeholders.clear()
 
     return embeddings.detach().cpu().numpy(), model
 
 
-@st.cache_resource(ttl=3600, show_spinner=False)
-def analyze_sentiment_emotion(descriptions):
+@traced("sentiment", size="_descriptions")
+@singleflight
+@memory_cached(ttl=3600)
+@cache_miss
+def analyze_sentiment_emotion(_descriptions, *, version, _progress=None):
+    """
+    Classify the sentiment of texts in batches.
+
+    `_descriptions` is not hashed by the cache: `version` identifies it.
+    """
+    descriptions = _descriptions
+    # Report progress to the job running this stage, or to placeholders
+    placeholders = None if _progress else _PlaceholderProgress("Analyzing sentiment...")
+    report = _progress or placeholders
+
+    client = get_inference_client()
+    if client is not None:
+        chunks = _infer_remotely(client.sentiment, descriptions, report, partial=True)
+        if chunks is not None:
+            if placeholders:
+                placeholders.clear()
+            return [result for chunk in chunks for result in chunk]
+
+    from transformers import pipeline
+
     sentiment_pipeline = pipeline(
         "text-classification",
-        model="tabularisai/multilingual-sentiment-analysis",
+        model=constants.SENTIMENT_MODEL,
         batch_size=16,
     )
 
-    # Create placeholder elements that we can update and clear
-    status_placeholder = st.empty()
-    progress_placeholder = st.empty()
-
-    status_placeholder.write("Analyzing sentiment...")
-    progress_placeholder.progress(0)
-
     # Process in batches with progress bar
     batch_size = 32  # Size of each progress update batch
     results = []
@@ -82,27 +196,49 @@ def analyze_sentiment_emotion(descriptions):
         batch = descriptions[i : i + batch_size]
         batch_results = sentiment_pipeline(batch)
         results.extend(batch_results)
-        progress_placeholder.progress(min(1.0, (i + batch_size) / len(descriptions)))
+        # The scores so far are the partial result of the stage
+        report(min(1.0, (i + batch_size) / len(descriptions)), partial=results)
 
     # Clear placeholders when done
-    status_placeholder.empty()
-    progress_placeholder.empty()
+    if placeholders:
+        placeholders.clear()
 
     return results
 
 
-@st.cache_resource(ttl=3600, show_spinner=False)
-def build_similarity_graph(concepts, embeddings, threshold=0.5, max_edges=1000):
+@traced("similarity", size="_concepts")
+@singleflight
+@memory_cached(ttl=3600)
+@cache_miss
+def build_similarity_graph(
+    _concepts,
+    _embeddings,
+    threshold=0.5,
+    max_edges=1000,
+    *,
+    version,
+    _progress=None,
+):
+    """
+    Graph linking the concepts whose embeddings are similar.
+
+    `_concepts` and `_embeddings` are not hashed by the cache: `version`
+    identifies them.
+    """
+    import networkx as nx
+    import torch
+    from sentence_transformers import util
+
+    concepts, embeddings = _concepts, _embeddings
     # Each node is a concept and edges exist if similarity > threshold
     G = nx.Graph()
     num_cards = len(concepts)
 
-    # Create placeholder elements
-    status_placeholder = st.empty()
-    progress_placeholder = st.empty()
-
-    status_placeholder.write("Building similarity graph...")
-    progress_placeholder.progress(0)
+    # Report progress to the job running this stage, or to placeholders
+    placeholders = (
+        None if _progress else _PlaceholderProgress("Building similarity graph...")
+    )
+    report = _progress or placeholders
 
     # First add all nodes to the graph
     for i in range(num_cards):
@@ -127,33 +263,37 @@ def build_similarity_graph(concepts, embeddings, threshold=0.5, max_edges=1000):
             if (
                 comparisons_done % max(1, total_comparisons // 100) == 0
             ):  # Update every 1%
-                progress_placeholder.progress(
-                    min(0.9, comparisons_done / total_comparisons)
-                )
+                report(min(0.9, comparisons_done / total_comparisons))
 
     # Sort edges by weight (highest first) and take only the top max_edges
-    status_placeholder.write(
-        f"Found {len(all_edges)} edges, sorting and adding top {max_edges}..."
-    )
+    report(0.9, f"Found {len(all_edges)} edges, sorting and adding top {max_edges}...")
     all_edges.sort(key=lambda x: x[2], reverse=True)
 
     # Add the top edges to the graph
     for idx, (i, j, score) in enumerate(all_edges[:max_edges]):
         G.add_edge(i, j, weight=score)
         if idx % max(1, max_edges // 50) == 0:  # Update every 2%
-            progress_placeholder.progress(
-                min(1.0, 0.9 + (0.1 * idx / min(len(all_edges), max_edges)))
-            )
+            report(min(1.0, 0.9 + (0.1 * idx / min(len(all_edges), max_edges))))
 
     # Clear placeholders when done
-    status_placeholder.empty()
-    progress_placeholder.empty()
+    if placeholders:
+        placeholders.clear()
 
     return G
 
 
-@st.cache_resource(ttl=3600, show_spinner=False)
-def reduce_embeddings_tsne(embeddings):
+@traced("reduce", size="_embeddings")
+@memory_cached(ttl=3600)
+@cache_miss
+def reduce_embeddings_tsne(_embeddings, *, version):
+    """
+    2D t-SNE projection of the embeddings.
+
+    `_embeddings` is not hashed by the cache: `version` identifies it.
+    """
+    from sklearn.manifold import TSNE
+
+    embeddings = _embeddings
     # Create placeholder elements
     status_placeholder = st.empty()
     progress_placeholder = st.empty()
@@ -182,8 +322,18 @@ def reduce_embeddings_tsne(embeddings):
     return reduced_embeddings
 
 
-@st.cache_resource(ttl=3600, show_spinner=False)
-def cluster_concepts(embeddings, num_clusters):
+@traced("cluster", size="_embeddings")
+@memory_cached(ttl=3600)
+@cache_miss
+def cluster_concepts(_embeddings, num_clusters, *, version):
+    """
+    KMeans cluster of each embedding.
+
+    `_embeddings` is not hashed by the cache: `version` identifies it.
+    """
+    from sklearn.cluster import KMeans
+
+    embeddings = _embeddings
     # Create placeholder elements
     status_placeholder = st.empty()
     progress_placeholder = st.empty()
@@ -0,0 +1,210 @@
+"""
+Fast sentiment classification on top of sentence embeddings.
+
+A linear head is distilled offline from the full sentiment transformer: it is
+trained on sentence embeddings with the transformer labels as targets, and
+serves predictions with a single matrix multiply.
+
+Train and store a head (from the `src` directory) with:
+
+    python -m controllers.sentiment
+"""
+
+import json
+import os
+from typing import Optional
+
+import numpy as np
+from loguru import logger
+
+from utils import constants
+
+# Configure Loguru
+logger.remove()  # Remove default logger to customize settings
+logger.add(
+    "logs/function_logs.log",
+    rotation="10MB",
+    level="INFO",
+    format="{time} {level} {message}",
+)
+
+
+def _head_path() -> str:
+    return os.path.join(constants.CACHE_DIR, "sentiment", "head.npz")
+
+
+class LinearSentimentHead:
+    """
+    Linear classifier over the five `SENTIMENT_MAPPING` classes.
+    """
+
+    def __init__(
+        self,
+        weights: np.ndarray,
+        bias: np.ndarray,
+        model_name: str,
+        agreement: Optional[float] = None,
+    ):
+        self.labels = list(constants.SENTIMENT_MAPPING)
+        self.weights = weights.astype(np.float32)  # (dim, classes)
+        self.bias = bias.astype(np.float32)  # (classes,)
+        self.model_name = model_name
+        self.agreement = agreement
+
+    def predict_proba(self, embeddings: np.ndarray) -> np.ndarray:
+        """
+        Class probabilities for each embedding.
+        """
+        logits = embeddings.astype(np.float32, copy=False) @ self.weights + self.bias
+        logits -= logits.max(axis=1, keepdims=True)
+        probabilities = np.exp(logits)
+        probabilities /= probabilities.sum(axis=1, keepdims=True)
+        return probabilities
+
+    def predict(self, embeddings: np.ndarray) -> list:
+        """
+        Predict sentiments in the same format as the transformer pipeline.
+
+        Returns:
+            list: One {"label": str, "score": float} dict per embedding.
+        """
+        probabilities = self.predict_proba(embeddings)
+        best = probabilities.argmax(axis=1)
+        scores = probabilities[np.arange(len(best)), best]
+        return [
+            {"label": self.labels[i], "score": float(score)}
+            for i, score in zip(best, scores, strict=True)
+        ]
+
+    def save(self, path: str = None):
+        """
+        Store the head weights and metadata.
+        """
+        path = path or _head_path()
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        metadata = {"model_name": self.model_name, "agreement": self.agreement}
+        np.savez(
+            path,
+            weights=self.weights,
+            bias=self.bias,
+            metadata=np.array(json.dumps(metadata)),
+        )
+        logger.info(f"Saved sentiment head | Path: {path}")
+
+    @classmethod
+    def load(cls, path: str = None) -> Optional["LinearSentimentHead"]:
+        """
+        Load a stored head, or return None if none has been trained yet.
+        """
+        path = path or _head_path()
+        if not os.path.exists(path):
+            return None
+        with np.load(path) as stored:
+            metadata = json.loads(str(stored["metadata"]))
+            return cls(stored["weights"], stored["bias"], **metadata)
+
+
+def train_sentiment_head(
+    embeddings: np.ndarray,
+    sentiments: list,
+    model_name: str,
+    l2: float = 1.0,
+) -> LinearSentimentHead:
+    """
+    Distill the transformer sentiment labels into a linear head.
+
+    Args:
+        embeddings (np.ndarray): Sentence embeddings of the texts.
+        sentiments (list): Transformer predictions ({"label": ...}) per text.
+        model_name (str): Embedding model the head was trained on.
+        l2 (float): L2 regularization strength of the logistic regression;
+            larger values shrink the weights more.
+
+    Returns:
+        LinearSentimentHead: The trained head, with its training agreement.
+    """
+
+    # Only needed offline, so the app does not load scikit-learn
+    from sklearn.linear_model import LogisticRegression
+
+    labels = list(constants.SENTIMENT_MAPPING)
+    targets = np.array([labels.index(s["label"]) for s in sentiments])
+
+    # scikit-learn takes the inverse of the strength
+    classifier = LogisticRegression(C=1.0 / l2, max_iter=1000)
+    classifier.fit(embeddings, targets)
+
+    # Scatter the fitted classes into the full five-class layout
+    weights = np.zeros((embeddings.shape[1], len(labels)), dtype=np.float32)
+    bias = np.full(len(labels), -1e4, dtype=np.float32)
+    if len(classifier.classes_) == 2:
+        # Binary problems are fitted with a single decision function
+        weights[:, classifier.classes_[1]] = classifier.coef_[0]
+        bias[classifier.classes_] = [0.0, classifier.intercept_[0]]
+    else:
+        weights[:, classifier.classes_] = classifier.coef_.T
+        bias[classifier.classes_] = classifier.intercept_
+
+    head = LinearSentimentHead(weights, bias, model_name)
+    head.agreement = sentiment_agreement(head, embeddings, sentiments)["accuracy"]
+    return head
+
+
+def sentiment_agreement(
+    head: LinearSentimentHead, embeddings: np.ndarray, sentiments: list
+) -> dict:
+    """
+    Compare the head predictions with the transformer labels.
+
+    Returns:
+        dict: `accuracy` (exact label agreement), `mean_abs_error` on the
+        five-point scale and per-label `recall`.
+    """
+
+    predicted = np.array([p["label"] for p in head.predict(embeddings)])
+    expected = np.array([s["label"] for s in sentiments])
+
+    scale = np.vectorize(constants.SENTIMENT_MAPPING.get)
+    report = {
+        "accuracy": float((predicted == expected).mean()),
+        "mean_abs_error": float(np.abs(scale(predicted) - scale(expected)).mean()),
+        "recall": {
+            label: float((predicted[expected == label] == label).mean())
+            for label in head.labels
+            if (expected == label).any()
+        },
+    }
+    return report
+
+
+def main(test_size: float = 0.2, seed: int = 42):
+    """
+    Train a head on the current cards, report its agreement on held-out texts
+    and store it.
+    """
+    from controllers import get_cards_df
+    from controllers.nlp import analyze_sentiment_emotion, compute_embeddings
+
+    df_cards = get_cards_df(columns=["flavorText"])
+    texts = df_cards["flavorText"].dropna().astype(str).unique().tolist()
+    version = f"{df_cards.attrs['version']}:flavor-texts"
+    sentiments = analyze_sentiment_emotion(texts, version=version)
+    embeddings, _ = compute_embeddings(texts, version=version)
+
+    order = np.random.default_rng(seed).permutation(len(texts))
+    split = int(len(texts) * (1 - test_size))
+    train, test = order[:split], order[split:]
+
+    head = train_sentiment_head(
+        embeddings[train], [sentiments[i] for i in train], constants.EMBEDDING_MODEL
+    )
+    report = sentiment_agreement(head, embeddings[test], [sentiments[i] for i in test])
+    logger.info(f"Sentiment head held-out agreement | Report: {report}")
+    print(json.dumps(report, indent=2))
+
+    head.agreement = report["accuracy"]
+    head.save()
+
+
+if __name__ == "__main__":
+    main()
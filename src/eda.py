@@ -15,6 +15,8 @@ df_cards = get_cards_df()
 
 descriptions = df_cards["flavorText"].tolist()
 
-embeddings, st_model = compute_embeddings(descriptions)
+embeddings, st_model = compute_embeddings(
+    descriptions, version=f"{df_cards.attrs['version']}:flavor-texts"
+)
 
 print(embeddings)
@@ -0,0 +1,344 @@
+"""
+Headless export of the dashboard as a static snapshot.
+
+Runs the pipeline of `main` once, without Streamlit, and writes every chart
+and the KPI values to a bundle that can be served as static files:
+
+- `snapshot.html`: a self-contained page (Plotly.js inlined once);
+- `snapshot.json`: the KPIs and the Plotly JSON of every figure.
+
+Usage (from the `src` directory):
+
+    python export.py --output ../snapshot
+    python export.py --output ../snapshot --sections overview sentiment
+
+The export reuses the artifacts cached on disk by the app: deduplication
+mappings, graph layouts, daily rollups and the fast sentiment head. Cards
+whose sentiment is already folded into the rollups are not scored again, so
+a daily export only runs the sentiment model when new cards arrived. With
+`INFERENCE_URL` set, embeddings and sentiment come from the shared inference
+server.
+"""
+
+import argparse
+import html
+import json
+import logging
+import os
+import time
+from datetime import datetime, timezone
+
+import pandas as pd
+import plotly.graph_objects as go
+import plotly.io as pio
+from loguru import logger
+
+from controllers.nlp import (
+    analyze_sentiment_emotion,
+    cluster_concepts,
+    compute_embeddings,
+    reduce_embeddings_tsne,
+)
+from main import (
+    concept_names,
+    dedup_caption,
+    header_kpis,
+    load_cards,
+    load_sentiment_head,
+    popular_concepts,
+    similarity_stage,
+)
+from models import get_rollup_store
+from utils import constants, span
+from views import (
+    make_bar_chart,
+    make_line_chart,
+    make_pie_chart,
+    make_sentiment_over_time,
+    visualize_graph,
+    visualize_tsne,
+)
+
+# Configure Loguru
+logger.remove()  # Remove default logger to customize settings
+logger.add(
+    "logs/export_logs.log",
+    rotation="10MB",
+    level="INFO",
+    format="{time} {level} {message}",
+)
+
+# Streamlit warns about the missing script context on every element call
+logging.getLogger("streamlit.runtime.scriptrunner_utils.script_run_context").addFilter(
+    lambda record: False
+)
+
+
+def _quiet_progress(progress, message=None, partial=None) -> None:
+    # Stages take a progress callback; nobody watches an export
+    pass
+
+
+def overview_figures(df_cards: pd.DataFrame) -> dict:
+    """
+    Timelines, types and popular concepts of the Overview section.
+    """
+    rollups = get_rollup_store()
+    rollups.update_cards(df_cards)
+    return {
+        "Cards Created Over Time": make_line_chart(
+            y="createdAt", x="_id", aggregated=rollups.cards_per_day()
+        ),
+        "Concepts Over Time": make_line_chart(
+            y="updatedAt", x="concept", aggregated=rollups.concepts_per_day()
+        ),
+        "Types": make_pie_chart(data=df_cards, column="type"),
+        "Popular Concepts": make_bar_chart(
+            data=popular_concepts(df_cards), orientation="h"
+        ),
+    }
+
+
+def similarity_figures(df_cards: pd.DataFrame) -> dict:
+    """
+    The concept similarity graph, as a community overview when large.
+    """
+    card_names = concept_names(df_cards)
+    names_version = f"{df_cards.attrs['version']}:concepts"
+    similarity_graph = similarity_stage(card_names, names_version, _quiet_progress)
+    return {"Concept Similarity Graph": visualize_graph(similarity_graph, card_names)}
+
+
+def cluster_figures(df_cards: pd.DataFrame) -> dict:
+    """
+    The t-SNE projection of the concept embeddings, colored by cluster.
+    """
+    card_names = concept_names(df_cards)
+    names_version = f"{df_cards.attrs['version']}:concepts"
+    embeddings, _ = compute_embeddings(
+        card_names, version=names_version, _progress=_quiet_progress
+    )
+    clusters = cluster_concepts(embeddings, num_clusters=10, version=names_version)
+    reduced_embeddings = reduce_embeddings_tsne(embeddings, version=names_version)
+    return {
+        "Embedding Clustering": visualize_tsne(
+            reduced_embeddings, pd.Series(clusters), card_names
+        )
+    }
+
+
+def sentiment_figures(df_cards: pd.DataFrame) -> dict:
+    """
+    The mood over time, scoring only the cards missing from the rollups or
+    updated since they were scored.
+
+    The fast sentiment head is used when one is trained, as in the app.
+    """
+    rollups = get_rollup_store()
+    sentiment_head = load_sentiment_head()
+    source = "fast" if sentiment_head is not None else "full"
+
+    rollups.update_cards(df_cards)
+    unscored = rollups.unscored(df_cards["_id"], source, df_cards["updatedAt"])
+    if unscored.any():
+        text_codes, text_groups = pd.factorize(
+            df_cards["flavorGroup"], use_na_sentinel=False
+        )
+        texts_version = f"{df_cards.attrs['version']}:flavor"
+        if sentiment_head is not None:
+            text_embeddings, _ = compute_embeddings(
+                [t if isinstance(t, str) else "" for t in text_groups],
+                version=texts_version,
+                _progress=_quiet_progress,
+            )
+            group_sentiments = sentiment_head.predict(text_embeddings)
+        else:
+            group_sentiments = analyze_sentiment_emotion(
+                list(text_groups), version=texts_version, _progress=_quiet_progress
+            )
+        rollups.update_sentiments(
+            df_cards["_id"],
+            df_cards["createdAt"],
+            [
+                constants.SENTIMENT_MAPPING.get(group_sentiments[code]["label"], 0)
+                for code in text_codes
+            ],
+            source=source,
+            revisions=df_cards["updatedAt"],
+        )
+    else:
+        logger.info(f"Every card is scored already ({source}), skipping inference")
+
+    return {
+        "Average Mood Over Time": make_sentiment_over_time(
+            daily=rollups.sentiment_per_day(source)
+        )
+    }
+
+
+# Sections of the snapshot, in display order
+SECTIONS = {
+    "overview": ("Overview", overview_figures),
+    "similarity": ("Similarity Graph", similarity_figures),
+    "clusters": ("Embedding Clusters", cluster_figures),
+    "sentiment": ("Sentiment", sentiment_figures),
+}
+
+
+def build_snapshot(sections: list = None) -> dict:
+    """
+    Run the pipeline and collect the KPIs and figures.
+
+    A section failing (e.g. a model that cannot be loaded) is recorded in
+    `errors` and the other sections are still exported.
+
+    Args:
+        sections (list, optional): Keys of `SECTIONS` to export; all of them
+            by default.
+
+    Returns:
+        dict: `generated_at`, `version`, `kpis`, `dedup`, `sections` (the
+        figures by name, by section title), `errors` and `seconds` per section.
+    """
+    started = time.perf_counter()
+    with span("Loading data", kind="section"):
+        df_cards, dedup_report = load_cards()
+
+    snapshot = {
+        "generated_at": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "version": str(df_cards.attrs["version"]),
+        "kpis": header_kpis(df_cards),
+        "dedup": dedup_caption(dedup_report),
+        "sections": {},
+        "errors": {},
+        "seconds": {"Loading data": time.perf_counter() - started},
+    }
+    for key in sections or list(SECTIONS):
+        title, build = SECTIONS[key]
+        section_started = time.perf_counter()
+        try:
+            with span(title, kind="section"):
+                figures = build(df_cards)
+            snapshot["sections"][title] = {
+                name: fig for name, fig in figures.items() if fig is not None
+            }
+        except Exception as e:
+            logger.exception(f"Export of {title} failed")
+            snapshot["errors"][title] = f"{type(e).__name__}: {e}"
+        snapshot["seconds"][title] = time.perf_counter() - section_started
+    return snapshot
+
+
+def snapshot_json(snapshot: dict) -> str:
+    """
+    The snapshot as JSON, figures in the Plotly JSON schema.
+    """
+    document = {
+        **snapshot,
+        "sections": {
+            title: {name: json.loads(pio.to_json(fig)) for name, fig in figures.items()}
+            for title, figures in snapshot["sections"].items()
+        },
+    }
+    return json.dumps(document, indent=1)
+
+
+def _figure_html(fig: go.Figure, include_plotlyjs: bool) -> str:
+    return pio.to_html(
+        fig,
+        full_html=False,
+        include_plotlyjs=include_plotlyjs,
+        config={"responsive": True},
+    )
+
+
+def snapshot_html(snapshot: dict) -> str:
+    """
+    The snapshot as one self-contained HTML page.
+    """
+    kpis = "".join(
+        f'<div class="kpi"><div class="label">{html.escape(label)}</div>'
+        f'<div class="value">{value:,}</div></div>'
+        for label, value in snapshot["kpis"].items()
+    )
+    body, first = [], True
+    for title, figures in snapshot["sections"].items():
+        body.append(f"<h2>{html.escape(title)}</h2>")
+        for name, fig in figures.items():
+            body.append(f"<h3>{html.escape(name)}</h3>")
+            # Plotly.js is inlined with the first figure only
+            body.append(_figure_html(fig, include_plotlyjs=first))
+            first = False
+    for title, error in snapshot["errors"].items():
+        body.append(f"<h2>{html.escape(title)}</h2>")
+        body.append(f'<p class="error">Not exported: {html.escape(error)}</p>')
+
+    return f"""<!DOCTYPE html>
+<html lang="en">
+<head>
+<meta charset="utf-8">
+<title>AI Thought Network Visualization</title>
+<style>
+body {{ font-family: sans-serif; margin: 2rem; }}
+.kpis {{ display: flex; gap: 3rem; }}
+.kpi .label {{ color: #555; }}
+.kpi .value {{ font-size: 2rem; }}
+.caption, .error {{ color: #777; }}
+</style>
+</head>
+<body>
+<h1>AI Thought Network Visualization</h1>
+<p class="caption">Snapshot of {html.escape(snapshot["generated_at"])},
+data version {html.escape(snapshot["version"])}</p>
+<div class="kpis">{kpis}</div>
+<p class="caption">{html.escape(snapshot["dedup"])}</p>
+{"".join(body)}
+</body>
+</html>
+"""
+
+
+def export_snapshot(output: str, sections: list = None) -> dict:
+    """
+    Build the snapshot and write `snapshot.html` and `snapshot.json` to the
+    output directory.
+
+    Returns:
+        dict: The snapshot (see `build_snapshot`).
+    """
+    snapshot = build_snapshot(sections)
+    os.makedirs(output, exist_ok=True)
+    for name, content in (
+        ("snapshot.html", snapshot_html(snapshot)),
+        ("snapshot.json", snapshot_json(snapshot)),
+    ):
+        # Replace the files at once, so a file share never serves half of one
+        path = os.path.join(output, name)
+        with open(f"{path}.tmp", "w", encoding="utf-8") as f:
+            f.write(content)
+        os.replace(f"{path}.tmp", path)
+    logger.info(f"Exported the snapshot of {snapshot['version']} to {output}")
+    return snapshot
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--output", default="snapshot", help="Output directory")
+    parser.add_argument(
+        "--sections",
+        nargs="+",
+        choices=list(SECTIONS),
+        help="Defaults to every section",
+    )
+    args = parser.parse_args()
+
+    snapshot = export_snapshot(args.output, args.sections)
+    for title, seconds in snapshot["seconds"].items():
+        print(f"{title:<22}{seconds:>8.2f}s")
+    for title, error in snapshot["errors"].items():
+        print(f"{title} not exported: {error}")
+    print(f"Snapshot written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -3,10 +3,21 @@ Streamlit app for visualizing the AI Thought Network.
 
 """
 
+import time
+from typing import Optional
+
 import pandas as pd
 import streamlit as st
 
-from controllers import count_card_names, get_cards_df
+from controllers import (
+    count_card_names,
+    dedup_cards,
+    explore_cards,
+    get_cards_df,
+    get_job_runner,
+    raw_cards,
+)
+from controllers.jobs import DONE, FAILED, current_session_id, scaled
 from controllers.nlp import (
     analyze_sentiment_emotion,
     build_similarity_graph,
@@ -14,7 +25,22 @@ from controllers.nlp import (
     compute_embeddings,
     reduce_embeddings_tsne,
 )
+from controllers.sentiment import LinearSentimentHead
+from models import get_rollup_store
+from utils import (
+    SpanCollector,
+    constants,
+    memory_cache_evictions,
+    memory_cache_stats,
+    singleflight_stats,
+    span,
+    start_collection,
+    start_metrics_server,
+)
 from views import (
+    dataset_version,
+    describe_communities,
+    figure_cache_stats,
     make_bar_chart,
     make_line_chart,
     make_pie_chart,
@@ -24,40 +50,182 @@ from views import (
 )
 
 
-def main():
-    st.set_page_config(page_title="AI Thought Network Visualization", layout="wide")
-    st.title("AI Thought Network Visualization")
+def run_stage(key, stage, *args, label, render_partial=None, **kwargs):
+    """
+    Run an NLP stage as a background job shared by every session.
 
-    # Load data
-    st.header("Loading data...")
-    df_cards = get_cards_df()
+    While the job runs, its progress (and partial result, if
+    `render_partial` is given) is polled in a fragment; the page reruns once
+    the job is done. A failed job shows its error, with a button to retry it
+    before `JOB_RETRY_BACKOFF` has passed, and a job the session cancelled
+    is not submitted again until the session starts it.
+
+    The session keeps the result of the latest job of each stage, so the
+    reruns after it (search, sliders) do not queue behind other jobs.
+
+    Args:
+        key (str): Identity of the job, including the data version.
+        stage (Callable): The stage, called with a `_progress` callback.
+        label (str): What the stage does, shown with its progress.
+        render_partial (Callable, optional): Draws the partial result.
+
+    Returns:
+        The stage result once the job is done, otherwise None.
+    """
+    # Keys are "<stage>:<data version>": one result per stage is kept
+    results = st.session_state.setdefault("stage_results", {})
+    stage_name = key.split(":", 1)[0]
+    if stage_name in results and results[stage_name][0] == key:
+        return results[stage_name][1]
+    if st.session_state.get(f"cancelled-{key}"):
+        st.info(f"{label} cancelled.")
+        if st.button("Start", key=f"start-{key}"):
+            del st.session_state[f"cancelled-{key}"]
+            st.rerun()
+        return None
+
+    runner = get_job_runner()
+    session_id = current_session_id()
+    job = runner.submit(key, stage, *args, session_id=session_id, **kwargs)
+    # Resubmitted stages are usually served by their cache at once
+    job.wait(constants.JOB_WAIT)
+    if job.status == DONE:
+        runner.release(key, session_id)
+        results[stage_name] = (key, job.result)
+        return job.result
+    if job.status == FAILED:
+        st.error(f"{label} failed: {job.error}")
+        if st.button("Retry", key=f"retry-{key}"):
+            runner.retry(key)
+            st.rerun()
+        return None
+    render_job_progress(key, label, render_partial)
+    return None
+
+
+@st.fragment(run_every=constants.JOB_POLL_INTERVAL)
+def render_job_progress(key, label, render_partial=None) -> None:
+    # Polling also tells the runner that this session still wants the job
+    runner = get_job_runner()
+    session_id = current_session_id()
+    job = runner.poll(key, session_id)
+    if job is None or job.finished:
+        st.rerun()
+
+    st.progress(job.progress, text=f"{label} {job.message}".strip())
+    if render_partial is not None and job.partial is not None:
+        render_partial(job.partial)
+    if st.button("Cancel", key=f"cancel-{key}"):
+        # The job stops unless another session is still waiting for it; this
+        # session does not submit it again until started
+        st.session_state[f"cancelled-{key}"] = True
+        runner.unsubscribe(key, session_id)
+        st.rerun()
+
+
+def similarity_stage(card_names, version, _progress):
+    """
+    Embeddings and similarity graph of the concepts, as one job.
+    """
+    embeddings, _ = compute_embeddings(
+        card_names, version=version, _progress=scaled(_progress, 0.0, 0.5)
+    )
+    return build_similarity_graph(
+        card_names,
+        embeddings,
+        threshold=0.5,
+        max_edges=10000,
+        version=version,
+        _progress=scaled(_progress, 0.5, 1.0),
+    )
+
+
+def load_cards() -> tuple[pd.DataFrame, dict]:
+    """
+    The deduplicated cards and the deduplication report.
+
+    Only the columns used by the sections (`CARD_COLUMNS`) are loaded.
+    """
+    df_cards = get_cards_df(columns=constants.CARD_COLUMNS)
+    version = df_cards.attrs.get("version")
+
+    # Collapse near-duplicate concept names and flavor texts
+    df_cards, dedup_report = dedup_cards(df_cards)
+
+    # Deduplication is deterministic, so the deduplicated cards keep the
+    # version token of the source data; caches key on it instead of the data
+    df_cards.attrs["version"] = version or dataset_version(df_cards)
+    return df_cards, dedup_report
 
-    # Calculate KPIs
-    total_retrieval_count = df_cards["retrievalCount"].sum()
-    total_count = df_cards["_id"].count()
-    unique_concepts = df_cards["name"].nunique()
-    # unique_chats = df_cards['chatId'].nunique()
+
+def header_kpis(df_cards: pd.DataFrame) -> dict:
+    """
+    Values of the KPI header.
+    """
+    return {
+        "Total Cards": int(df_cards["_id"].count()),
+        "Total Retrievals": int(df_cards["retrievalCount"].sum()),
+        "Total Concepts": int(df_cards["concept"].nunique()),
+        # "Total Chats": int(df_cards["chatId"].nunique()),
+    }
+
+
+def dedup_caption(dedup_report: dict) -> str:
+    return (
+        f"Deduplication merged {dedup_report['names']} concept names into "
+        f"{dedup_report['concepts']} concepts "
+        f"({dedup_report['reduction']:.1%} smaller vocabulary)."
+    )
+
+
+def render_header(df_cards: pd.DataFrame, dedup_report: dict) -> None:
+    """
+    KPI header, the only part of the page computed on every run.
+    """
 
     # display KPIs in columns
-    col1, col2, col3 = st.columns(3)
-    col1.metric(label="Total Cards", value=total_count)
-    col2.metric(label="Total Retrievals", value=total_retrieval_count)
-    col3.metric(label="Total Concepts", value=unique_concepts)
-    # col4.metric(label="Total Chats", value=unique_chats)
+    for col, (label, value) in zip(
+        st.columns(3), header_kpis(df_cards).items(), strict=True
+    ):
+        col.metric(label=label, value=value)
+    st.caption(dedup_caption(dedup_report))
+
+
+def popular_concepts(df_cards: pd.DataFrame, top: int = 20) -> dict:
+    """
+    Card count of the most frequent concepts.
+    """
+    name_counter = count_card_names(df_cards, "concept")
+    return dict(
+        sorted(name_counter.items(), key=lambda item: item[1], reverse=True)[:top]
+    )
+
+
+@st.fragment
+def render_overview(df_cards: pd.DataFrame) -> None:
+    # Time series are read from daily rollups, updated with the new cards only
+    rollups = get_rollup_store()
+    rollups.update_cards(df_cards)
 
     # Generate and display the charts in columns
     col5, col6, col7 = st.columns(3)
     with col5:
         st.subheader("Cards Created Over Time")
         createdAt_timeline_chart = make_line_chart(
-            data=df_cards, y="createdAt", x="_id"
+            y="createdAt",
+            x="_id",
+            aggregated=rollups.cards_per_day(),
+            viewport_width=constants.CHART_VIEWPORT_WIDTH // 3,
         )
         st.plotly_chart(createdAt_timeline_chart, use_container_width=True)
 
     with col6:
         st.subheader("Concepts Over Time")
         updatedAt_timeline_chart = make_line_chart(
-            data=df_cards, y="updatedAt", x="name"
+            y="updatedAt",
+            x="concept",
+            aggregated=rollups.concepts_per_day(),
+            viewport_width=constants.CHART_VIEWPORT_WIDTH // 3,
         )
         st.plotly_chart(updatedAt_timeline_chart, use_container_width=True)
 
@@ -67,23 +235,36 @@ def main():
         st.plotly_chart(type_pie_chart, use_container_width=True)
 
     st.header("Popular Concepts")
-    name_counter = count_card_names(df_cards, "name")
-    filtered_name_counter = dict(
-        sorted(name_counter.items(), key=lambda item: item[1], reverse=True)[:20]
+    name_counter_bar_chart = make_bar_chart(
+        data=popular_concepts(df_cards), orientation="h"
     )
-    name_counter_bar_chart = make_bar_chart(data=filtered_name_counter, orientation="h")
     st.plotly_chart(name_counter_bar_chart, use_container_width=True)
 
-    st.header("Concept Clustering and Similarity Graph... (please wait)")
-    col10, col11 = st.columns(2)
 
-    card_names = list(set(df_cards["name"].tolist()))
-    embeddings, st_name_model = compute_embeddings(card_names)
+def concept_names(df_cards: pd.DataFrame) -> list:
+    """
+    The distinct concepts, in the order shared by the graph and t-SNE sections.
+    """
+    return sorted(set(df_cards["concept"].dropna().tolist()))
+
 
-    # Build similarity graph
-    similarity_graph = build_similarity_graph(
-        card_names, embeddings, threshold=0.5, max_edges=10000
+@st.fragment
+def render_similarity_graph(df_cards: pd.DataFrame) -> None:
+    st.header("Concept Similarity Graph... (please wait)")
+
+    card_names = concept_names(df_cards)
+    names_version = f"{df_cards.attrs['version']}:concepts"
+
+    # Embed the concepts and build the similarity graph in the background
+    similarity_graph = run_stage(
+        f"similarity:{names_version}",
+        similarity_stage,
+        card_names,
+        names_version,
+        label="Building similarity graph...",
     )
+    if similarity_graph is None:
+        return
 
     # Add a search box for filtering the graph
     max_search_length = 100  # Set maximum length for search queries
@@ -142,32 +323,298 @@ def main():
             highlight_node = exact_matches[0]
             st.success(f"Exact match found: {card_names[highlight_node]}")
 
+    # Large graphs open as a community overview that can be drilled into
+    community = None
+    if highlight_node is None and len(similarity_graph) > constants.GRAPH_LOD_THRESHOLD:
+        summary = describe_communities(similarity_graph, card_names)
+        community = st.selectbox(
+            "Drill into a community:",
+            summary["community"].tolist(),
+            index=None,
+            placeholder="All communities",
+            format_func=lambda c: (
+                f"Community {c} ({summary['size'][c]} concepts): "
+                f"{summary['top_concepts'][c]}"
+            ),
+        )
+
     # Visualize the graph with optional highlighting
-    similarity_chart = visualize_graph(similarity_graph, card_names, highlight_node)
+    similarity_chart = visualize_graph(
+        similarity_graph, card_names, highlight_node, community=community
+    )
     st.subheader("Concept Similarity Graph")
     st.plotly_chart(similarity_chart, use_container_width=True)
 
+
+def tsne_extent(values) -> tuple[float, float]:
+    """
+    Range of a t-SNE axis for its viewport slider, widened around the points
+    when they all share one coordinate (a slider needs min < max).
+    """
+    low, high = float(values.min()), float(values.max())
+    if low == high:
+        low, high = low - 1.0, high + 1.0
+    return low, high
+
+
+@st.fragment
+def render_embedding_clusters(df_cards: pd.DataFrame) -> None:
+    st.header("Concept Clustering... (please wait)")
+
+    card_names = concept_names(df_cards)
+    names_version = f"{df_cards.attrs['version']}:concepts"
+    embedded = run_stage(
+        f"embeddings:{names_version}",
+        compute_embeddings,
+        card_names,
+        label="Computing embeddings...",
+        version=names_version,
+    )
+    if embedded is None:
+        return
+    embeddings, st_name_model = embedded
+
     df_embeddings = pd.DataFrame(card_names, columns=["name"])
-    df_embeddings["cluster"] = cluster_concepts(embeddings, num_clusters=10)
+    df_embeddings["cluster"] = cluster_concepts(
+        embeddings, num_clusters=10, version=names_version
+    )
+
+    reduced_embeddings = reduce_embeddings_tsne(embeddings, version=names_version)
+
+    # Large projections are rasterized; hover points need a zoomed-in viewport
+    viewport = None
+    if len(reduced_embeddings) > constants.TSNE_RASTER_THRESHOLD:
+        x_extent, y_extent = (
+            tsne_extent(reduced_embeddings[:, axis]) for axis in range(2)
+        )
+        col_x, col_y = st.columns(2)
+        viewport = (
+            col_x.slider("t-SNE x range", *x_extent, value=x_extent),
+            col_y.slider("t-SNE y range", *y_extent, value=y_extent),
+        )
 
-    reduced_embeddings = reduce_embeddings_tsne(embeddings)
     tsne_graph = visualize_tsne(
-        reduced_embeddings, df_embeddings["cluster"], card_names
+        reduced_embeddings, df_embeddings["cluster"], card_names, viewport=viewport
     )
     st.subheader("Embedding Clustering")
     st.plotly_chart(tsne_graph, use_container_width=True)
 
+
+def load_sentiment_head() -> Optional[LinearSentimentHead]:
+    """
+    The stored fast sentiment head, if it was trained on the current
+    embedding model.
+    """
+    sentiment_head = LinearSentimentHead.load()
+    if (
+        sentiment_head is not None
+        and sentiment_head.model_name != constants.EMBEDDING_MODEL
+    ):
+        return None
+    return sentiment_head
+
+
+@st.fragment
+def render_sentiment(df_cards: pd.DataFrame) -> None:
     st.header("Sentiment and Emotion Analysis... (please wait a lot)")
     # 3. Sentiment and Emotion Analysis
-    sentiments = analyze_sentiment_emotion(df_cards["flavorText"].tolist())
-    df_cards["sentiment"] = [s["label"] for s in sentiments]
+    # Score each group of near-duplicate flavor texts once
+    text_codes, text_groups = pd.factorize(
+        df_cards["flavorGroup"], use_na_sentinel=False
+    )
+    texts_version = f"{df_cards.attrs['version']}:flavor"
+
+    # Fast mode serves a linear head distilled from the full model
+    sentiment_head = load_sentiment_head()
+    fast_sentiment = st.toggle(
+        "Fast sentiment",
+        value=sentiment_head is not None,
+        disabled=sentiment_head is None,
+        help="Classify flavor text embeddings with a linear head distilled from "
+        "the full sentiment model (train it with `python -m controllers.sentiment`).",
+    )
+    if fast_sentiment:
+        text_embeddings, _ = compute_embeddings(
+            [t if isinstance(t, str) else "" for t in text_groups],
+            version=texts_version,
+        )
+        group_sentiments = sentiment_head.predict(text_embeddings)
+        if sentiment_head.agreement is not None:
+            st.caption(
+                f"Fast sentiment agrees with the full model on "
+                f"{sentiment_head.agreement:.1%} of held-out texts."
+            )
+    else:
 
-    sentimer_over_time_graph = make_sentiment_over_time(df_cards.copy(), sentiments)
+        def render_partial(scored):
+            # Mood over the cards whose flavor text is scored already
+            done = text_codes < len(scored)
+            st.caption(f"{len(scored)} of {len(text_groups)} flavor texts scored")
+            st.plotly_chart(
+                make_sentiment_over_time(
+                    df=df_cards.loc[done, ["createdAt"]],
+                    sentiments=[scored[code] for code in text_codes[done]],
+                ),
+                use_container_width=True,
+            )
+
+        group_sentiments = run_stage(
+            f"sentiment:{texts_version}",
+            analyze_sentiment_emotion,
+            list(text_groups),
+            label="Analyzing sentiment...",
+            render_partial=render_partial,
+            version=texts_version,
+        )
+        if group_sentiments is None:
+            return
+    sentiments = [group_sentiments[code] for code in text_codes]
+
+    sentiment_source = "fast" if fast_sentiment else "full"
+    rollups = get_rollup_store()
+    # Drops the scores of deleted cards, in case the overview did not yet
+    rollups.update_cards(df_cards)
+    rollups.update_sentiments(
+        df_cards["_id"],
+        df_cards["createdAt"],
+        [constants.SENTIMENT_MAPPING.get(s["label"], 0) for s in sentiments],
+        source=sentiment_source,
+        revisions=df_cards["updatedAt"],
+    )
+    sentimer_over_time_graph = make_sentiment_over_time(
+        daily=rollups.sentiment_per_day(sentiment_source)
+    )
     st.subheader("Average Mood Over Time")
     st.plotly_chart(sentimer_over_time_graph, use_container_width=True)
 
+
+@st.fragment
+def render_raw_data(df_cards: pd.DataFrame) -> None:
     st.header("Raw Data")
-    st.dataframe(df_cards)
+    # The other sections load only some columns; every column is shown here
+    df_cards = raw_cards(df_cards, version=str(df_cards.attrs["version"]))
+
+    # Filtering, sorting and paging run here: only the page is sent
+    columns = [str(column) for column in df_cards.columns]
+    col1, col2, col3, col4 = st.columns([2, 3, 2, 1])
+    filter_column = col1.selectbox("Filter on", columns, key="raw_filter_column")
+    filter_text = col2.text_input("Containing", "", key="raw_filter_text")
+    sort_by = col3.selectbox("Sort by", [None, *columns], key="raw_sort_by")
+    ascending = col4.toggle("Ascending", value=True, key="raw_ascending")
+
+    query = (filter_column, filter_text, sort_by, ascending)
+    if st.session_state.get("raw_query") != query:
+        # A new query starts from its first page
+        st.session_state["raw_query"] = query
+        st.session_state["raw_page"] = 1
+
+    col5, col6 = st.columns([1, 1])
+    page_size = col6.selectbox(
+        "Rows per page", constants.EXPLORER_PAGE_SIZES, key="raw_page_size"
+    )
+    rows, total = explore_cards(
+        df_cards,
+        *query,
+        page=st.session_state.get("raw_page", 1) - 1,
+        page_size=page_size,
+    )
+    pages = max(1, -(-total // page_size))
+    # Past the last page (fewer matches or larger pages), the last one is shown
+    st.session_state["raw_page"] = min(st.session_state.get("raw_page", 1), pages)
+    page = col5.number_input("Page", min_value=1, max_value=pages, key="raw_page")
+
+    first = (page - 1) * page_size
+    st.caption(
+        f"Rows {first + 1 if total else 0:,}-{first + len(rows):,} of {total:,} "
+        f"matching ({len(df_cards):,} cards), page {page} of {pages}"
+    )
+    st.dataframe(rows, hide_index=True)
+
+
+def render_perf_panel(collector: SpanCollector) -> None:
+    """
+    Time spent per section and stage during this rerun.
+    """
+    elapsed = time.perf_counter() - collector.started
+    with st.expander("Performance", expanded=True):
+        st.caption(
+            f"This rerun took {elapsed:.2f}s. Stages running as background jobs "
+            "are timed in `logs/span_logs.jsonl`, not here."
+        )
+        st.dataframe(
+            collector.breakdown(),
+            hide_index=True,
+            use_container_width=True,
+            column_config={
+                "seconds": st.column_config.NumberColumn(format="%.3f"),
+                "size": st.column_config.NumberColumn(help="Summed input sizes"),
+            },
+        )
+
+        evictions = memory_cache_evictions()
+        if len(evictions):
+            st.caption("Recent evictions from the stage cache")
+            st.dataframe(evictions, hide_index=True, use_container_width=True)
+
+
+# Sections rendered on demand, in display order
+SECTIONS = {
+    "Overview": render_overview,
+    "Similarity Graph": render_similarity_graph,
+    "Embedding Clusters": render_embedding_clusters,
+    "Sentiment": render_sentiment,
+    "Raw Data": render_raw_data,
+}
+
+
+def main():
+    st.set_page_config(page_title="AI Thought Network Visualization", layout="wide")
+    st.title("AI Thought Network Visualization")
+    # Spans of this rerun, for the performance panel
+    collector = start_collection()
+    # Prometheus endpoint of the process, started by the first rerun
+    start_metrics_server()
+
+    # Load data
+    st.header("Loading data...")
+    with span("Loading data", kind="section"):
+        df_cards, dedup_report = load_cards()
+
+    with span("Header", kind="section"):
+        render_header(df_cards, dedup_report)
+
+    # Heavy sections only run once opened; each is a fragment, so widgets
+    # inside a section rerun that section alone
+    section = st.radio(
+        "Section",
+        list(SECTIONS),
+        index=None,
+        horizontal=True,
+        label_visibility="collapsed",
+    )
+    if section is None:
+        st.info("Select a section to explore the data.")
+    else:
+        with span(section, kind="section"):
+            SECTIONS[section](df_cards)
+
+    cache_stats = figure_cache_stats()
+    st.sidebar.caption(
+        f"Figure cache: {cache_stats['hits']} hits, {cache_stats['misses']} misses, "
+        f"{cache_stats['evictions']} evictions"
+    )
+    memory = memory_cache_stats()
+    st.sidebar.caption(
+        f"Stage cache: {memory['bytes'] / 2**20:.0f} of "
+        f"{memory['max_bytes'] / 2**20:.0f} MB, {memory['evictions']} evictions"
+    )
+    coalesced = sum(stats["coalesced"] for stats in singleflight_stats().values())
+    st.sidebar.caption(f"Single-flight: {coalesced} concurrent calls coalesced")
+
+    if st.sidebar.toggle(
+        "Performance panel", help="Time spent per section and stage in this rerun"
+    ):
+        render_perf_panel(collector)
 
 
 if __name__ == "__main__":
@@ -7,10 +7,16 @@ Initialization file for the models package.
 
 from . import queries
 from .mongo import MongoDBClient, get_database, get_mongo_cards
+from .rollups import RollupStore, get_rollup_store
+from .snapshot import CardSnapshots, get_card_snapshots
 
 __all__ = [
+    "CardSnapshots",
     "MongoDBClient",
+    "RollupStore",
+    "get_card_snapshots",
     "get_database",
     "get_mongo_cards",
+    "get_rollup_store",
     "queries",
 ]
@@ -8,7 +8,7 @@ from loguru import logger
 from pymongo import MongoClient
 
 from models import queries
-from utils import constants
+from utils import cache_miss, constants, memory_cached, singleflight, traced
 
 # Configure Loguru
 logger.remove()  # Remove default logger to customize settings
@@ -69,7 +69,10 @@ def get_database(db_name: str) -> MongoClient:
     return client[db_name]
 
 
-@st.cache_data(ttl=3600, show_spinner=False)
+@traced("fetch")
+@singleflight
+@memory_cached(ttl=3600, copy=True)
+@cache_miss
 def get_mongo_cards(db: str, target_collection: str) -> pd.DataFrame:
     """
     Retrieve cards from the target collection using MongoDB aggregation.
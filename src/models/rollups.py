@@ -0,0 +1,481 @@
+"""
+Materialized daily rollups of the cards.
+
+The time-series charts read these small per-day tables instead of regrouping
+every card on each render. The tables are stored as Parquet under
+`CACHE_DIR/rollups/` and maintained incrementally. A ledger records what each
+card contributed, so only new, changed and deleted cards (or rescored ones)
+are aggregated: their previous contribution is subtracted and the new one
+added.
+"""
+
+import os
+import threading
+from typing import Optional
+
+import numpy as np
+import pandas as pd
+import streamlit as st
+from loguru import logger
+
+from utils import constants
+
+# Configure Loguru
+logger.remove()  # Remove default logger to customize settings
+logger.add(
+    "logs/rollup_logs.log",
+    rotation="10MB",
+    level="INFO",
+    format="{time} {level} {message}",
+)
+
+_TABLES = {
+    # Cards created per day
+    "cards": {"day": "int64", "cards": "int64"},
+    # Cards per (day updated, concept) pair
+    "concepts": {"day": "int64", "concept": "object", "cards": "int64"},
+    # Sentiment score sum and count per day created, for each scoring source
+    "sentiment": {
+        "source": "object",
+        "day": "int64",
+        "sentiment_sum": "float64",
+        "sentiment_count": "int64",
+    },
+    # Days and concept of each card folded into the card tables
+    "card_rows": {
+        "id": "object",
+        "created": "Int64",
+        "updated": "Int64",
+        "concept": "object",
+    },
+    # Score, day and revision of each card folded into the sentiment table
+    "scored": {
+        "source": "object",
+        "id": "object",
+        "revision": "Int64",
+        "day": "Int64",
+        "score": "float64",
+    },
+}
+
+# Tables updated together; a group with a missing or outdated table is
+# rebuilt as a whole
+_GROUPS = [("cards", "concepts", "card_rows"), ("sentiment", "scored")]
+
+
+def _empty(name: str) -> pd.DataFrame:
+    return pd.DataFrame(
+        {column: pd.Series(dtype=dtype) for column, dtype in _TABLES[name].items()}
+    )
+
+
+def _days(values: pd.Series) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Days since the epoch of a timestamp column and a mask of valid values.
+    """
+    timestamps = pd.to_datetime(values, errors="coerce")
+    if isinstance(timestamps.dtype, pd.DatetimeTZDtype):
+        timestamps = timestamps.dt.tz_localize(None)
+    days = timestamps.to_numpy(dtype="datetime64[ns]").astype("datetime64[D]")
+    valid = ~np.isnat(days)
+    return np.where(valid, days.astype(np.int64), 0), valid
+
+
+def _to_dates(days: np.ndarray) -> np.ndarray:
+    return (
+        np.asarray(days, dtype=np.int64)
+        .astype("datetime64[D]")
+        .astype("datetime64[ns]")
+    )
+
+
+def _nullable_days(values: pd.Series) -> pd.array:
+    days, valid = _days(values)
+    return pd.arrays.IntegerArray(days, ~valid)
+
+
+def _revisions(values: Optional[pd.Series], size: int) -> pd.array:
+    """
+    Nanosecond timestamps identifying the revision of each card (e.g. its
+    `updatedAt`), or missing values when there are none.
+    """
+    if values is None:
+        return pd.array([pd.NA] * size, dtype="Int64")
+    timestamps = pd.to_datetime(pd.Series(values), errors="coerce")
+    if isinstance(timestamps.dtype, pd.DatetimeTZDtype):
+        timestamps = timestamps.dt.tz_localize(None)
+    nanoseconds = timestamps.to_numpy(dtype="datetime64[ns]").astype(np.int64)
+    return pd.arrays.IntegerArray(nanoseconds, timestamps.isna().to_numpy())
+
+
+def _same(old: pd.Series, new: pd.Series) -> np.ndarray:
+    """
+    Elementwise equality, missing values being equal to each other.
+    """
+    equal = (old == new).fillna(False).to_numpy(dtype=bool)
+    return equal | (old.isna() & new.isna()).to_numpy()
+
+
+def _fold(
+    table: pd.DataFrame, keys: list, values: dict, removed: pd.DataFrame, added
+) -> pd.DataFrame:
+    """
+    Subtract the aggregates of `removed` rows from a table and add those of
+    `added` rows, dropping the keys left without cards.
+
+    Args:
+        table (pd.DataFrame): Aggregates by `keys`.
+        keys (list): Key columns.
+        values (dict): Aggregate column -> column summed (None to count rows).
+        removed, added (pd.DataFrame): Rows with the key and value columns;
+            rows with a missing key are left out.
+    """
+
+    def aggregate(rows, sign):
+        rows = rows.dropna(subset=keys)
+        frame = rows[keys].copy()
+        for column, source in values.items():
+            frame[column] = sign * (1 if source is None else rows[source])
+        return frame
+
+    count = next(column for column, source in values.items() if source is None)
+    folded = (
+        pd.concat([table, aggregate(removed, -1), aggregate(added, 1)])
+        .groupby(keys, as_index=False)[list(values)]
+        .sum()
+    )
+    folded = folded[folded[count] > 0].reset_index(drop=True)
+    return folded.astype(
+        {column: table[column].dtype for column in folded if column in table}
+    )
+
+
+class RollupStore:
+    """
+    Persistent daily rollups: cards per day, distinct concepts per day and a
+    sentiment sum and count per day.
+
+    Cards are identified by their ID; a card whose days or concept changed,
+    or that was deleted, is folded in again. Sentiment scores are identified
+    by the card ID and its revision (`updatedAt`).
+
+    Args:
+        path (str, optional): Directory of the Parquet tables. Defaults to
+            `CACHE_DIR/rollups`.
+    """
+
+    def __init__(self, path: Optional[str] = None):
+        self.path = path or os.path.join(constants.CACHE_DIR, "rollups")
+        self._lock = threading.Lock()
+        self._version = None
+        self._tables = {}
+        for group in _GROUPS:
+            tables = {name: self._load(name) for name in group}
+            if any(table is None for table in tables.values()):
+                # Missing or written by an older version: fold everything again
+                tables = {name: _empty(name) for name in group}
+            self._tables.update(tables)
+
+    def _load(self, name: str) -> Optional[pd.DataFrame]:
+        file = os.path.join(self.path, f"{name}.parquet")
+        if not os.path.exists(file):
+            return None
+        table = pd.read_parquet(file)
+        if list(table.columns) != list(_TABLES[name]):
+            return None
+        return table.astype(_TABLES[name])
+
+    def _save(self, *names: str) -> None:
+        os.makedirs(self.path, exist_ok=True)
+        for name in names:
+            # Replace at once, so that readers never see half a table
+            file = os.path.join(self.path, f"{name}.parquet")
+            self._tables[name].to_parquet(f"{file}.tmp", index=False)
+            os.replace(f"{file}.tmp", file)
+
+    def update_cards(
+        self,
+        df: pd.DataFrame,
+        id_column: str = "_id",
+        created_column: str = "createdAt",
+        updated_column: str = "updatedAt",
+        concept_column: str = "concept",
+    ) -> int:
+        """
+        Fold the cards that are new, changed or deleted since the last update
+        into the rollups.
+
+        `df` holds every card: cards missing from it are removed from the
+        rollups, sentiment scores included.
+
+        Args:
+            df (pd.DataFrame): The cards.
+            id_column (str): Column identifying a card.
+            created_column (str): Creation timestamp, the day of the card counts.
+            updated_column (str): Update timestamp, the day of the concept pairs.
+            concept_column (str): Concept of each card.
+
+        Returns:
+            int: The number of cards added, changed or removed.
+        """
+
+        with self._lock:
+            # Nothing to do for a frame version that was already folded in
+            version = df.attrs.get("version")
+            if version is not None and version == self._version:
+                return 0
+
+            rows = pd.DataFrame(
+                {
+                    "id": df[id_column].astype(str).to_numpy(),
+                    "created": _nullable_days(df[created_column]),
+                    "updated": _nullable_days(df[updated_column]),
+                    "concept": df[concept_column].to_numpy(dtype=object),
+                }
+            ).drop_duplicates("id", keep="last", ignore_index=True)
+            rows["concept"] = rows["concept"].where(rows["concept"].notna(), None)
+
+            merged = self._tables["card_rows"].merge(
+                rows, on="id", how="outer", suffixes=("_old", ""), indicator=True
+            )
+            same = (merged["_merge"] == "both").to_numpy()
+            for column in ("created", "updated", "concept"):
+                same &= _same(merged[f"{column}_old"], merged[column])
+            stale = ~same & (merged["_merge"] != "right_only").to_numpy()
+            fresh = ~same & (merged["_merge"] != "left_only").to_numpy()
+            deleted = merged.loc[(merged["_merge"] == "left_only").to_numpy(), "id"]
+
+            changes = int((~same).sum())
+            if changes:
+                self._tables["cards"] = _fold(
+                    self._tables["cards"],
+                    ["day"],
+                    {"cards": None},
+                    merged.loc[stale, ["created_old"]].set_axis(["day"], axis=1),
+                    merged.loc[fresh, ["created"]].set_axis(["day"], axis=1),
+                )
+                self._tables["concepts"] = _fold(
+                    self._tables["concepts"],
+                    ["day", "concept"],
+                    {"cards": None},
+                    merged.loc[stale, ["updated_old", "concept_old"]].set_axis(
+                        ["day", "concept"], axis=1
+                    ),
+                    merged.loc[fresh, ["updated", "concept"]].set_axis(
+                        ["day", "concept"], axis=1
+                    ),
+                )
+                self._tables["card_rows"] = rows
+                self._save("cards", "concepts", "card_rows")
+
+                if len(deleted):
+                    self._unscore(deleted)
+                    self._save("sentiment", "scored")
+                logger.info(
+                    f"Rolled up {changes} new, changed or deleted cards "
+                    f"({len(deleted)} deleted)"
+                )
+
+            self._version = version
+            return changes
+
+    def _unscore(self, ids: pd.Series, source: Optional[str] = None) -> None:
+        """
+        Subtract the scores of cards from the sentiment table (of one source,
+        or all of them) and forget them.
+        """
+        scored = self._tables["scored"]
+        removed = scored["id"].isin(ids).to_numpy()
+        if source is not None:
+            removed &= (scored["source"] == source).to_numpy()
+        old = scored.loc[removed]
+        self._tables["sentiment"] = _fold(
+            self._tables["sentiment"],
+            ["source", "day"],
+            {"sentiment_sum": "score", "sentiment_count": None},
+            old,
+            old.iloc[:0],
+        )
+        self._tables["scored"] = scored.loc[~removed].reset_index(drop=True)
+
+    def _unscored(self, ids: pd.Series, revisions: pd.array, source: str):
+        scored = self._tables["scored"]
+        scored = scored.loc[scored["source"] == source, ["id", "revision"]]
+        known = pd.DataFrame({"id": ids.to_numpy(), "revision": revisions})
+        merged = known.merge(
+            scored, on="id", how="left", suffixes=("", "_scored"), indicator=True
+        )
+        return ~(
+            (merged["_merge"] == "both").to_numpy()
+            & _same(merged["revision_scored"], merged["revision"])
+        )
+
+    def unscored(
+        self,
+        ids: pd.Series,
+        source: str = "default",
+        revisions: Optional[pd.Series] = None,
+    ) -> np.ndarray:
+        """
+        Mask of the cards whose sentiment score is not folded in yet, or was
+        folded in for another revision, e.g. to skip scoring when every card
+        is scored.
+        """
+        with self._lock:
+            ids = pd.Series(ids).astype(str).reset_index(drop=True)
+            return self._unscored(ids, _revisions(revisions, len(ids)), source)
+
+    def update_sentiments(
+        self,
+        ids: pd.Series,
+        timestamps: pd.Series,
+        scores,
+        source: str = "default",
+        revisions: Optional[pd.Series] = None,
+    ) -> int:
+        """
+        Fold the sentiment scores of cards not scored yet, or scored for
+        another revision, into the rollups.
+
+        Args:
+            ids (pd.Series): ID of each scored card.
+            timestamps (pd.Series): Creation timestamp of each card.
+            scores: Sentiment score of each card.
+            source (str): Name of the scoring model; each source has its own
+                rollup.
+            revisions (pd.Series, optional): Revision of each card (its
+                `updatedAt`); a card scored for another revision is scored
+                again. By default a card is scored once.
+
+        Returns:
+            int: The number of scores added or replaced.
+        """
+
+        with self._lock:
+            ids = pd.Series(ids).astype(str).reset_index(drop=True)
+            revisions = _revisions(revisions, len(ids))
+            new = self._unscored(ids, revisions, source)
+            if not new.any():
+                return 0
+
+            self._unscore(ids[new], source)
+            added = pd.DataFrame(
+                {
+                    "source": source,
+                    "id": ids[new].to_numpy(),
+                    "revision": revisions[new],
+                    "day": _nullable_days(pd.Series(timestamps).reset_index(drop=True))[
+                        new
+                    ],
+                    "score": np.asarray(scores, dtype=float)[new],
+                }
+            ).drop_duplicates("id", keep="last", ignore_index=True)
+            self._tables["sentiment"] = _fold(
+                self._tables["sentiment"],
+                ["source", "day"],
+                {"sentiment_sum": "score", "sentiment_count": None},
+                added.iloc[:0],
+                added,
+            )
+            self._tables["scored"] = pd.concat(
+                [self._tables["scored"], added], ignore_index=True
+            ).astype(_TABLES["scored"])
+            self._save("sentiment", "scored")
+            logger.info(f"Rolled up {new.sum()} new sentiment scores from {source}")
+            return int(new.sum())
+
+    def cards_per_day(self) -> pd.DataFrame:
+        """
+        Number of cards created per day, as `createdAt` and `count` columns.
+        """
+        with self._lock:
+            cards = self._tables["cards"].sort_values("day")
+            return pd.DataFrame(
+                {
+                    "createdAt": _to_dates(cards["day"]),
+                    "count": cards["cards"].to_numpy(),
+                }
+            )
+
+    def concepts_per_day(self) -> pd.DataFrame:
+        """
+        Number of distinct concepts updated per day, as `updatedAt` and `count`
+        columns.
+        """
+        with self._lock:
+            days, counts = np.unique(
+                self._tables["concepts"]["day"], return_counts=True
+            )
+            return pd.DataFrame({"updatedAt": _to_dates(days), "count": counts})
+
+    def sentiment_per_day(self, source: str = "default") -> pd.DataFrame:
+        """
+        Mean sentiment score per day over consecutive days (NaN for days
+        without scores), as `createdAt` and `sentiment_score` columns.
+        """
+        with self._lock:
+            sentiment = self._tables["sentiment"]
+            sentiment = sentiment[sentiment["source"] == source]
+            if sentiment.empty:
+                return pd.DataFrame(
+                    {"createdAt": pd.to_datetime([]), "sentiment_score": []}
+                )
+
+            first = sentiment["day"].min()
+            offsets = (sentiment["day"] - first).to_numpy()
+            sums = np.bincount(offsets, weights=sentiment["sentiment_sum"])
+            counts = np.bincount(offsets, weights=sentiment["sentiment_count"])
+            with np.errstate(invalid="ignore", divide="ignore"):
+                means = sums / counts
+            return pd.DataFrame(
+                {
+                    "createdAt": _to_dates(first + np.arange(len(sums))),
+                    "sentiment_score": means,
+                }
+            )
+
+    def daily(self, source: str = "default") -> pd.DataFrame:
+        """
+        All the rollups of a day in one row: `cards`, `concepts`,
+        `sentiment_sum` and `sentiment_count`.
+        """
+        cards = self.cards_per_day().rename(
+            columns={"createdAt": "day", "count": "cards"}
+        )
+        concepts = self.concepts_per_day().rename(
+            columns={"updatedAt": "day", "count": "concepts"}
+        )
+        with self._lock:
+            sentiment = self._tables["sentiment"]
+            sentiment = sentiment.loc[
+                sentiment["source"] == source,
+                ["day", "sentiment_sum", "sentiment_count"],
+            ].assign(day=lambda frame: _to_dates(frame["day"]))
+
+        daily = cards.merge(concepts, on="day", how="outer").merge(
+            sentiment, on="day", how="outer"
+        )
+        return (
+            daily.fillna(
+                {"cards": 0, "concepts": 0, "sentiment_sum": 0, "sentiment_count": 0}
+            )
+            .astype({"cards": "int64", "concepts": "int64", "sentiment_count": "int64"})
+            .sort_values("day", ignore_index=True)
+        )
+
+    def rebuild(self) -> None:
+        """
+        Drop every rollup; the next updates fold all the cards in again.
+        """
+        with self._lock:
+            self._tables = {name: _empty(name) for name in _TABLES}
+            self._version = None
+            self._save(*_TABLES)
+
+
+@st.cache_resource(show_spinner=False)
+def get_rollup_store() -> RollupStore:
+    """
+    The rollup store shared by every session.
+    """
+    return RollupStore()
@@ -0,0 +1,220 @@
+"""
+Versioned columnar snapshots of the card frame.
+
+The merged and normalized cards are written as Arrow IPC files under
+`CACHE_DIR/snapshots/`, one per version token, with low-cardinality string
+columns dictionary-encoded. A fresh snapshot lets a process start from a
+local file read instead of pulling every card from Mongo.
+
+Snapshots are loaded memory-mapped: only the columns asked for are touched,
+and numeric and timestamp columns without nulls are used in place, as
+read-only arrays, without being copied. Dictionary-encoded columns load as
+categoricals and list columns as Python lists. The IPC format is used rather
+than Parquet, whose pages must be decoded into new memory on every load.
+"""
+
+import hashlib
+import json
+import os
+import threading
+import time
+from typing import Optional
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+from loguru import logger
+
+from utils import constants
+
+# Configure Loguru
+logger.remove()  # Remove default logger to customize settings
+logger.add(
+    "logs/snapshot_logs.log",
+    rotation="10MB",
+    level="INFO",
+    format="{time} {level} {message}",
+)
+
+# Bumped when the layout of the snapshot files changes
+SNAPSHOT_FORMAT = 1
+
+
+class SnapshotError(Exception):
+    """
+    The cards cannot be stored as a snapshot.
+    """
+
+
+def _arrow_column(series: pd.Series) -> pa.Array:
+    """
+    Arrow array of a column, dictionary-encoding repetitive strings.
+
+    Scalars Arrow has no type for (such as Mongo ObjectIds) are stored as
+    strings; columns mixing containers and other values are refused.
+    """
+    try:
+        array = pa.array(series, from_pandas=True)
+    except (pa.ArrowInvalid, pa.ArrowTypeError, pa.ArrowNotImplementedError) as e:
+        values = series.dropna()
+        if values.map(lambda v: isinstance(v, (list, tuple, dict, np.ndarray))).any():
+            raise SnapshotError(f"Column {series.name!r} cannot be stored: {e}") from e
+        array = pa.array(
+            series.where(series.isna(), series.astype(str)), from_pandas=True
+        )
+
+    if (pa.types.is_string(array.type) or pa.types.is_large_string(array.type)) and len(
+        array
+    ):
+        distinct = len(pc.unique(array))
+        if distinct < constants.SNAPSHOT_DICTIONARY_RATIO * len(array):
+            array = array.dictionary_encode()
+    return array
+
+
+class CardSnapshots:
+    """
+    The snapshots of the card frame in a directory.
+
+    `latest.json` points at the newest snapshot; older versions are kept up to
+    `CARDS_SNAPSHOT_KEEP`.
+
+    Args:
+        path (str, optional): Directory of the snapshots. Defaults to
+            `CACHE_DIR/snapshots`.
+    """
+
+    def __init__(self, path: Optional[str] = None):
+        self.path = path or os.path.join(constants.CACHE_DIR, "snapshots")
+        self._lock = threading.Lock()
+
+    def _file(self, version: str) -> str:
+        # Version tokens hold characters such as ":" that file names may not
+        digest = hashlib.blake2b(version.encode("utf-8"), digest_size=8).hexdigest()
+        return os.path.join(self.path, f"cards-v{SNAPSHOT_FORMAT}-{digest}.arrow")
+
+    def latest(self) -> Optional[dict]:
+        """
+        `file`, `version`, `written` (epoch seconds) and `rows` of the newest
+        snapshot, or None if there is none in the current format.
+        """
+        try:
+            with open(os.path.join(self.path, "latest.json"), encoding="utf-8") as f:
+                info = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if info.get("format") != SNAPSHOT_FORMAT:
+            return None
+        return info
+
+    def write(self, df: pd.DataFrame) -> str:
+        """
+        Store the cards as the newest snapshot.
+
+        The version is read from `df.attrs["version"]`; a snapshot of the
+        same version is not written again.
+
+        Args:
+            df (pd.DataFrame): The normalized cards.
+
+        Returns:
+            str: The path of the snapshot.
+        """
+        version = str(df.attrs["version"])
+        file = self._file(version)
+        with self._lock:
+            if not os.path.exists(file):
+                table = pa.Table.from_arrays(
+                    [_arrow_column(df[column]) for column in df.columns],
+                    names=[str(column) for column in df.columns],
+                )
+                table = table.replace_schema_metadata({"version": version})
+                os.makedirs(self.path, exist_ok=True)
+                # Replace at once, so that readers never map half a file
+                with pa.OSFile(f"{file}.tmp", "wb") as sink:
+                    with pa.ipc.new_file(sink, table.schema) as writer:
+                        writer.write_table(table)
+                os.replace(f"{file}.tmp", file)
+                logger.info(
+                    f"Wrote card snapshot | Version: {version}, Rows: {len(df)}, "
+                    f"Bytes: {os.path.getsize(file)}"
+                )
+
+            info = {
+                "format": SNAPSHOT_FORMAT,
+                "file": os.path.basename(file),
+                "version": version,
+                "written": time.time(),
+                "rows": len(df),
+            }
+            latest = os.path.join(self.path, "latest.json")
+            with open(f"{latest}.tmp", "w", encoding="utf-8") as f:
+                json.dump(info, f)
+            os.replace(f"{latest}.tmp", latest)
+            self._prune(keep=os.path.basename(file))
+        return file
+
+    def _prune(self, keep: str) -> None:
+        snapshots = sorted(
+            (
+                entry
+                for entry in os.scandir(self.path)
+                if entry.name.startswith("cards-") and entry.name.endswith(".arrow")
+            ),
+            key=lambda entry: entry.stat().st_mtime,
+            reverse=True,
+        )
+        for entry in snapshots[constants.CARDS_SNAPSHOT_KEEP :]:
+            if entry.name != keep:
+                os.remove(entry.path)
+
+    def load(
+        self, columns: Optional[list] = None, max_age: Optional[float] = None
+    ) -> Optional[pd.DataFrame]:
+        """
+        Load the newest snapshot, memory-mapped.
+
+        Args:
+            columns (list, optional): Columns to load; all by default. Columns
+                missing from the snapshot are left out.
+            max_age (float, optional): Seconds after which the snapshot is too
+                old to be used.
+
+        Returns:
+            pd.DataFrame: The cards, with their version in `attrs["version"]`,
+            or None if there is no usable snapshot.
+        """
+        info = self.latest()
+        if info is None:
+            return None
+        if max_age is not None and time.time() - info["written"] > max_age:
+            return None
+
+        try:
+            # The table keeps the file mapped for as long as its columns live
+            table = pa.ipc.open_file(
+                pa.memory_map(os.path.join(self.path, info["file"]))
+            ).read_all()
+        except (OSError, pa.ArrowInvalid) as e:
+            logger.warning(f"Card snapshot unreadable | {info['file']}: {e}")
+            return None
+        if columns is not None:
+            table = table.select([c for c in columns if c in table.column_names])
+
+        df = table.to_pandas(split_blocks=True)
+        for field in table.schema:
+            if pa.types.is_list(field.type) or pa.types.is_large_list(field.type):
+                # Arrow lists come back as arrays; the app expects Python lists
+                df[field.name] = table.column(field.name).to_pylist()
+        df.attrs["version"] = info["version"]
+        return df
+
+
+def get_card_snapshots() -> Optional[CardSnapshots]:
+    """
+    The card snapshots, or None when `CARDS_SNAPSHOT` disables them.
+    """
+    if not constants.CARDS_SNAPSHOT:
+        return None
+    return CardSnapshots()
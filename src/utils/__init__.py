@@ -9,6 +9,13 @@ Initialization file for the utils package.
 from . import constants
 
 # Re-export utility functions.
+from .cache import (
+    MemoryCache,
+    estimate_nbytes,
+    memory_cache_evictions,
+    memory_cache_stats,
+    memory_cached,
+)
 from .functions import (
     clean_colors,
     clean_mana_cost,
@@ -17,13 +24,30 @@ from .functions import (
     is_valid_chart_data,
     sort_strings,
 )
+from .metrics import start_metrics_server
+from .singleflight import SingleFlight, singleflight, singleflight_stats
+from .spans import SpanCollector, cache_miss, span, start_collection, traced
 
 __all__ = [
+    "MemoryCache",
+    "SingleFlight",
+    "SpanCollector",
+    "cache_miss",
     "clean_colors",
     "clean_mana_cost",
     "clean_timestamp",
     "constants",
+    "estimate_nbytes",
     "is_row_valid",
     "is_valid_chart_data",
+    "memory_cache_evictions",
+    "memory_cache_stats",
+    "memory_cached",
+    "singleflight",
+    "singleflight_stats",
     "sort_strings",
+    "span",
+    "start_collection",
+    "start_metrics_server",
+    "traced",
 ]
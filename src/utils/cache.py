@@ -0,0 +1,383 @@
+"""
+In-memory cache of the pipeline stages under a global memory budget.
+
+The Streamlit caches only expire their entries after their TTL, so every
+distinct argument set of a stage keeps its embeddings, graph or frame in
+memory until then. `memory_cache` instead tracks the size of each entry
+(see `estimate_nbytes`) and, once the entries of all the stages exceed
+`CACHE_MAX_BYTES`, evicts entries according to `CACHE_POLICY`:
+
+- "greedydual" (GreedyDual-Size): the entry to evict is the one that is
+  cheapest to recompute per byte held, aged so that entries not used for a
+  while eventually go even if they were expensive;
+- "lru": the least recently used entry.
+
+Every eviction is logged with its reason ("budget", "expired", "oversize" or
+"cleared"), counted in `nerdash_cache_evictions_total{cache, reason}` and
+kept in `memory_cache.evictions` for the dashboard.
+"""
+
+import functools
+import inspect
+import sys
+import threading
+import time
+from collections import deque
+from typing import Any, Callable, Optional
+
+import numpy as np
+import pandas as pd
+from loguru import logger
+
+from utils import constants
+from utils.metrics import CACHE_BYTES, CACHE_EVICTIONS
+from utils.singleflight import call_key
+
+# Configure Loguru
+logger.remove()  # Remove default logger to customize settings
+logger.add(
+    "logs/cache_logs.log",
+    rotation="10MB",
+    level="INFO",
+    format="{time} {level} {message}",
+)
+
+POLICIES = ("greedydual", "lru")
+
+
+def estimate_nbytes(value: Any, _seen: Optional[set] = None) -> int:
+    """
+    Approximate memory held by a value.
+
+    DataFrames, Series, NumPy arrays and tensors report their buffers;
+    networkx graphs, Plotly figures and containers are walked, counting
+    every object once.
+
+    Args:
+        value: The value.
+
+    Returns:
+        int: The size in bytes.
+    """
+    if _seen is None:
+        _seen = set()
+    if id(value) in _seen:
+        return 0
+    _seen.add(id(value))
+
+    if isinstance(value, pd.DataFrame):
+        return int(value.memory_usage(index=True, deep=True).sum())
+    if isinstance(value, (pd.Series, pd.Index)):
+        return int(value.memory_usage(deep=True))
+    if isinstance(value, np.ndarray):
+        return int(value.nbytes)
+    if hasattr(value, "element_size") and hasattr(value, "nelement"):
+        # torch tensors
+        return int(value.element_size() * value.nelement())
+    if hasattr(value, "_adj") and hasattr(value, "_node"):
+        # networkx graphs: their node and adjacency dicts
+        return sys.getsizeof(value) + estimate_nbytes(
+            (value.graph, value._node, value._adj), _seen
+        )
+    if hasattr(value, "to_plotly_json"):
+        return estimate_nbytes(value.to_plotly_json(), _seen)
+    if isinstance(value, dict):
+        return sys.getsizeof(value) + sum(
+            estimate_nbytes(key, _seen) + estimate_nbytes(item, _seen)
+            for key, item in value.items()
+        )
+    if isinstance(value, (list, tuple, set, frozenset)):
+        return sys.getsizeof(value) + sum(
+            estimate_nbytes(item, _seen) for item in value
+        )
+    return sys.getsizeof(value)
+
+
+class _Entry:
+    """
+    A cached value and what the eviction policy needs to know about it.
+    """
+
+    __slots__ = ("cache", "cost", "expires", "last_used", "nbytes", "priority", "value")
+
+    def __init__(self, value, cache, nbytes, cost, expires):
+        self.value = value
+        self.cache = cache
+        self.nbytes = nbytes
+        self.cost = cost
+        self.expires = expires
+        self.last_used = 0
+        self.priority = 0.0
+
+
+class MemoryCache:
+    """
+    Cache of values under a memory budget shared by all its callers.
+
+    Args:
+        max_bytes (int): Budget of the summed entry sizes.
+        policy (str): Eviction policy, "greedydual" or "lru".
+        log_size (int): Number of recent evictions kept in `evictions`.
+
+    Attributes:
+        evictions (deque): The recent evictions: time, cache, bytes, seconds
+            it took to compute the entry and reason.
+    """
+
+    def __init__(
+        self,
+        max_bytes: int = constants.CACHE_MAX_BYTES,
+        policy: str = constants.CACHE_POLICY,
+        log_size: int = constants.CACHE_EVICTION_LOG_SIZE,
+    ):
+        if policy not in POLICIES:
+            raise ValueError(f"Unknown cache policy {policy!r}, expected {POLICIES}")
+        self.max_bytes = max_bytes
+        self.policy = policy
+        self.nbytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evicted = 0
+        self.evictions: deque = deque(maxlen=log_size)
+        self._entries: dict[str, _Entry] = {}
+        self._bytes_by_cache: dict[str, int] = {}
+        # GreedyDual "inflation": priority of the last evicted entry
+        self._floor = 0.0
+        self._clock = 0
+        self._lock = threading.Lock()
+
+    def _touch(self, entry: _Entry) -> None:
+        self._clock += 1
+        entry.last_used = self._clock
+        if self.policy == "greedydual":
+            entry.priority = self._floor + entry.cost / max(entry.nbytes, 1)
+        else:
+            entry.priority = self._clock
+
+    def _remove(self, key: str, reason: str) -> None:
+        entry = self._entries.pop(key)
+        self.nbytes -= entry.nbytes
+        self._bytes_by_cache[entry.cache] -= entry.nbytes
+        CACHE_BYTES.set(self._bytes_by_cache[entry.cache], cache=entry.cache)
+        if reason == "replaced":
+            return
+        if reason == "budget" and self.policy == "greedydual":
+            self._floor = entry.priority
+        self._record_eviction(entry.cache, entry.nbytes, entry.cost, reason)
+
+    def _record_eviction(self, cache: str, nbytes: int, cost: float, reason: str):
+        if reason != "cleared":
+            self.evicted += 1
+        CACHE_EVICTIONS.inc(cache=cache, reason=reason)
+        self.evictions.append(
+            {
+                "time": time.time(),
+                "cache": cache,
+                "nbytes": nbytes,
+                "cost_seconds": round(cost, 3),
+                "reason": reason,
+            }
+        )
+        logger.info(
+            f"Evicted {cache} entry | {nbytes} bytes, "
+            f"{cost:.3f}s to recompute, reason: {reason}"
+        )
+
+    def get(self, key: str, default: Any = None) -> Any:
+        """
+        The value cached for a key, or `default`, counting the hit or miss.
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry.expires <= time.monotonic():
+                self._remove(key, "expired")
+                entry = None
+            if entry is None:
+                self.misses += 1
+                return default
+            self.hits += 1
+            self._touch(entry)
+            return entry.value
+
+    def put(
+        self,
+        key: str,
+        value: Any,
+        cache: str = "memory",
+        cost: float = 0.0,
+        ttl: Optional[float] = None,
+        nbytes: Optional[int] = None,
+    ) -> bool:
+        """
+        Store a value, evicting entries to stay within the budget.
+
+        Args:
+            key (str): Key of the value.
+            value: The value.
+            cache (str): Name of the caller (e.g. the cached function), used
+                in the metrics and the eviction log.
+            cost (float): Seconds it took to compute the value.
+            ttl (float, optional): Seconds after which the entry expires.
+            nbytes (int, optional): Size of the value; estimated by default.
+
+        Returns:
+            bool: Whether the value was stored; a value larger than the whole
+            budget is not.
+        """
+        if nbytes is None:
+            nbytes = estimate_nbytes(value)
+        expires = time.monotonic() + ttl if ttl is not None else float("inf")
+        entry = _Entry(value, cache, nbytes, cost, expires)
+        with self._lock:
+            if key in self._entries:
+                self._remove(key, "replaced")
+            if nbytes > self.max_bytes:
+                # Too large to keep even alone
+                self._record_eviction(cache, nbytes, cost, "oversize")
+                return False
+
+            self._evict_expired()
+            while self.nbytes + nbytes > self.max_bytes:
+                victim = min(
+                    self._entries,
+                    key=lambda k: (
+                        self._entries[k].priority,
+                        self._entries[k].last_used,
+                    ),
+                )
+                self._remove(victim, "budget")
+
+            self._touch(entry)
+            self._entries[key] = entry
+            self.nbytes += nbytes
+            self._bytes_by_cache[cache] = self._bytes_by_cache.get(cache, 0) + nbytes
+            CACHE_BYTES.set(self._bytes_by_cache[cache], cache=cache)
+            return True
+
+    def _evict_expired(self) -> None:
+        now = time.monotonic()
+        for key in [k for k, entry in self._entries.items() if entry.expires <= now]:
+            self._remove(key, "expired")
+
+    def clear(self, cache: Optional[str] = None) -> None:
+        """
+        Drop every entry, or the entries of one caller.
+        """
+        with self._lock:
+            for key in [
+                k
+                for k, entry in self._entries.items()
+                if cache is None or entry.cache == cache
+            ]:
+                self._remove(key, "cleared")
+
+    def stats(self) -> dict:
+        """
+        Size, budget and counters of the cache, and the bytes per caller.
+        """
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evicted,
+                "entries": len(self._entries),
+                "bytes": self.nbytes,
+                "max_bytes": self.max_bytes,
+                "policy": self.policy,
+                "bytes_by_cache": {
+                    name: nbytes
+                    for name, nbytes in self._bytes_by_cache.items()
+                    if nbytes
+                },
+            }
+
+    def recent_evictions(self) -> pd.DataFrame:
+        """
+        The recent evictions, newest first, with their reason.
+        """
+        with self._lock:
+            evictions = list(self.evictions)
+        columns = ["time", "cache", "nbytes", "cost_seconds", "reason"]
+        df = pd.DataFrame(evictions[::-1], columns=columns)
+        df["time"] = pd.to_datetime(df["time"], unit="s")
+        return df
+
+
+memory_cache = MemoryCache()
+
+
+def _copy(value: Any) -> Any:
+    if isinstance(value, (pd.DataFrame, pd.Series, np.ndarray)):
+        return value.copy()
+    if isinstance(value, (list, tuple)):
+        return type(value)(_copy(item) for item in value)
+    return value
+
+
+def memory_cached(
+    func: Callable = None,
+    *,
+    ttl: Optional[float] = None,
+    copy: bool = False,
+    cache: MemoryCache = None,
+) -> Callable:
+    """
+    Decorator caching the results of a function in `memory_cache`.
+
+    It replaces `st.cache_data` / `st.cache_resource` on the stages holding
+    large results, and keys calls like them: parameters starting with an
+    underscore are left out. Like theirs, the wrapper has a `clear` method,
+    so `traced` and `cache_miss` record its hits and misses.
+
+    Args:
+        func (Callable): The function.
+        ttl (float, optional): Seconds after which a result expires.
+        copy (bool): Return copies of the cached frames and arrays, as
+            `st.cache_data` does, so callers may modify them.
+        cache (MemoryCache, optional): Defaults to `memory_cache`.
+
+    Returns:
+        Callable: The wrapped function.
+    """
+
+    def decorate(func):
+        signature = inspect.signature(func)
+        name = func.__name__
+        missing = object()
+
+        def target() -> MemoryCache:
+            # Looked up on each call, so tests may swap the module cache
+            return cache or memory_cache
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            bound = signature.bind(*args, **kwargs)
+            bound.apply_defaults()
+            key = f"{func.__module__}.{func.__qualname__}:{call_key(bound.arguments)}"
+            value = target().get(key, missing)
+            if value is missing:
+                started = time.perf_counter()
+                value = func(*args, **kwargs)
+                target().put(
+                    key, value, cache=name, cost=time.perf_counter() - started, ttl=ttl
+                )
+            return _copy(value) if copy else value
+
+        wrapper.clear = lambda: target().clear(name)
+        return wrapper
+
+    return decorate(func) if func is not None else decorate
+
+
+def memory_cache_stats() -> dict:
+    """
+    Counters of the in-memory stage cache (see `MemoryCache.stats`).
+    """
+    return memory_cache.stats()
+
+
+def memory_cache_evictions() -> pd.DataFrame:
+    """
+    Recent evictions of the in-memory stage cache and their reasons.
+    """
+    return memory_cache.recent_evictions()
@@ -19,6 +19,37 @@ if not MONGO_URI:
     if not MONGO_URI:
         raise EnvironmentError("MONGO_URI environment variable not set")
 
+# Local directory for persisted artifacts (dedup mappings, layouts, ...)
+CACHE_DIR = os.environ.get("CACHE_DIR", ".cache")
+
+# Arrow snapshots of the card frame under CACHE_DIR/snapshots. A snapshot
+# younger than CARDS_SNAPSHOT_MAX_AGE seconds is loaded instead of querying
+# Mongo; CARDS_SNAPSHOT=0 disables them
+CARDS_SNAPSHOT = os.environ.get("CARDS_SNAPSHOT", "1") not in ("", "0")
+CARDS_SNAPSHOT_MAX_AGE = float(os.environ.get("CARDS_SNAPSHOT_MAX_AGE", 3600))
+# Snapshot versions kept on disk
+CARDS_SNAPSHOT_KEEP = 3
+# String columns with fewer distinct values than this share of the rows are
+# stored dictionary-encoded (loaded as categoricals)
+SNAPSHOT_DICTIONARY_RATIO = 0.5
+
+# Card columns read by the dashboard sections; the raw data view reads all
+CARD_COLUMNS = [
+    "_id",
+    "name",
+    "flavorText",
+    "type",
+    "retrievalCount",
+    "createdAt",
+    "updatedAt",
+]
+
+# Raw data explorer: page sizes offered (the first is the default) and the
+# characters a cell shows before it is shortened
+EXPLORER_PAGE_SIZES = [50, 100, 250]
+EXPLORER_PAGE_SIZE = EXPLORER_PAGE_SIZES[0]
+EXPLORER_MAX_CHARS = 120
+
 # Define color maps from MTG colors
 COLOR_TO_HEX_MAP = {
     "B": "#000000",  # Black
@@ -76,6 +107,76 @@ COLOR_TO_LABEL_MAP = {
     "Rainbow": "WUBRG",
 }
 
+# Hugging Face models used by the NLP stages
+EMBEDDING_MODEL = "sentence-transformers/all-MiniLM-L12-v2"
+SENTIMENT_MODEL = "tabularisai/multilingual-sentiment-analysis"
+
+# Five-point scale of the sentiment model labels
+SENTIMENT_MAPPING = {
+    "Very Negative": -2,
+    "Negative": -1,
+    "Neutral": 0,
+    "Positive": 1,
+    "Very Positive": 2,
+}
+
+# Edge count above which graph traces are rendered with WebGL
+WEBGL_EDGE_THRESHOLD = 2000
+
+# Node count above which the similarity graph opens as a community overview
+GRAPH_LOD_THRESHOLD = 200
+
+# Point count above which the t-SNE scatter is rendered as a density image
+TSNE_RASTER_THRESHOLD = 20000
+# Resolution (bins per axis) of the t-SNE density image
+TSNE_RASTER_BINS = 400
+# Most points drawn with hover labels over the density image
+TSNE_HOVER_POINTS = 5000
+
+# Number of chart figures kept by the figure cache
+FIGURE_CACHE_SIZE = 64
+
+# Assumed width (pixels) of a full-width chart and the horizontal pixels per
+# point below which line charts are downsampled
+CHART_VIEWPORT_WIDTH = 1200
+CHART_PIXELS_PER_POINT = 2
+
+# Background NLP jobs: worker threads, seconds between progress polls and
+# seconds without a poll after which a session stops keeping a job alive
+JOB_WORKERS = 2
+JOB_POLL_INTERVAL = 1.0
+JOB_HEARTBEAT_TIMEOUT = 30.0
+# Seconds a finished job is kept for the sessions yet to read its result (the
+# stage caches hold it afterwards), seconds before a failed job is run again
+# and seconds a rerun waits for a job before showing its progress
+JOB_RESULT_TTL = 60.0
+JOB_RETRY_BACKOFF = 60.0
+JOB_WAIT = 0.2
+
+# Local Prometheus endpoint of the process; an empty METRICS_PORT disables it
+METRICS_HOST = os.environ.get("METRICS_HOST", "127.0.0.1")
+METRICS_PORT = os.environ.get("METRICS_PORT", "9464")
+METRICS_PORT = int(METRICS_PORT) if METRICS_PORT else None
+# Seconds between two measurements of the memory held by the Streamlit caches
+METRICS_SIZE_INTERVAL = 60.0
+
+# Memory budget (bytes) of the in-memory cache of the pipeline stages, its
+# eviction policy ("greedydual" or "lru") and the evictions kept for display
+CACHE_MAX_BYTES = int(os.environ.get("CACHE_MAX_BYTES", 2 * 2**30))
+CACHE_POLICY = os.environ.get("CACHE_POLICY", "greedydual")
+CACHE_EVICTION_LOG_SIZE = 200
+
+# Shared inference server (`python -m controllers.inference`); when
+# INFERENCE_URL is set the NLP stages send their texts to it
+INFERENCE_URL = os.environ.get("INFERENCE_URL", "")
+# Most texts per model call and seconds a batch waits for more texts
+INFERENCE_MAX_BATCH_SIZE = 64
+INFERENCE_MAX_WAIT = 0.01
+# Texts per request of a stage (one progress update each) and seconds to
+# wait for a request
+INFERENCE_CHUNK_SIZE = 256
+INFERENCE_TIMEOUT = 300.0
+
 ERROR_MESSAGE_DATA_NONE = "Data cannot be None."
 ERROR_MESSAGE_DATA_NOT_DF_OR_DICT = "Data must be a pandas DataFrame or a dictionary"
 ERROR_MESSAGE_COLUMN_NOT_IN_DF = "column argument is not in the DataFrame data."
@@ -0,0 +1,384 @@
+"""
+Process metrics in the Prometheus text format.
+
+A small registry of counters, gauges and histograms with labels, served on a
+local HTTP endpoint (`http://METRICS_HOST:METRICS_PORT/metrics`) by a daemon
+thread of the Streamlit process.
+
+The pipeline metrics are derived from the timing spans (see `utils.spans`):
+
+- `nerdash_stage_duration_seconds{stage}`: latency of every stage call;
+- `nerdash_cache_requests_total{cache, result}`: hits and misses of the
+  cached stages and of the figure cache;
+- `nerdash_inference_items_total{stage}` and
+  `nerdash_inference_seconds_total{stage}`: items run through the models and
+  time spent doing so, whose ratio is the model throughput.
+
+Cache evictions and the resident bytes of the caches
+(`nerdash_cache_resident_bytes{cache}`) are reported by the caches
+themselves and, for the Streamlit caches, measured when scraped.
+"""
+
+import http.server
+import math
+import threading
+import time
+from typing import Callable, Optional
+
+from loguru import logger
+from streamlit.runtime.caching import (
+    get_data_cache_stats_provider,
+    get_resource_cache_stats_provider,
+)
+
+from utils import constants
+from utils.spans import add_listener
+
+# Configure Loguru
+logger.remove()  # Remove default logger to customize settings
+logger.add(
+    "logs/metrics_logs.log",
+    rotation="10MB",
+    level="INFO",
+    format="{time} {level} {message}",
+)
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names: tuple, values: tuple, extra: str = "") -> str:
+    pairs = [
+        f'{name}="{_escape(value)}"' for name, value in zip(names, values, strict=True)
+    ]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _format_value(value: float) -> str:
+    if math.isinf(value):
+        return "+Inf" if value > 0 else "-Inf"
+    return repr(float(value)) if value != int(value) else str(int(value))
+
+
+class _Metric:
+    """
+    A metric family: one value per combination of label values.
+    """
+
+    kind = "untyped"
+
+    def __init__(self, name: str, help: str, labels: tuple = ()):
+        self.name = name
+        self.help = help
+        self.labels = tuple(labels)
+        self._values: dict[tuple, object] = {}
+        self._lock = threading.Lock()
+
+    def _key(self, labels: dict) -> tuple:
+        if set(labels) != set(self.labels):
+            raise ValueError(
+                f"{self.name} takes the labels {self.labels}, got {tuple(labels)}"
+            )
+        return tuple(str(labels[name]) for name in self.labels)
+
+    def value(self, **labels):
+        """
+        Current value for the given label values (None if never set).
+        """
+        with self._lock:
+            return self._values.get(self._key(labels))
+
+    def samples(self) -> list:
+        """
+        Lines of the exposition format for this family.
+        """
+        with self._lock:
+            values = dict(self._values)
+        return [
+            f"{self.name}{_format_labels(self.labels, key)} {_format_value(value)}"
+            for key, value in sorted(values.items())
+        ]
+
+
+class Counter(_Metric):
+    """
+    A value that only goes up.
+    """
+
+    kind = "counter"
+
+    def inc(self, amount: float = 1, **labels) -> None:
+        if amount < 0:
+            raise ValueError("Counters can only increase")
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+
+class Gauge(_Metric):
+    """
+    A value that goes up and down.
+    """
+
+    kind = "gauge"
+
+    def set(self, value: float, **labels) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = value
+
+    def inc(self, amount: float = 1, **labels) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+
+class Histogram(_Metric):
+    """
+    Distribution of observed values in cumulative buckets.
+
+    Args:
+        buckets (tuple): Upper bounds of the buckets, in increasing order.
+    """
+
+    kind = "histogram"
+
+    def __init__(
+        self, name: str, help: str, labels: tuple = (), buckets=DEFAULT_BUCKETS
+    ):
+        super().__init__(name, help, labels)
+        self.buckets = (*sorted(buckets), math.inf)
+
+    def observe(self, value: float, **labels) -> None:
+        key = self._key(labels)
+        with self._lock:
+            counts, total = self._values.get(key, ([0] * len(self.buckets), 0.0))
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    counts[i] += 1
+            self._values[key] = (counts, total + value)
+
+    def samples(self) -> list:
+        with self._lock:
+            values = {key: (list(c), s) for key, (c, s) in self._values.items()}
+        lines = []
+        for key, (counts, total) in sorted(values.items()):
+            for bound, count in zip(self.buckets, counts, strict=True):
+                le = f'le="{_format_value(bound)}"'
+                lines.append(
+                    f"{self.name}_bucket{_format_labels(self.labels, key, le)} {count}"
+                )
+            labels = _format_labels(self.labels, key)
+            lines.append(f"{self.name}_sum{labels} {_format_value(total)}")
+            lines.append(f"{self.name}_count{labels} {counts[-1]}")
+        return lines
+
+
+class MetricsRegistry:
+    """
+    The metric families of the process and the collectors refreshing them.
+    """
+
+    def __init__(self):
+        self._metrics: dict[str, _Metric] = {}
+        self._collectors: list[Callable[[], None]] = []
+        self._lock = threading.Lock()
+
+    def _register(self, cls, name, help, labels, **kwargs) -> _Metric:
+        with self._lock:
+            metric = self._metrics.get(name)
+            if metric is None:
+                metric = self._metrics[name] = cls(name, help, labels, **kwargs)
+            elif not isinstance(metric, cls) or metric.labels != tuple(labels):
+                raise ValueError(f"{name} is already registered differently")
+            return metric
+
+    def counter(self, name: str, help: str, labels: tuple = ()) -> Counter:
+        return self._register(Counter, name, help, labels)
+
+    def gauge(self, name: str, help: str, labels: tuple = ()) -> Gauge:
+        return self._register(Gauge, name, help, labels)
+
+    def histogram(
+        self, name: str, help: str, labels: tuple = (), buckets=DEFAULT_BUCKETS
+    ) -> Histogram:
+        return self._register(Histogram, name, help, labels, buckets=buckets)
+
+    def add_collector(self, collector: Callable[[], None]) -> None:
+        """
+        Call `collector` before every scrape, e.g. to set gauges measured
+        on demand.
+        """
+        with self._lock:
+            self._collectors.append(collector)
+
+    def render(self) -> str:
+        """
+        All the metrics in the Prometheus text exposition format.
+        """
+        with self._lock:
+            collectors = list(self._collectors)
+            metrics = list(self._metrics.values())
+        for collector in collectors:
+            try:
+                collector()
+            except Exception as e:
+                logger.error(f"Metrics collector failed | {collector}: {e}")
+
+        lines = []
+        for metric in metrics:
+            lines.append(f"# HELP {metric.name} {_escape(metric.help)}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            lines.extend(metric.samples())
+        return "\n".join(lines) + "\n"
+
+
+registry = MetricsRegistry()
+
+STAGE_DURATION = registry.histogram(
+    "nerdash_stage_duration_seconds",
+    "Duration of the pipeline stage calls, cache hits included.",
+    ("stage",),
+)
+CACHE_REQUESTS = registry.counter(
+    "nerdash_cache_requests_total",
+    "Requests to the cached stages and figures, by result (hit or miss).",
+    ("cache", "result"),
+)
+CACHE_EVICTIONS = registry.counter(
+    "nerdash_cache_evictions_total",
+    "Entries evicted from the bounded caches, by reason.",
+    ("cache", "reason"),
+)
+CACHE_BYTES = registry.gauge(
+    "nerdash_cache_resident_bytes",
+    "Memory held by the entries of each cache.",
+    ("cache",),
+)
+INFERENCE_ITEMS = registry.counter(
+    "nerdash_inference_items_total",
+    "Texts run through the models.",
+    ("stage",),
+)
+INFERENCE_SECONDS = registry.counter(
+    "nerdash_inference_seconds_total",
+    "Time spent running the models.",
+    ("stage",),
+)
+
+# Stages running a model when they miss their cache
+INFERENCE_STAGES = {"embed", "sentiment"}
+
+
+def record_span(record: dict) -> None:
+    """
+    Update the stage metrics from a finished span.
+    """
+    if record.get("kind") == "section":
+        return
+    seconds = record["duration_ms"] / 1000
+    stage = record["name"]
+    STAGE_DURATION.observe(seconds, stage=stage)
+
+    cached = record.get("cached")
+    if cached is None:
+        return
+    cache = record.get("function", stage)
+    CACHE_REQUESTS.inc(cache=cache, result="hit" if cached else "miss")
+    if not cached and stage in INFERENCE_STAGES and record.get("size"):
+        INFERENCE_ITEMS.inc(record["size"], stage=stage)
+        INFERENCE_SECONDS.inc(seconds, stage=stage)
+
+
+add_listener(record_span)
+
+
+# When the Streamlit caches were last measured
+_sizes_measured = 0.0
+
+
+def collect_streamlit_cache_bytes() -> None:
+    """
+    Resident bytes of the `st.cache_data` and `st.cache_resource` caches,
+    by cached function.
+
+    Sizing the resources (models, graphs) walks their objects, so they are
+    measured at most every `METRICS_SIZE_INTERVAL` seconds.
+    """
+    global _sizes_measured
+    now = time.monotonic()
+    if now - _sizes_measured < constants.METRICS_SIZE_INTERVAL:
+        return
+    _sizes_measured = now
+
+    for provider in (
+        get_data_cache_stats_provider(),
+        get_resource_cache_stats_provider(),
+    ):
+        for stat in provider.get_stats():
+            # Display names are qualified, e.g. "controllers.nlp.compute_embeddings"
+            CACHE_BYTES.set(stat.byte_length, cache=stat.cache_name.split(".")[-1])
+
+
+registry.add_collector(collect_streamlit_cache_bytes)
+
+
+class _MetricsHandler(http.server.BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path.split("?")[0] != "/metrics":
+            self.send_error(404)
+            return
+        body = registry.render().encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        # Scrapes would otherwise be printed to stderr
+        pass
+
+
+_server = None
+_server_lock = threading.Lock()
+
+
+def start_metrics_server(
+    port: Optional[int] = constants.METRICS_PORT, host: str = constants.METRICS_HOST
+) -> Optional[http.server.ThreadingHTTPServer]:
+    """
+    Serve the metrics on `http://host:port/metrics` from a daemon thread.
+
+    The server is started once per process; later calls return it.
+
+    Args:
+        port (int, optional): Port to listen on; None disables the endpoint
+            and 0 picks a free port.
+        host (str): Interface to listen on.
+
+    Returns:
+        ThreadingHTTPServer: The server, or None if disabled or the port is
+        taken (e.g. by another replica on the same host).
+    """
+    global _server
+    with _server_lock:
+        if _server is not None or port is None:
+            return _server
+        try:
+            server = http.server.ThreadingHTTPServer((host, port), _MetricsHandler)
+        except OSError as e:
+            logger.warning(f"Metrics endpoint not started | {host}:{port}: {e}")
+            return None
+        server.daemon_threads = True
+        threading.Thread(
+            target=server.serve_forever, name="metrics-server", daemon=True
+        ).start()
+        logger.info(f"Serving metrics on http://{host}:{server.server_port}/metrics")
+        _server = server
+        return server
@@ -0,0 +1,209 @@
+"""
+Single-flight coalescing of identical expensive calls.
+
+When several sessions miss the Streamlit caches at the same time (typically
+right after they expire), each would run the same stage. With single-flight,
+the first caller of a key runs the function and the concurrent callers of
+the same key wait for it and share its result (or its exception).
+"""
+
+import functools
+import hashlib
+import inspect
+import json
+import threading
+from typing import Any, Callable
+
+import numpy as np
+import pandas as pd
+from loguru import logger
+
+# Configure Loguru
+logger.remove()  # Remove default logger to customize settings
+logger.add(
+    "logs/singleflight_logs.log",
+    rotation="10MB",
+    level="INFO",
+    format="{time} {level} {message}",
+)
+
+
+class _Call:
+    """
+    An in-flight call and, once it is over, its outcome.
+    """
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+        self.waiters = 0
+
+
+class SingleFlight:
+    """
+    Runs at most one call per key at a time.
+
+    Args:
+        name (str): Name of the group, used in logs and metrics.
+    """
+
+    def __init__(self, name: str):
+        self.name = name
+        self._lock = threading.Lock()
+        self._calls: dict[str, _Call] = {}
+        self.calls = 0
+        self.executions = 0
+        self.coalesced = 0
+
+    def do(self, key: str, fn: Callable, *args, **kwargs) -> Any:
+        """
+        Run `fn(*args, **kwargs)`, unless a call with the same key is in
+        flight, in which case wait for that call and return its result.
+
+        Args:
+            key (str): Identity of the call.
+            fn (Callable): The function to run.
+
+        Returns:
+            The result of the call; its exception is raised to every caller.
+        """
+        with self._lock:
+            self.calls += 1
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+                self.executions += 1
+            else:
+                call.waiters += 1
+                self.coalesced += 1
+
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            call.result = fn(*args, **kwargs)
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+            if call.waiters:
+                logger.info(
+                    f"{self.name}: {call.waiters} concurrent calls shared one execution"
+                )
+        return call.result
+
+    def stats(self) -> dict:
+        """
+        Calls made, executions run and calls coalesced into another execution.
+        """
+        with self._lock:
+            return {
+                "calls": self.calls,
+                "executions": self.executions,
+                "coalesced": self.coalesced,
+                "in_flight": len(self._calls),
+            }
+
+
+# Every group created by `singleflight`, by name
+_groups: dict[str, SingleFlight] = {}
+
+
+# Values that cannot be encoded as JSON at once
+_NESTED = (np.ndarray, pd.DataFrame, list, tuple)
+
+
+def _digest(value: Any, digest) -> None:
+    if isinstance(value, np.ndarray):
+        digest.update(f"array:{value.dtype}:{value.shape}".encode())
+        digest.update(np.ascontiguousarray(value).tobytes())
+    elif isinstance(value, pd.DataFrame):
+        digest.update(f"df:{value.shape}:{list(value.columns)}".encode())
+        digest.update(
+            pd.util.hash_pandas_object(value.astype(str), index=False)
+            .to_numpy()
+            .tobytes()
+        )
+    elif isinstance(value, (list, tuple)):
+        digest.update(f"seq:{len(value)}".encode())
+        if any(isinstance(item, _NESTED) for item in value):
+            for item in value:
+                _digest(item, digest)
+        else:
+            # Flat sequences, such as lists of texts, are encoded at once
+            digest.update(json.dumps(value, default=str).encode())
+    else:
+        digest.update(json.dumps(value, sort_keys=True, default=str).encode())
+
+
+def call_key(arguments: dict) -> str:
+    """
+    Key identifying a call by its arguments.
+
+    Parameters starting with an underscore are left out, as Streamlit does
+    for its cache keys (large data identified by a version argument,
+    progress callbacks).
+
+    Args:
+        arguments (dict): The arguments, by parameter name.
+
+    Returns:
+        str: The key.
+    """
+    digest = hashlib.blake2b(digest_size=16)
+    _digest(
+        [(name, value) for name, value in sorted(arguments.items()) if name[0] != "_"],
+        digest,
+    )
+    return digest.hexdigest()
+
+
+def singleflight(func: Callable = None, *, name: str = None) -> Callable:
+    """
+    Decorator coalescing concurrent calls of a function with equal arguments.
+
+    Apply it above the `st.cache_*` decorator, so that concurrent cache
+    misses run the function once.
+
+    Args:
+        func (Callable): The function.
+        name (str, optional): Name of its group. Defaults to the function name.
+
+    Returns:
+        Callable: The wrapped function.
+    """
+
+    def decorate(func):
+        group = _groups.setdefault(
+            name or func.__name__, SingleFlight(name or func.__name__)
+        )
+        signature = inspect.signature(func)
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            bound = signature.bind(*args, **kwargs)
+            bound.apply_defaults()
+            return group.do(call_key(bound.arguments), func, *args, **kwargs)
+
+        wrapper.flight = group
+        # Keep the `clear` method of Streamlit cached functions reachable
+        if hasattr(func, "clear"):
+            wrapper.clear = func.clear
+        return wrapper
+
+    return decorate(func) if func is not None else decorate
+
+
+def singleflight_stats() -> dict:
+    """
+    Statistics of every single-flight group, by name.
+    """
+    return {name: group.stats() for name, group in _groups.items()}
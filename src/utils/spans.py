@@ -0,0 +1,266 @@
+"""
+Timing spans of the pipeline stages.
+
+A span times a block of code (`with span("normalize", size=len(df)):`) or a
+function (`@traced("embed", size="_descriptions")`) and records its duration,
+its input size and the span it is nested in. Every span is written as one
+JSON line to `logs/span_logs.jsonl`; the spans of the script thread are also
+collected per rerun for the performance panel of the dashboard.
+
+The JSON lines go through the standard `logging` module rather than Loguru:
+the modules of the app reset the Loguru sinks when they are imported, which
+would drop a sink added here.
+"""
+
+import functools
+import inspect
+import json
+import logging
+import logging.handlers
+import os
+import threading
+import time
+from typing import Callable, Optional
+
+import pandas as pd
+
+SPAN_LOG_PATH = "logs/span_logs.jsonl"
+
+_span_logger = logging.getLogger("nerdash.spans")
+_span_logger.propagate = False
+_span_logger.setLevel(logging.INFO)
+_handler = None
+_handler_lock = threading.Lock()
+
+
+def _ensure_handler() -> None:
+    # Added on the first span, so that importing the module creates no file
+    global _handler
+    with _handler_lock:
+        if _handler is not None:
+            return
+        os.makedirs(os.path.dirname(SPAN_LOG_PATH), exist_ok=True)
+        _handler = logging.handlers.RotatingFileHandler(
+            SPAN_LOG_PATH, maxBytes=10 * 2**20, backupCount=1
+        )
+        _handler.setFormatter(logging.Formatter("%(message)s"))
+        _span_logger.addHandler(_handler)
+
+
+class SpanCollector:
+    """
+    The spans finished on one thread since the collector was started.
+    """
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.records: list[dict] = []
+
+    def add(self, record: dict) -> None:
+        self.records.append(record)
+
+    def breakdown(self) -> pd.DataFrame:
+        """
+        Time spent per section and stage.
+
+        Sections are the outermost spans; every span nested in a section is
+        summed by name under it. The row of the section itself (stage "total")
+        holds its full duration, including the time outside any stage.
+
+        Returns:
+            pd.DataFrame: Columns `section`, `stage`, `calls`, `seconds` and
+            `size` (summed input sizes).
+        """
+        columns = ["section", "stage", "calls", "seconds", "size"]
+        if not self.records:
+            return pd.DataFrame(columns=columns)
+
+        df = pd.DataFrame(self.records)
+        df["stage"] = df["name"].where(df["depth"] > 0, "total")
+        breakdown = (
+            df.groupby(["section", "stage"], sort=False)
+            .agg(
+                calls=("name", "size"),
+                seconds=("duration_ms", "sum"),
+                size=("size", lambda sizes: sizes.sum(min_count=1)),
+            )
+            .reset_index()
+        )
+        breakdown["seconds"] /= 1000
+        return breakdown[columns]
+
+
+_local = threading.local()
+
+# Functions called with every finished span, e.g. to update metrics
+_listeners: list[Callable[[dict], None]] = []
+
+
+def add_listener(listener: Callable[[dict], None]) -> None:
+    """
+    Call `listener` with the record of every span finished from now on.
+    """
+    _listeners.append(listener)
+
+
+def start_collection() -> SpanCollector:
+    """
+    Collect the spans of the current thread afresh, e.g. at the start of a
+    rerun, and return the new collector.
+    """
+    _local.collector = SpanCollector()
+    return _local.collector
+
+
+def current_collector() -> Optional[SpanCollector]:
+    """
+    The collector of the current thread, if one was started.
+    """
+    return getattr(_local, "collector", None)
+
+
+def _stack() -> list:
+    if not hasattr(_local, "stack"):
+        _local.stack = []
+    return _local.stack
+
+
+class Span:
+    """
+    A timed block; use `span` to create one.
+
+    Args:
+        name (str): Name of the stage.
+        size (int, optional): Size of the input (rows, texts, nodes, ...).
+        **attributes: Extra fields of the record.
+    """
+
+    def __init__(self, name: str, size: Optional[int] = None, **attributes):
+        self.name = name
+        self.attributes = {"size": size, **attributes}
+        self.record = None
+
+    def set(self, **attributes) -> None:
+        """
+        Add fields to the record, e.g. once the output size is known.
+        """
+        self.attributes.update(attributes)
+
+    def __enter__(self) -> "Span":
+        stack = _stack()
+        self.parent = stack[-1] if stack else None
+        stack.append(self)
+        self._started = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        duration = time.perf_counter() - self._started
+        _stack().pop()
+        section = self
+        while section.parent is not None:
+            section = section.parent
+        self.record = {
+            "name": self.name,
+            "duration_ms": round(duration * 1000, 3),
+            "section": section.name,
+            "parent": self.parent.name if self.parent else None,
+            "depth": self._depth(),
+            "thread": threading.current_thread().name,
+            "error": exc_type.__name__ if exc_type else None,
+            **self.attributes,
+        }
+
+        collector = current_collector()
+        if collector is not None:
+            collector.add(self.record)
+        for listener in _listeners:
+            listener(self.record)
+        _ensure_handler()
+        _span_logger.info(json.dumps({"ts": time.time(), **self.record}, default=str))
+
+    def _depth(self) -> int:
+        depth, parent = 0, self.parent
+        while parent is not None:
+            depth, parent = depth + 1, parent.parent
+        return depth
+
+
+def span(name: str, size: Optional[int] = None, **attributes) -> Span:
+    """
+    Time a block of code.
+
+    Args:
+        name (str): Name of the stage.
+        size (int, optional): Size of the input.
+        **attributes: Extra fields of the record.
+
+    Returns:
+        Span: Context manager recording the span when the block exits.
+    """
+    return Span(name, size, **attributes)
+
+
+def _size_of(value) -> Optional[int]:
+    try:
+        return len(value)
+    except TypeError:
+        return None
+
+
+def traced(name: str, size: Optional[str] = None) -> Callable:
+    """
+    Decorator timing every call of a function as a span.
+
+    Apply it above the `st.cache_*` decorators to time cache hits as well;
+    with `cache_miss` below them, the span records whether the call hit the
+    cache (`cached`).
+
+    Args:
+        name (str): Name of the stage.
+        size (str, optional): Parameter whose length is the input size. By
+            default the length of the result is recorded as the size.
+
+    Returns:
+        Callable: The decorator.
+    """
+
+    def decorate(func):
+        signature = inspect.signature(func)
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with span(name, function=func.__name__) as current:
+                if hasattr(func, "clear"):
+                    # Cached functions: `cache_miss` resets it on a miss
+                    current.set(cached=True)
+                if size is not None:
+                    bound = signature.bind_partial(*args, **kwargs)
+                    current.set(size=_size_of(bound.arguments.get(size)))
+                result = func(*args, **kwargs)
+                if size is None:
+                    current.set(size=_size_of(result))
+                return result
+
+        # Keep the attributes of wrapped Streamlit and single-flight functions
+        for attribute in ("clear", "flight"):
+            if hasattr(func, attribute):
+                setattr(wrapper, attribute, getattr(func, attribute))
+        return wrapper
+
+    return decorate
+
+
+def cache_miss(func: Callable) -> Callable:
+    """
+    Decorator for the function under a `st.cache_*` decorator: it only runs
+    on cache misses, which it records on the enclosing `traced` span.
+    """
+
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        stack = _stack()
+        if stack:
+            stack[-1].set(cached=False)
+        return func(*args, **kwargs)
+
+    return wrapper
@@ -6,6 +6,8 @@ Initialization file for the views package.
 """
 
 # Re-export graphing functions
+from .cache import dataset_version, figure_cache_stats
+from .communities import describe_communities
 from .graphs import (
     make_bar_chart,
     make_line_chart,
@@ -16,6 +18,9 @@ from .graphs import (
 )
 
 __all__ = [
+    "dataset_version",
+    "describe_communities",
+    "figure_cache_stats",
     "make_bar_chart",
     "make_line_chart",
     "make_pie_chart",
@@ -0,0 +1,184 @@
+"""
+Memoization of the Plotly chart builders.
+
+Figures are keyed by a cheap fingerprint of their inputs (the dataset version
+plus the call parameters) and stored as JSON, so a Streamlit rerun with
+unchanged data gets its charts back without rebuilding them.
+"""
+
+import functools
+import hashlib
+import json
+import threading
+from collections import OrderedDict
+from typing import Any, Optional
+
+import numpy as np
+import pandas as pd
+import plotly.graph_objects as go
+import plotly.io as pio
+from loguru import logger
+
+from utils import constants, span
+from utils.metrics import CACHE_BYTES, CACHE_EVICTIONS, registry
+
+
+def dataset_version(df: pd.DataFrame) -> str:
+    """
+    Identify the content of a DataFrame.
+
+    A version token stored in `df.attrs["version"]` is trusted as is, so
+    fingerprinting costs nothing for frames loaded from the database. Other
+    frames are hashed row by row.
+
+    Args:
+        df (pd.DataFrame): The DataFrame.
+
+    Returns:
+        str: The version of the data.
+    """
+
+    if "version" in df.attrs:
+        return str(df.attrs["version"])
+
+    digest = hashlib.blake2b(digest_size=16)
+    for column in df.columns:
+        try:
+            hashed = pd.util.hash_pandas_object(df[column], index=False)
+        except TypeError:
+            # Unhashable cells such as lists
+            hashed = pd.util.hash_pandas_object(df[column].astype(str), index=False)
+        digest.update(hashed.to_numpy().tobytes())
+    return digest.hexdigest()
+
+
+def fingerprint(value: Any) -> str:
+    """
+    Cheap, stable fingerprint of a chart builder argument.
+
+    Args:
+        value: A DataFrame, NumPy array or JSON-like value.
+
+    Returns:
+        str: The fingerprint.
+    """
+
+    if isinstance(value, pd.DataFrame):
+        # Shape and columns guard against slices carrying the parent's version
+        return f"df:{dataset_version(value)}:{value.shape}:{list(value.columns)}"
+    if isinstance(value, np.ndarray):
+        return f"array:{hashlib.blake2b(value.tobytes(), digest_size=16).hexdigest()}"
+    encoded = json.dumps(value, sort_keys=True, default=str)
+    return hashlib.blake2b(encoded.encode(), digest_size=16).hexdigest()
+
+
+class FigureCache:
+    """
+    Bounded LRU cache of Plotly figures stored as JSON.
+
+    Args:
+        max_entries (int): Number of figures kept before evicting the least
+            recently used one.
+    """
+
+    def __init__(self, max_entries: int = 64):
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.nbytes = 0
+        self._entries: OrderedDict[str, str] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[go.Figure]:
+        """
+        Rebuild the cached figure for a key, counting the hit or miss.
+        """
+        with self._lock:
+            figure_json = self._entries.get(key)
+            if figure_json is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+        return pio.from_json(figure_json)
+
+    def put(self, key: str, fig: go.Figure) -> None:
+        """
+        Store a figure, evicting the least recently used ones over the bound.
+        """
+        figure_json = fig.to_json()
+        with self._lock:
+            replaced = self._entries.get(key)
+            if replaced is not None:
+                self.nbytes -= len(replaced)
+            self._entries[key] = figure_json
+            self._entries.move_to_end(key)
+            self.nbytes += len(figure_json)
+            while len(self._entries) > self.max_entries:
+                _, evicted = self._entries.popitem(last=False)
+                self.nbytes -= len(evicted)
+                self.evictions += 1
+                CACHE_EVICTIONS.inc(cache="figure", reason="capacity")
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self.nbytes = 0
+
+    def stats(self) -> dict:
+        """
+        Hit, miss and eviction counters of the cache.
+        """
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "entries": len(self._entries),
+                "bytes": self.nbytes,
+            }
+
+
+figure_cache = FigureCache(max_entries=constants.FIGURE_CACHE_SIZE)
+registry.add_collector(
+    lambda: CACHE_BYTES.set(figure_cache.stats()["bytes"], cache="figure")
+)
+
+
+def memoize_figure(func):
+    """
+    Serve the figures of a chart builder from `figure_cache`.
+
+    Builders returning None (nothing to plot) are not cached.
+    """
+
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        key = fingerprint(
+            [
+                func.__qualname__,
+                [fingerprint(arg) for arg in args],
+                {name: fingerprint(arg) for name, arg in sorted(kwargs.items())},
+            ]
+        )
+        with span("figure", function=func.__name__) as current:
+            fig = figure_cache.get(key)
+            current.set(cached=fig is not None)
+            if fig is not None:
+                logger.info(f"Figure cache hit | {func.__name__}")
+                return fig
+
+            fig = func(*args, **kwargs)
+            if fig is not None:
+                figure_cache.put(key, fig)
+            return fig
+
+    return wrapper
+
+
+def figure_cache_stats() -> dict:
+    """
+    Counters of the chart figure cache (see `FigureCache.stats`).
+    """
+    return figure_cache.stats()
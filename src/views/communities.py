@@ -0,0 +1,215 @@
+"""
+Community detection and coarsening for level-of-detail graph views.
+
+Communities are found with label propagation on the sparse adjacency of the
+graph.
+Each community becomes a weighted super-node of a coarse graph, which keeps
+the overview small however large the similarity graph gets; a community can
+then be drilled into to show its members.
+"""
+
+import time
+from typing import TYPE_CHECKING, Optional
+
+import numpy as np
+import pandas as pd
+from scipy.sparse import csr_matrix
+
+from utils.cache import memory_cache
+from views.layout import graph_arrays, graph_fingerprint
+
+if TYPE_CHECKING:
+    import networkx as nx
+
+
+def label_propagation(
+    num_nodes: int,
+    edges: np.ndarray,
+    weights: Optional[np.ndarray] = None,
+    max_iter: int = 30,
+    update_fraction: float = 0.8,
+    seed: int = 42,
+) -> np.ndarray:
+    """
+    Detect communities with semi-synchronous label propagation.
+
+    At every iteration a random subset of the nodes adopts the label with the
+    largest total edge weight among its neighbours. Updating only a subset
+    avoids the label oscillation of fully synchronous propagation. Each
+    iteration is a handful of sorts and reductions over the sparse adjacency
+    in coordinate form.
+
+    Args:
+        num_nodes (int): Number of nodes.
+        edges (np.ndarray): (m, 2) node indices of each edge.
+        weights (np.ndarray, optional): Edge weights.
+        max_iter (int): Iteration budget.
+        update_fraction (float): Fraction of nodes updated per iteration.
+        seed (int): Seed of the node subsets.
+
+    Returns:
+        np.ndarray: A community label per node; labels are 0..k-1 ordered by
+        decreasing community size.
+    """
+
+    if num_nodes == 0:
+        return np.empty(0, dtype=np.int64)
+
+    weights = np.ones(len(edges)) if weights is None else np.asarray(weights, float)
+    jitter = 1e-6 * (weights.mean() if len(weights) else 1.0)
+
+    # Both directions of every edge, plus a zero-weight self-loop so that
+    # isolated nodes keep their own label
+    nodes = np.arange(num_nodes)
+    source = np.concatenate([edges[:, 0], edges[:, 1], nodes])
+    target = np.concatenate([edges[:, 1], edges[:, 0], nodes])
+    weights = np.concatenate([weights, weights, np.zeros(num_nodes)])
+
+    rng = np.random.default_rng(seed)
+    labels = nodes.copy()
+    for _ in range(max_iter):
+        # Total weight of every (node, neighbour label) pair, with a little
+        # noise so that ties are broken at random
+        pairs, index = np.unique(
+            source * num_nodes + labels[target], return_inverse=True
+        )
+        scores = np.bincount(index, weights=weights)
+        scores += rng.random(len(scores)) * jitter
+        pair_node = pairs // num_nodes
+
+        # Each node keeps the label of its highest scoring pair
+        starts = np.searchsorted(pair_node, nodes)
+        top = np.maximum.reduceat(scores, starts)
+        is_top = scores == top[pair_node]
+        best = np.empty_like(labels)
+        best[pair_node[is_top]] = pairs[is_top] % num_nodes
+        if np.array_equal(best, labels):
+            break
+
+        update = rng.random(num_nodes) < update_fraction
+        labels = np.where(update, best, labels)
+
+    labels = np.unique(labels, return_inverse=True)[1]
+
+    # Relabel by decreasing community size
+    sizes = np.bincount(labels)
+    rank = np.empty_like(sizes)
+    rank[np.argsort(-sizes, kind="stable")] = np.arange(len(sizes))
+    return rank[labels]
+
+
+def detect_communities(G: "nx.Graph", seed: int = 42) -> tuple[list, np.ndarray]:
+    """
+    Communities of a graph, computed once per graph version and kept in the
+    stage memory cache.
+
+    Args:
+        G (nx.Graph): The graph.
+        seed (int): Seed of the label propagation.
+
+    Returns:
+        nodes (list): The nodes of the graph.
+        labels (np.ndarray): The community label of each node.
+    """
+
+    nodes, edges, weights = graph_arrays(G)
+    key = graph_fingerprint(G, seed=seed, method="label_propagation")
+    labels = memory_cache.get(f"communities:{key}")
+    if labels is None:
+        started = time.perf_counter()
+        labels = label_propagation(len(nodes), edges, weights, seed=seed)
+        memory_cache.put(
+            f"communities:{key}",
+            labels,
+            cache="communities",
+            cost=time.perf_counter() - started,
+        )
+    return nodes, labels
+
+
+def coarsen_graph(
+    labels: np.ndarray, edges: np.ndarray, weights: Optional[np.ndarray] = None
+) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Collapse every community into a super-node.
+
+    Args:
+        labels (np.ndarray): Community label of each node.
+        edges (np.ndarray): (m, 2) node indices of each edge.
+        weights (np.ndarray, optional): Edge weights.
+
+    Returns:
+        sizes (np.ndarray): Number of members of each community.
+        super_edges (np.ndarray): (k, 2) community pairs connected by edges.
+        super_weights (np.ndarray): Total weight of the edges between them.
+    """
+
+    num_communities = labels.max() + 1 if len(labels) else 0
+    weights = np.ones(len(edges)) if weights is None else np.asarray(weights, float)
+    between = csr_matrix(
+        (weights, (labels[edges[:, 0]], labels[edges[:, 1]])),
+        shape=(num_communities, num_communities),
+    )
+    between = (between + between.T).tocoo()
+    upper = between.row < between.col
+
+    sizes = np.bincount(labels, minlength=num_communities)
+    super_edges = np.column_stack([between.row[upper], between.col[upper]])
+    return sizes, super_edges, between.data[upper]
+
+
+def community_summary(
+    labels: np.ndarray,
+    nodes: list,
+    edges: np.ndarray,
+    concepts,
+    top_n: int = 3,
+) -> pd.DataFrame:
+    """
+    Describe every community by its size and its best connected members.
+
+    Args:
+        labels (np.ndarray): Community label of each node.
+        nodes (list): The nodes, aligned with `labels`.
+        edges (np.ndarray): (m, 2) node indices of each edge.
+        concepts: A dict or list mapping node IDs to labels.
+        top_n (int): Number of members listed per community.
+
+    Returns:
+        pd.DataFrame: One row per community with `community`, `size` and
+        `top_concepts` columns, ordered by community label.
+    """
+
+    degree = np.bincount(edges.ravel(), minlength=len(nodes))
+    order = np.lexsort((-degree, labels))
+    rank = np.arange(len(order)) - np.searchsorted(labels[order], labels[order])
+    top = order[rank < top_n]
+
+    names = pd.Series([concepts[nodes[i]] for i in top], dtype=object)
+    top_concepts = names.groupby(labels[top]).agg(", ".join)
+    sizes = np.bincount(labels)
+    return pd.DataFrame(
+        {
+            "community": np.arange(len(sizes)),
+            "size": sizes,
+            "top_concepts": top_concepts.reindex(np.arange(len(sizes))).to_numpy(),
+        }
+    )
+
+
+def describe_communities(G: "nx.Graph", concepts, top_n: int = 3) -> pd.DataFrame:
+    """
+    Summary of the communities of a graph (see `community_summary`).
+
+    Args:
+        G (nx.Graph): The graph.
+        concepts: A dict or list mapping node IDs to labels.
+        top_n (int): Number of members listed per community.
+
+    Returns:
+        pd.DataFrame: One row per community.
+    """
+
+    nodes, labels = detect_communities(G)
+    _, edges, _ = graph_arrays(G)
+    return community_summary(labels, nodes, edges, concepts, top_n=top_n)
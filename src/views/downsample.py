@@ -0,0 +1,111 @@
+"""
+Largest-Triangle-Three-Buckets (LTTB) downsampling of line chart data.
+
+LTTB keeps the first and last points and, from each bucket in between, the
+point forming the largest triangle with the point kept in the previous bucket
+and the mean of the next bucket. Peaks and dips therefore survive while the
+number of points sent to the browser stays bounded.
+"""
+
+import numpy as np
+import pandas as pd
+
+from utils import constants
+
+
+def point_budget(viewport_width: int = None) -> int:
+    """
+    Number of points worth drawing on a chart of a given width.
+
+    Args:
+        viewport_width (int, optional): Chart width in pixels. Defaults to
+            `constants.CHART_VIEWPORT_WIDTH`.
+
+    Returns:
+        int: The point budget, at least 3.
+    """
+    width = viewport_width or constants.CHART_VIEWPORT_WIDTH
+    return max(3, int(width // constants.CHART_PIXELS_PER_POINT))
+
+
+def lttb_indices(x: np.ndarray, y: np.ndarray, n_out: int) -> np.ndarray:
+    """
+    Indices of the points kept by LTTB, plus the global minimum and maximum.
+
+    Every bucket is scored in one NumPy pass; NaN values (gaps) are never
+    preferred, and a bucket holding only NaN keeps one so the gap stays.
+
+    Args:
+        x (np.ndarray): Increasing x values (numbers or datetime64).
+        y (np.ndarray): y values, may contain NaN.
+        n_out (int): Point budget.
+
+    Returns:
+        np.ndarray: Sorted indices into `x` and `y`.
+    """
+
+    n = len(x)
+    if n <= n_out or n_out < 3:
+        return np.arange(n)
+
+    x = np.asarray(x)
+    if np.issubdtype(x.dtype, np.datetime64):
+        x = x.astype("datetime64[ns]").astype(np.int64)
+    x = x.astype(float)
+    y = np.asarray(y, dtype=float)
+    finite = np.isfinite(y)
+
+    # n_out - 2 buckets between the fixed first and last points
+    edges = np.linspace(1, n - 1, n_out - 1).astype(np.int64)
+    # Mean of every bucket, used as the third vertex of the previous bucket
+    counts = np.add.reduceat(finite[1 : n - 1].astype(float), edges[:-1] - 1)
+    sum_x = np.add.reduceat(np.where(finite, x, 0)[1 : n - 1], edges[:-1] - 1)
+    sum_y = np.add.reduceat(np.where(finite, y, 0)[1 : n - 1], edges[:-1] - 1)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        mean_x = np.append(sum_x / counts, x[-1])
+        mean_y = np.append(sum_y / counts, y[-1])
+
+    selected = np.empty(n_out, dtype=np.int64)
+    selected[0], selected[-1] = 0, n - 1
+    anchor_x, anchor_y = x[0], y[0]
+    for bucket in range(n_out - 2):
+        start, stop = edges[bucket], edges[bucket + 1]
+        next_x, next_y = mean_x[bucket + 1], mean_y[bucket + 1]
+        if not np.isfinite(next_y):
+            next_x, next_y = x[stop], y[stop]
+        area = np.abs(
+            (anchor_x - next_x) * (y[start:stop] - anchor_y)
+            - (anchor_x - x[start:stop]) * (next_y - anchor_y)
+        )
+        area[~np.isfinite(area)] = -1.0
+        chosen = start + int(np.argmax(area))
+        selected[bucket + 1] = chosen
+        if finite[chosen]:
+            anchor_x, anchor_y = x[chosen], y[chosen]
+
+    # Always keep the extreme values
+    if finite.any():
+        extremes = [np.nanargmax(y), np.nanargmin(y)]
+        selected = np.concatenate([selected, extremes])
+    return np.unique(selected)
+
+
+def downsample(
+    df: pd.DataFrame, x: str, y: str, viewport_width: int = None
+) -> pd.DataFrame:
+    """
+    Reduce a line chart frame to the point budget of its viewport with LTTB.
+
+    Args:
+        df (pd.DataFrame): The chart data, sorted by `x`.
+        x (str): The x column.
+        y (str): The y column.
+        viewport_width (int, optional): Chart width in pixels.
+
+    Returns:
+        pd.DataFrame: The kept rows (`df` itself when within budget).
+    """
+    n_out = point_budget(viewport_width)
+    if len(df) <= n_out:
+        return df
+    return df.iloc[lttb_indices(df[x].to_numpy(), df[y].to_numpy(), n_out)]
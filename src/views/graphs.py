@@ -1,19 +1,33 @@
 """
 Graphing functions for the AI Thought Network.
 
+plotly.express and networkx are imported by the charts using them, so that
+importing the views does not load them before a chart is first drawn.
 """
 
+import base64
+import io
 from typing import Optional, Union
 
-import networkx as nx
+import numpy as np
 import pandas as pd
-import plotly.express as px
+import plotly.colors as pcolors
 import plotly.graph_objects as go
 import streamlit as st
 from loguru import logger
+from PIL import Image
 
-from controllers import get_bar_df, get_line_df, get_pie_df
-from utils import constants, is_valid_chart_data
+from controllers import (
+    aggregate_bar,
+    aggregate_daily_mean,
+    aggregate_line,
+    aggregate_pie,
+)
+from utils import cache_miss, constants, is_valid_chart_data, memory_cached, traced
+from views.cache import memoize_figure
+from views.communities import coarsen_graph, describe_communities, detect_communities
+from views.downsample import downsample
+from views.layout import global_layout, graph_arrays, refine_layout
 
 # Configure Loguru
 logger.remove()  # Remove default logger to customize settings
@@ -25,7 +39,14 @@ logger.add(
 )
 
 
-def make_line_chart(data: pd.DataFrame = None, x: str = None, y: str = None) -> px.line:
+@memoize_figure
+def make_line_chart(
+    data: pd.DataFrame = None,
+    x: str = None,
+    y: str = None,
+    aggregated: pd.DataFrame = None,
+    viewport_width: int = None,
+) -> go.Figure:
     """
     Creates a plotly line chart with some default settings.
 
@@ -33,18 +54,23 @@ def make_line_chart(data: pd.DataFrame = None, x: str = None, y: str = None) ->
         data (pd.DataFrame): The data to plot.
         x (str): The column to plot on the x-axis.
         y (str): The column to plot on the y-axis.
+        aggregated (pd.DataFrame, optional): Pre-aggregated `y` and `count`
+            columns, e.g. from a daily rollup, used instead of `data`.
+        viewport_width (int, optional): Chart width in pixels, bounding the
+            number of points drawn (see `views.downsample`).
 
     Returns:
-        px.line: A plotly line chart.
+        go.Figure: A plotly line chart.
 
     """
     # TODO: Add input validation
 
     logger.info(f"Generating line chart | X: {x}, Y: {y}")
 
-    line_df = data[[x, y]]
+    line_counts = aggregated if aggregated is not None else aggregate_line(data, x, y)
+    line_counts = downsample(line_counts, y, "count", viewport_width)
+    import plotly.express as px
 
-    line_counts = get_line_df(line_df, x, y)
     fig = px.line(
         line_counts,
         y="count",
@@ -73,15 +99,90 @@ def make_line_chart(data: pd.DataFrame = None, x: str = None, y: str = None) ->
     return fig
 
 
-@st.cache_resource(ttl=3600, show_spinner=False)
-def visualize_graph(_G, concepts, highlight_node=None) -> go.Figure:
+def edge_coordinates(
+    node_xy: np.ndarray, edges: np.ndarray
+) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Build the coordinates of a line trace drawing every edge in one NumPy pass.
+
+    Each edge contributes its two end points followed by a NaN separator, so
+    all the edges render as a single trace.
+
+    Args:
+        node_xy (np.ndarray): (n, 2) node positions.
+        edges (np.ndarray): (m, 2) node indices of each edge.
+
+    Returns:
+        edge_x (np.ndarray): (3m,) x coordinates.
+        edge_y (np.ndarray): (3m,) y coordinates.
+    """
+
+    segments = np.full((len(edges), 3, 2), np.nan)
+    segments[:, 0] = node_xy[edges[:, 0]]
+    segments[:, 1] = node_xy[edges[:, 1]]
+    return segments[:, :, 0].ravel(), segments[:, :, 1].ravel()
+
+
+def _community_overview(_G, concepts):
+    """
+    Coarse view of a graph with one weighted super-node per community.
+
+    Args:
+        _G: The networkx graph
+        concepts: A dict or list mapping node IDs to labels
+
+    Returns:
+        node_xy (np.ndarray): (k, 2) super-node positions.
+        edges (np.ndarray): (e, 2) community pairs connected by edges.
+        summary (pd.DataFrame): Size and top concepts of each community.
+    """
+
+    nodes, labels = detect_communities(_G)
+    _, edges, weights = graph_arrays(_G)
+    sizes, super_edges, super_weights = coarsen_graph(labels, edges, weights)
+    summary = describe_communities(_G, concepts)
+
+    import networkx as nx
+
+    # The coarse graph is small, so it gets its own (cached) layout
+    coarse = nx.Graph()
+    coarse.add_nodes_from(range(len(sizes)))
+    if len(super_weights):
+        super_weights = super_weights / super_weights.max()
+    coarse.add_weighted_edges_from(
+        zip(
+            super_edges[:, 0].tolist(),
+            super_edges[:, 1].tolist(),
+            super_weights,
+            strict=True,
+        )
+    )
+    pos = global_layout(coarse, seed=42)
+    node_xy = np.array([pos[node] for node in range(len(sizes))]).reshape(-1, 2)
+    return node_xy, super_edges, summary
+
+
+@traced("figure", size="_G")
+@memory_cached(ttl=3600)
+@cache_miss
+def visualize_graph(
+    _G, concepts, highlight_node=None, refine_iterations=0, community=None
+) -> go.Figure:
     """
     Visualizes a networkx graph using Plotly.
 
+    Graphs above `constants.GRAPH_LOD_THRESHOLD` nodes are shown as a
+    community overview, one super-node per community sized by its number of
+    members. Passing `community` drills into the members of that community.
+
     Args:
         G: The networkx graph to visualize
         concepts: A dict or list mapping node IDs to labels
         highlight_node: Optional node to highlight along with its connections
+        refine_iterations: Iterations of local layout refinement for the
+            highlighted subgraph. By default it keeps its global positions.
+        community: Optional community label (see `detect_communities`) whose
+            members are shown instead of the overview
 
     Returns:
         plotly.graph_objects.Figure: A Plotly figure showing the graph
@@ -94,8 +195,18 @@ def visualize_graph(_G, concepts, highlight_node=None) -> go.Figure:
     status_placeholder.write("Creating graph visualization...")
     progress_placeholder.progress(0)
 
+    title = "Concept Similarity Graph"
+    overview = None
+    highlighting = highlight_node is not None and highlight_node in _G.nodes()
+
     # If highlighting a specific node, create a subgraph with that node and its connections
-    if highlight_node is not None and highlight_node in _G.nodes():
+    if highlighting:
+        # Positions of the full graph are computed once per graph version and
+        # shared by every view of it
+        status_placeholder.write(f"Computing layout for {len(_G.nodes())} nodes...")
+        pos = global_layout(_G, seed=42)
+        progress_placeholder.progress(0.2)
+
         status_placeholder.write(
             f"Filtering graph to show node '{concepts[highlight_node]}' and its connections..."
         )
@@ -108,38 +219,52 @@ def visualize_graph(_G, concepts, highlight_node=None) -> go.Figure:
             neighbors = list(_G.neighbors(highlight_node))
         nodes_to_keep = [highlight_node] + neighbors
         _G = _G.subgraph(nodes_to_keep).copy()
-
-    # Limit to largest connected component if graph is too large
-    elif len(_G.nodes()) > 200:
-        progress_placeholder.progress(0.1)
+        pos = refine_layout(_G, pos, iterations=refine_iterations)
+        title += f" - Highlighting: {concepts[highlight_node]}"
+    elif community is not None:
+        status_placeholder.write(f"Showing the members of community {community}...")
+        nodes, labels = detect_communities(_G)
+        _G = _G.subgraph(
+            [
+                node
+                for node, label in zip(nodes, labels, strict=True)
+                if label == community
+            ]
+        ).copy()
+        pos = global_layout(_G, seed=42)
+        title += f" - Community {community}"
+    elif len(_G) > constants.GRAPH_LOD_THRESHOLD:
         status_placeholder.write(
-            "Graph is large, limiting to largest connected component..."
+            f"Graph is large, grouping {len(_G.nodes())} nodes into communities..."
         )
-        largest_cc = max(nx.connected_components(_G), key=len)
-        _G = _G.subgraph(largest_cc).copy()
-
-    # Use faster layout algorithm for large graphs
-    progress_placeholder.progress(0.2)
-    status_placeholder.write(f"Computing layout for {len(_G.nodes())} nodes...")
-    if len(_G.nodes()) > 100:
-        pos = nx.kamada_kawai_layout(_G)
+        overview = _community_overview(_G, concepts)
+        title += " - Communities"
+    else:
+        status_placeholder.write(f"Computing layout for {len(_G.nodes())} nodes...")
+        pos = global_layout(_G, seed=42)
+    progress_placeholder.progress(0.3)
+
+    if overview is None:
+        nodes, edges, _ = graph_arrays(_G)
+        node_xy = np.array([pos[node] for node in nodes]).reshape(-1, 2)
+        hovertext = [concepts[node] for node in nodes]
     else:
-        pos = nx.spring_layout(_G, seed=42)
+        node_xy, edges, summary = overview
+        hovertext = [
+            f"Community {row.community}<br>{row.size} concepts<br>{row.top_concepts}"
+            for row in summary.itertuples()
+        ]
 
     # --- edge trace ---
     progress_placeholder.progress(0.5)
     status_placeholder.write("Building edge traces...")
-    edge_x, edge_y = [], []
-    total_edges = len(_G.edges())
-    for i, (u, v) in enumerate(_G.edges()):
-        x0, y0 = pos[u]
-        x1, y1 = pos[v]
-        edge_x.extend([x0, x1, None])
-        edge_y.extend([y0, y1, None])
-        if i % max(1, total_edges // 10) == 0:  # Update every 10%
-            progress_placeholder.progress(0.5 + (0.2 * i / total_edges))
-
-    edge_trace = go.Scatter(
+    edge_x, edge_y = edge_coordinates(node_xy, edges)
+
+    # WebGL keeps the browser responsive with thousands of edges
+    webgl = len(edges) > constants.WEBGL_EDGE_THRESHOLD
+    scatter = go.Scattergl if webgl else go.Scatter
+
+    edge_trace = scatter(
         x=edge_x,
         y=edge_y,
         line=dict(width=1, color="gray"),
@@ -151,58 +276,42 @@ def visualize_graph(_G, concepts, highlight_node=None) -> go.Figure:
     # --- node trace ---
     progress_placeholder.progress(0.7)
     status_placeholder.write("Building node traces...")
-    node_x, node_y = [], []
-    hover_text = []
-    node_colors = []
-    node_sizes = []
-    total_nodes = len(_G.nodes())
 
     # Define colors for highlighting
     highlight_color = "red"
     neighbor_color = "orange"
     default_color = "skyblue"
 
-    for i, node in enumerate(_G.nodes()):
-        x, y = pos[node]
-        node_x.append(x)
-        node_y.append(y)
-        hover_text.append(concepts[node])
-
-        # Set node color and size based on highlighting
-        if highlight_node is not None:
-            if node == highlight_node:
-                node_colors.append(highlight_color)
-                node_sizes.append(15)  # Larger size for highlighted node
-            else:
-                node_colors.append(neighbor_color)
-                node_sizes.append(10)
-        else:
-            node_colors.append(default_color)
-            node_sizes.append(10)
-
-        if i % max(1, total_nodes // 10) == 0:  # Update every 10%
-            progress_placeholder.progress(0.7 + (0.2 * i / total_nodes))
-
-    node_trace = go.Scatter(
-        x=node_x,
-        y=node_y,
+    # Set node color and size based on highlighting
+    if highlighting:
+        is_highlight = np.array([node == highlight_node for node in nodes], bool)
+        node_colors = np.where(is_highlight, highlight_color, neighbor_color)
+        node_sizes = np.where(is_highlight, 15, 10)  # Larger highlighted node
+    elif overview is not None:
+        # Super-node area grows with the number of members
+        sizes = summary["size"].to_numpy()
+        node_colors = default_color
+        node_sizes = 10 + 40 * np.sqrt(sizes / sizes.max())
+    else:
+        node_colors = default_color
+        node_sizes = 10
+
+    node_trace = scatter(
+        x=node_xy[:, 0],
+        y=node_xy[:, 1],
         mode="markers",
         marker=dict(
             size=node_sizes, color=node_colors, line=dict(width=1, color="white")
         ),
-        hovertext=hover_text,
+        hovertext=hovertext,
         hoverinfo="text",
-        name="Concepts",
+        name="Communities" if overview is not None else "Concepts",
     )
 
     # --- assemble figure ---
     progress_placeholder.progress(0.9)
     status_placeholder.write("Assembling final visualization...")
 
-    title = "Concept Similarity Graph"
-    if highlight_node is not None:
-        title += f" - Highlighting: {concepts[highlight_node]}"
-
     fig = go.Figure(data=[edge_trace, node_trace])
     fig.update_layout(
         title=title,
@@ -223,13 +332,67 @@ def visualize_graph(_G, concepts, highlight_node=None) -> go.Figure:
     return fig
 
 
-def visualize_tsne(reduced_embeddings, cluster_labels, names) -> px.scatter:
+def density_image(
+    points: np.ndarray,
+    labels: np.ndarray,
+    colors: list,
+    bins: int,
+    extent: tuple,
+) -> np.ndarray:
+    """
+    Rasterize a 2-D scatter into an RGB density image.
+
+    Every cluster is binned with its own 2-D histogram. The colour of a pixel
+    is the mean of the cluster colours weighted by their counts and its
+    brightness grows with the log of the total count, so dense regions stand
+    out without saturating the sparse ones.
+
+    Args:
+        points (np.ndarray): (n, 2) point coordinates.
+        labels (np.ndarray): (n,) cluster index of each point, in 0..k-1.
+        colors (list): k RGB tuples with components in [0, 1].
+        bins (int): Number of bins per axis.
+        extent (tuple): ((x_min, x_max), (y_min, y_max)) area to rasterize.
+
+    Returns:
+        np.ndarray: A (bins, bins, 3) uint8 image; row 0 is the lowest y.
+    """
+
+    counts = np.stack(
+        [
+            np.histogram2d(
+                points[labels == cluster, 1],
+                points[labels == cluster, 0],
+                bins=bins,
+                range=[extent[1], extent[0]],
+            )[0]
+            for cluster in range(len(colors))
+        ],
+        axis=-1,
+    )
+    total = counts.sum(axis=-1, keepdims=True)
+    color = counts @ np.asarray(colors) / np.maximum(total, 1)
+    brightness = np.log1p(total) / np.log1p(max(total.max(), 1))
+    return np.round(255 * color * brightness).astype(np.uint8)
+
+
+@traced("figure", size="reduced_embeddings")
+def visualize_tsne(
+    reduced_embeddings, cluster_labels, names, viewport=None
+) -> go.Figure:
     """
     Performs t-SNE dimensionality reduction and returns a Plotly visualization.
 
+    Above `constants.TSNE_RASTER_THRESHOLD` points the projection is sent as a
+    server-side density image instead of one marker per point. Hover points
+    are then only drawn for a `viewport` holding at most
+    `constants.TSNE_HOVER_POINTS` points.
+
     Args:
         embeddings: The embeddings to reduce and visualize
         cluster_labels: Labels for coloring the points by cluster
+        names: Hover name of each point
+        viewport: Optional ((x_min, x_max), (y_min, y_max)) area to zoom into
         output_file: Deprecated. Kept for backwards compatibility.
 
     Returns:
@@ -247,15 +410,23 @@ def visualize_tsne(reduced_embeddings, cluster_labels, names) -> px.scatter:
     # Data preparation
     progress_placeholder.progress(0.6)
 
-    # Create plotly figure
-    fig = px.scatter(
-        x=reduced_embeddings[:, 0],
-        y=reduced_embeddings[:, 1],
-        color=cluster_labels,
-        hover_name=names,
-        title="t-SNE visualization of Embeddings by Cluster",
-        color_discrete_sequence=px.colors.qualitative.Bold,
-    )
+    if len(reduced_embeddings) > constants.TSNE_RASTER_THRESHOLD:
+        status_placeholder.write("Rasterizing t-SNE density...")
+        fig = _tsne_density_figure(
+            np.asarray(reduced_embeddings), cluster_labels, names, viewport
+        )
+    else:
+        # Create plotly figure
+        import plotly.express as px
+
+        fig = px.scatter(
+            x=reduced_embeddings[:, 0],
+            y=reduced_embeddings[:, 1],
+            color=cluster_labels,
+            hover_name=names,
+            title="t-SNE visualization of Embeddings by Cluster",
+            color_discrete_sequence=pcolors.qualitative.Bold,
+        )
 
     fig.update_layout(
         template="plotly_dark",
@@ -275,7 +446,90 @@ def visualize_tsne(reduced_embeddings, cluster_labels, names) -> px.scatter:
     return fig
 
 
-def make_sentiment_over_time(df, sentiments, output_file=None) -> px.line:
+def _tsne_density_figure(points, cluster_labels, names, viewport) -> go.Figure:
+    """
+    Density image of a t-SNE projection with hover points for small viewports.
+    """
+
+    clusters, labels = np.unique(np.asarray(cluster_labels), return_inverse=True)
+    palette = pcolors.qualitative.Bold
+    colors = [palette[i % len(palette)] for i in range(len(clusters))]
+    rgb, _ = pcolors.convert_colors_to_same_type(colors, colortype="tuple")
+
+    if viewport is None:
+        viewport = tuple(
+            (float(points[:, axis].min()), float(points[:, axis].max()))
+            for axis in range(2)
+        )
+    (x_min, x_max), (y_min, y_max) = viewport
+    bins = constants.TSNE_RASTER_BINS
+
+    # The image is sent as a PNG data URI, far smaller than the pixel values
+    # as JSON; its first row is the top of the plot
+    image = density_image(points, labels, rgb, bins, viewport)[::-1]
+    buffer = io.BytesIO()
+    Image.fromarray(image).save(buffer, format="PNG")
+    source = "data:image/png;base64," + base64.b64encode(buffer.getvalue()).decode()
+    fig = go.Figure()
+    fig.add_layout_image(
+        source=source,
+        xref="x",
+        yref="y",
+        x=x_min,
+        y=y_max,
+        sizex=x_max - x_min,
+        sizey=y_max - y_min,
+        sizing="stretch",
+        layer="below",
+    )
+
+    # Legend entries for the cluster colours
+    for cluster, color in zip(clusters, colors, strict=True):
+        fig.add_trace(
+            go.Scattergl(
+                x=[None],
+                y=[None],
+                mode="markers",
+                marker=dict(color=color),
+                name=str(cluster),
+            )
+        )
+
+    # Full resolution points once the viewport is small enough to hover
+    visible = np.flatnonzero(
+        (points[:, 0] >= x_min)
+        & (points[:, 0] <= x_max)
+        & (points[:, 1] >= y_min)
+        & (points[:, 1] <= y_max)
+    )
+    title = "t-SNE density of Embeddings by Cluster"
+    if len(visible) <= constants.TSNE_HOVER_POINTS:
+        fig.add_trace(
+            go.Scattergl(
+                x=points[visible, 0],
+                y=points[visible, 1],
+                mode="markers",
+                marker=dict(size=4, color=np.asarray(colors)[labels[visible]]),
+                hovertext=[names[i] for i in visible],
+                hoverinfo="text",
+                showlegend=False,
+            )
+        )
+    else:
+        title += f" ({len(visible)} points, zoom in to inspect)"
+
+    fig.update_layout(
+        title=title,
+        xaxis=dict(range=[x_min, x_max]),
+        yaxis=dict(range=[y_min, y_max], autorange=False),
+    )
+    return fig
+
+
+@memoize_figure
+def make_sentiment_over_time(
+    df=None, sentiments=None, output_file=None, daily=None, viewport_width=None
+) -> go.Figure:
     """
     Creates a Plotly line chart showing sentiment trends over time.
 
@@ -283,33 +537,38 @@ def make_sentiment_over_time(df, sentiments, output_file=None) -> px.line:
         df (pd.DataFrame): DataFrame containing the data with timestamps
         sentiments (list): List of sentiment dictionaries with labels
         output_file (str, optional): Deprecated. Kept for backwards compatibility.
+        daily (pd.DataFrame, optional): Daily `createdAt` and `sentiment_score`
+            means, e.g. from a rollup, used instead of `df` and `sentiments`.
+        viewport_width (int, optional): Chart width in pixels, bounding the
+            number of points drawn (see `views.downsample`).
 
     Returns:
         plotly.graph_objects.Figure: A Plotly figure object showing sentiment over time
     """
-    # If dataset has timestamps, aggregate sentiment scores over time
-    if "createdAt" not in df.columns:
-        print("No timestamp column available for temporal analysis.")
-        return None
-
-    # Convert sentiment labels to a 5-point scale
-    sentiment_mapping = {
-        "Very Negative": -2,
-        "Negative": -1,
-        "Neutral": 0,
-        "Positive": 1,
-        "Very Positive": 2,
-    }
-
-    # Map each sentiment to our 5-point scale (defaulting to 0 for unknown labels)
-    df["sentiment_score"] = [sentiment_mapping.get(s["label"], 0) for s in sentiments]
-
-    df = df.set_index("createdAt")
-    # Resample daily and take mean score
-    sentiment_series = df["sentiment_score"].resample("D").mean().reset_index()
+    if daily is not None:
+        sentiment_series = daily
+    else:
+        # If dataset has timestamps, aggregate sentiment scores over time
+        if "createdAt" not in df.columns:
+            print("No timestamp column available for temporal analysis.")
+            return None
+
+        # Map each sentiment to our 5-point scale (defaulting to 0 for unknown labels)
+        sentiment_scores = [
+            constants.SENTIMENT_MAPPING.get(s["label"], 0) for s in sentiments
+        ]
+
+        # Daily mean score, without touching `df`
+        sentiment_series = aggregate_daily_mean(df["createdAt"], sentiment_scores)
+        sentiment_series = sentiment_series.rename(columns={"value": "sentiment_score"})
+
+    sentiment_series = downsample(
+        sentiment_series, "createdAt", "sentiment_score", viewport_width
+    )
 
-    # Create plotly figure
+    import plotly.express as px
 
+    # Create plotly figure
     fig = px.line(
         sentiment_series,
         x="createdAt",
@@ -343,11 +602,12 @@ def make_sentiment_over_time(df, sentiments, output_file=None) -> px.line:
     return fig
 
 
+@memoize_figure
 def make_bar_chart(
     data: Union[pd.DataFrame, dict] = None,
     orientation: Optional[str] = None,
     column: str = None,
-) -> px.bar:
+) -> go.Figure:
     """
     Creates a plotly bar chart with some default settings.
 
@@ -357,7 +617,7 @@ def make_bar_chart(
         column (str): The column to plot from the DataFrame.
 
     Returns:
-        px.bar: A plotly bar chart.
+        go.Figure: A plotly bar chart.
     """
 
     # Input validation
@@ -368,9 +628,11 @@ def make_bar_chart(
 
     logger.info(f"Generating bar chart | Column: {column}, Orientation: {orientation}")
 
-    bar_counts = get_bar_df(data, column)
+    bar_counts = aggregate_bar(data, column)
 
     # Create the bar chart
+    import plotly.express as px
+
     fig = px.bar(
         bar_counts,
         x="count" if orientation == "h" else bar_counts.columns[0],
@@ -398,9 +660,10 @@ def make_bar_chart(
     return fig
 
 
+@memoize_figure
 def make_pie_chart(
     data: pd.DataFrame = None, column: str = None, show_legend: str = None
-) -> px.pie:
+) -> go.Figure:
     """
     Creates a plotly pie chart with some default settings.
 
@@ -410,7 +673,7 @@ def make_pie_chart(
         show_legend (str): Whether to show the legend. Defaults to True.
 
     Returns:
-        px.pie: A plotly pie chart.
+        go.Figure: A plotly pie chart.
     """
 
     # Input validation
@@ -421,9 +684,11 @@ def make_pie_chart(
 
     logger.info(f"Generating pie chart | Column: {column}, Show legend: {show_legend}")
 
-    pie_counts = get_pie_df(data, column)
+    pie_counts = aggregate_pie(data, column)
 
     # Create the pie chart
+    import plotly.express as px
+
     fig = px.pie(
         pie_counts,
         names=column,
@@ -0,0 +1,398 @@
+"""
+Force-directed graph layout in vectorized NumPy.
+
+Fruchterman-Reingold forces with a grid-based Barnes-Hut approximation: nodes
+are binned into a grid sized to hold about `leaf_size` nodes per cell.
+Repulsion from the 3x3 block of neighbouring cells is computed exactly, and
+every farther cell acts as a single body at its center of mass. One iteration
+costs O(n * (leaf_size + n / leaf_size)) instead of O(n^2), and the memory use
+is bounded by the chunk size rather than by n^2.
+"""
+
+import hashlib
+import os
+import time
+from typing import TYPE_CHECKING, Optional
+
+import numpy as np
+from loguru import logger
+
+from utils import constants, traced
+from utils.cache import memory_cache
+
+if TYPE_CHECKING:
+    # Imported when a small graph is laid out, not with the app
+    import networkx as nx
+
+# Rows of the (nodes x cells) far-field and (nodes x neighbours) near-field
+# blocks processed at once
+_FAR_FIELD_CHUNK = 4096
+_NEAR_FIELD_CHUNK = 512
+
+# Graphs up to this size are laid out with nx.spring_layout
+_SPRING_LAYOUT_MAX_NODES = 100
+
+
+def graph_arrays(G: "nx.Graph") -> tuple[list, np.ndarray, np.ndarray]:
+    """
+    Convert a networkx graph to index arrays.
+
+    Args:
+        G (nx.Graph): The graph.
+
+    Returns:
+        nodes (list): The nodes, in the order used by the arrays.
+        edges (np.ndarray): A (m, 2) int64 array of node indices.
+        weights (np.ndarray): A (m,) float64 array of edge weights (default 1).
+    """
+
+    nodes = list(G.nodes())
+    index = {node: i for i, node in enumerate(nodes)}
+
+    edges = np.fromiter(
+        (index[n] for edge in G.edges() for n in edge),
+        dtype=np.int64,
+        count=2 * G.number_of_edges(),
+    ).reshape(-1, 2)
+    weights = np.fromiter(
+        (w for _, _, w in G.edges(data="weight", default=1.0)),
+        dtype=np.float64,
+        count=G.number_of_edges(),
+    )
+    return nodes, edges, weights
+
+
+def _squared_distances(a: np.ndarray, b: np.ndarray) -> np.ndarray:
+    """
+    Pairwise squared distances between the rows of two (n, 2) arrays.
+    """
+    dx = a[:, 0, None] - b[:, 0]
+    dy = a[:, 1, None] - b[:, 1]
+    return dx * dx + dy * dy
+
+
+def _repulsion(pos: np.ndarray, k: float, leaf_size: int) -> np.ndarray:
+    """
+    Approximate Fruchterman-Reingold repulsion (k^2 / d) on every node.
+    """
+
+    n = len(pos)
+    # Balance the near field (9 * leaf_size pairs per node) against the far
+    # field (n / leaf_size cell bodies per node)
+    leaf_size = leaf_size or max(16, int(np.sqrt(n / 9)))
+    grid = max(1, int(np.sqrt(n / leaf_size)))
+
+    # Quantile bin edges keep the cells balanced when the layout is uneven or
+    # has outliers (e.g. isolated nodes drifting away)
+    quantiles = np.linspace(0, 1, grid + 1)[1:-1]
+    cell_xy = np.column_stack(
+        [
+            np.searchsorted(np.quantile(pos[:, axis], quantiles), pos[:, axis])
+            for axis in range(2)
+        ]
+    )
+    cells = cell_xy[:, 0] * grid + cell_xy[:, 1]
+
+    order = np.argsort(cells, kind="stable")
+    counts = np.bincount(cells, minlength=grid * grid)
+    starts = np.concatenate(([0], np.cumsum(counts)))
+
+    # Cell bodies: mass and center of mass of every non-empty cell
+    occupied = np.flatnonzero(counts)
+    mass = counts[occupied].astype(np.float64)
+    center = (
+        np.column_stack(
+            [
+                np.bincount(cells, weights=pos[:, 0], minlength=grid * grid)[occupied],
+                np.bincount(cells, weights=pos[:, 1], minlength=grid * grid)[occupied],
+            ]
+        )
+        / mass[:, None]
+    )
+    body_x, body_y = occupied // grid, occupied % grid
+
+    # Pairwise terms in single precision halve the memory traffic
+    pos = pos.astype(np.float32)
+    center = center.astype(np.float32)
+    mass = mass.astype(np.float32)
+    force = np.zeros_like(pos)
+
+    # Far field: every node against every non-neighbouring cell body. The sum
+    # of (p_i - c_j) * w_ij over j is p_i * sum_j(w_ij) - (w @ c)_i.
+    for start in range(0, n, _FAR_FIELD_CHUNK):
+        rows = slice(start, start + _FAR_FIELD_CHUNK)
+        far = (np.abs(cell_xy[rows, 0, None] - body_x) > 1) | (
+            np.abs(cell_xy[rows, 1, None] - body_y) > 1
+        )
+        dist2 = _squared_distances(pos[rows], center)
+        scale = np.where(far, mass / np.maximum(dist2, 1e-12), 0.0)
+        force[rows] += pos[rows] * scale.sum(axis=1)[:, None] - scale @ center
+
+    # Near field: exact pairs within each 3x3 block of cells
+    for cell in occupied:
+        cx, cy = divmod(cell, grid)
+        members = order[starts[cell] : starts[cell + 1]]
+        block = [
+            x * grid + y
+            for x in range(max(cx - 1, 0), min(cx + 2, grid))
+            for y in range(max(cy - 1, 0), min(cy + 2, grid))
+        ]
+        neighbours = pos[
+            np.concatenate([order[starts[c] : starts[c + 1]] for c in block])
+        ]
+        for chunk in range(0, len(members), _NEAR_FIELD_CHUNK):
+            rows = members[chunk : chunk + _NEAR_FIELD_CHUNK]
+            dist2 = _squared_distances(pos[rows], neighbours)
+            with np.errstate(divide="ignore"):
+                scale = np.where(dist2 > 0, 1.0 / dist2, 0.0)
+            force[rows] += pos[rows] * scale.sum(axis=1)[:, None] - scale @ neighbours
+
+    return force.astype(np.float64) * k**2
+
+
+def force_layout_array(
+    num_nodes: int,
+    edges: np.ndarray,
+    weights: Optional[np.ndarray] = None,
+    iterations: int = 50,
+    seed: int = 42,
+    initial: Optional[np.ndarray] = None,
+    temperature: float = 0.1,
+    gravity: float = 0.05,
+    leaf_size: Optional[int] = None,
+    time_budget: Optional[float] = None,
+) -> np.ndarray:
+    """
+    Compute a force-directed layout from index arrays.
+
+    Args:
+        num_nodes (int): Number of nodes.
+        edges (np.ndarray): A (m, 2) array of node indices.
+        weights (np.ndarray, optional): Edge weights scaling the attraction.
+        iterations (int): Iteration budget.
+        seed (int): Seed of the random initial positions.
+        initial (np.ndarray, optional): (n, 2) initial positions. With initial
+            positions, a small `temperature` gives a local refinement.
+        temperature (float): Initial maximum displacement, as a fraction of the
+            layout extent. It cools down linearly to zero.
+        gravity (float): Pull towards the origin keeping components together.
+        leaf_size (int, optional): Target number of nodes per grid cell,
+            chosen from the graph size by default.
+        time_budget (float, optional): Stop after this many seconds.
+
+    Returns:
+        np.ndarray: (n, 2) positions rescaled to [-1, 1].
+    """
+
+    if num_nodes == 0:
+        return np.empty((0, 2))
+    if num_nodes == 1:
+        return np.zeros((1, 2))
+
+    # Optimal distance for a layout filling a square of side sqrt(n)
+    k = 1.0
+    side = np.sqrt(num_nodes)
+
+    if initial is None:
+        pos = np.random.default_rng(seed).uniform(-side / 2, side / 2, (num_nodes, 2))
+    else:
+        pos = _rescale(np.asarray(initial, dtype=np.float64), side / 2)
+
+    edges = np.asarray(edges, dtype=np.int64).reshape(-1, 2)
+    weights = np.ones(len(edges)) if weights is None else np.asarray(weights, float)
+    source, target = edges[:, 0], edges[:, 1]
+
+    started = time.perf_counter()
+    step = temperature * side
+    for iteration in range(iterations):
+        displacement = _repulsion(pos, k, leaf_size)
+
+        # Attraction along edges: d^2 / k, scaled by the edge weight
+        delta = pos[source] - pos[target]
+        dist = np.sqrt((delta**2).sum(axis=1))
+        pull = delta * (dist * weights / k)[:, None]
+        for axis in range(2):
+            displacement[:, axis] -= np.bincount(
+                source, weights=pull[:, axis], minlength=num_nodes
+            )
+            displacement[:, axis] += np.bincount(
+                target, weights=pull[:, axis], minlength=num_nodes
+            )
+
+        displacement -= gravity * pos
+
+        # Limit the move of each node to the current temperature
+        length = np.maximum(np.sqrt((displacement**2).sum(axis=1)), 1e-12)
+        limit = step * (1 - iteration / iterations)
+        pos += displacement * (np.minimum(length, limit) / length)[:, None]
+
+        if time_budget is not None and time.perf_counter() - started > time_budget:
+            break
+
+    return _rescale(pos, 1.0)
+
+
+def _rescale(pos: np.ndarray, scale: float) -> np.ndarray:
+    """
+    Center the positions and scale them to [-scale, scale].
+    """
+    pos = pos - pos.mean(axis=0)
+    extent = np.abs(pos).max()
+    return pos * (scale / extent) if extent > 0 else pos
+
+
+def force_layout(
+    G: "nx.Graph",
+    iterations: int = 50,
+    seed: int = 42,
+    initial_pos: Optional[dict] = None,
+    **kwargs,
+) -> dict:
+    """
+    Compute a force-directed layout of a networkx graph.
+
+    A drop-in replacement for `nx.spring_layout`/`nx.kamada_kawai_layout` that
+    scales to large graphs.
+
+    Args:
+        G (nx.Graph): The graph.
+        iterations (int): Iteration budget.
+        seed (int): Seed of the random initial positions.
+        initial_pos (dict, optional): Initial position per node; nodes without
+            one are placed at random.
+        **kwargs: Forwarded to `force_layout_array`.
+
+    Returns:
+        dict: Node -> np.ndarray([x, y]).
+    """
+
+    nodes, edges, weights = graph_arrays(G)
+
+    initial = None
+    if initial_pos:
+        rng = np.random.default_rng(seed)
+        initial = np.array(
+            [
+                initial_pos[node] if node in initial_pos else rng.uniform(-1, 1, 2)
+                for node in nodes
+            ],
+            dtype=np.float64,
+        )
+
+    pos = force_layout_array(
+        len(nodes),
+        edges,
+        weights,
+        iterations=iterations,
+        seed=seed,
+        initial=initial,
+        **kwargs,
+    )
+    return dict(zip(nodes, pos, strict=True))
+
+
+def graph_fingerprint(G: "nx.Graph", **params) -> str:
+    """
+    Identify a graph version by its nodes, edges and weights.
+
+    Args:
+        G (nx.Graph): The graph.
+        **params: Layout parameters that are part of the fingerprint.
+
+    Returns:
+        str: A hex digest.
+    """
+
+    nodes, edges, weights = graph_arrays(G)
+    digest = hashlib.blake2b(digest_size=16)
+    digest.update(repr((nodes, sorted(params.items()))).encode("utf-8"))
+    digest.update(edges.tobytes())
+    digest.update(weights.tobytes())
+    return digest.hexdigest()
+
+
+@traced("layout", size="G")
+def global_layout(G: "nx.Graph", seed: int = 42, iterations: int = 50) -> dict:
+    """
+    Layout of the full graph, computed once per graph version.
+
+    Positions are kept in the stage memory cache and stored under
+    `CACHE_DIR/layouts/`, keyed by the graph fingerprint, so views of the same
+    graph (e.g. highlighted neighbourhoods) reuse them and nodes keep their
+    place between views.
+
+    Args:
+        G (nx.Graph): The full graph.
+        seed (int): Seed of the layout.
+        iterations (int): Iteration budget of the layout.
+
+    Returns:
+        dict: Node -> np.ndarray([x, y]).
+    """
+
+    nodes = list(G.nodes())
+    key = graph_fingerprint(G, seed=seed, iterations=iterations)
+    path = os.path.join(constants.CACHE_DIR, "layouts", f"{key}.npy")
+
+    positions = memory_cache.get(f"layout:{key}")
+    if positions is None:
+        started = time.perf_counter()
+        if os.path.exists(path):
+            logger.info(f"Loading stored layout | Path: {path}")
+            positions = np.load(path)
+        else:
+            logger.info(f"Computing global layout | Nodes: {len(nodes)}")
+            if len(nodes) <= _SPRING_LAYOUT_MAX_NODES:
+                import networkx as nx
+
+                pos = nx.spring_layout(G, seed=seed, iterations=iterations)
+            else:
+                pos = force_layout(G, iterations=iterations, seed=seed)
+            positions = np.array([pos[node] for node in nodes]).reshape(-1, 2)
+
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            tmp_path = f"{path}.tmp.npy"
+            np.save(tmp_path, positions)
+            os.replace(tmp_path, path)
+        memory_cache.put(
+            f"layout:{key}",
+            positions,
+            cache="layout",
+            cost=time.perf_counter() - started,
+        )
+
+    return dict(zip(nodes, positions, strict=True))
+
+
+def refine_layout(
+    G: "nx.Graph", pos: dict, iterations: int = 10, temperature: float = 0.02
+) -> dict:
+    """
+    Short local refinement of existing positions, e.g. for a subgraph.
+
+    The refined positions are mapped back onto the extent of the original
+    ones, so the view does not jump.
+
+    Args:
+        G (nx.Graph): The (sub)graph to refine.
+        pos (dict): Starting position of each node of `G`.
+        iterations (int): Iteration budget.
+        temperature (float): Maximum displacement as a fraction of the extent.
+
+    Returns:
+        dict: Node -> np.ndarray([x, y]).
+    """
+
+    nodes = list(G.nodes())
+    if len(nodes) < 2 or iterations <= 0:
+        return {node: pos[node] for node in nodes}
+
+    start = np.array([pos[node] for node in nodes])
+    refined = force_layout(
+        G, iterations=iterations, initial_pos=pos, temperature=temperature
+    )
+    refined = np.array([refined[node] for node in nodes])
+
+    center = start.mean(axis=0)
+    extent = np.abs(start - center).max()
+    return dict(zip(nodes, center + refined * extent, strict=True))
@@ -10,6 +10,7 @@ from src.controllers import (
     count_primary_colors,
     get_cards_df,
     get_line_df,
+    version_token,
 )
 
 
@@ -31,6 +32,22 @@ def test_count_card_names():
     assert result == {("A", "B"): 1, ("A",): 1, ("B", "C"): 1}
 
 
+def test_version_token():
+    df = pd.DataFrame(
+        {"_id": [1, 2], "updatedAt": pd.to_datetime(["2024-01-01", "2024-02-01"])}
+    )
+    token = version_token(df)
+    assert token == version_token(df.copy())
+
+    # New cards and updated cards change the version
+    added = pd.concat([df, df.iloc[:1]], ignore_index=True)
+    assert version_token(added) != token
+    updated = df.assign(updatedAt=pd.to_datetime(["2024-03-01", "2024-02-01"]))
+    assert version_token(updated) != token
+
+    assert version_token(df.iloc[:0]) == "0@none"
+
+
 def test_get_cards_df(mocker):
     mock_get_mongo_cards = mocker.patch("controllers.functions.get_mongo_cards")
     mock_get_mongo_cards.side_effect = [
@@ -0,0 +1,69 @@
+"""
+Test the functions in controllers.aggregations.py.
+
+"""
+
+import numpy as np
+import pandas as pd
+
+from src.controllers import get_bar_df, get_line_df, get_pie_df
+from src.controllers.aggregations import (
+    aggregate_bar,
+    aggregate_daily_mean,
+    aggregate_line,
+    aggregate_pie,
+)
+
+
+def test_aggregate_pie():
+    df = pd.DataFrame({"type": [["b", "a"], "Creature", ["a", "b"], None]})
+    original = df.copy()
+
+    result = aggregate_pie(df, "type")
+    pd.testing.assert_frame_equal(df, original)
+    expected = get_pie_df(df.copy(), "type")
+    assert dict(zip(result["type"], result["count"], strict=True)) == dict(
+        zip(expected["type"], expected["count"], strict=True)
+    )
+
+
+def test_aggregate_line():
+    df = pd.DataFrame(
+        {
+            "concept": ["a", "b", "a", None, "c"],
+            "updatedAt": [
+                "2024-01-01 10:00",
+                "2024-01-01 12:00",
+                "2024-01-01 13:00",
+                "2024-01-02 09:00",
+                "not a date",
+            ],
+        }
+    )
+    original = df.copy()
+
+    result = aggregate_line(df, "concept", "updatedAt")
+    pd.testing.assert_frame_equal(df, original)
+    expected = get_line_df(df.copy(), "concept", "updatedAt")
+    assert result["count"].tolist() == expected["count"].tolist() == [2, 0]
+    assert result["updatedAt"].tolist() == list(pd.date_range("2024-01-01", periods=2))
+
+
+def test_aggregate_bar():
+    df = pd.DataFrame({"colors": ["Red", "Blue", "Red"]})
+    result = aggregate_bar(df, "colors")
+    expected = get_bar_df(df, "colors")
+    assert result.to_numpy().tolist() == expected.to_numpy().tolist()
+
+    result = aggregate_bar({"a": 1, "b": 3})
+    assert result["key"].tolist() == ["b", "a"]
+
+
+def test_aggregate_daily_mean():
+    timestamps = pd.Series(
+        pd.to_datetime(["2024-01-01 10:00", "2024-01-01 20:00", "2024-01-03 08:00"]),
+        name="createdAt",
+    )
+    result = aggregate_daily_mean(timestamps, [1, -1, 2])
+    assert result["createdAt"].tolist() == list(pd.date_range("2024-01-01", periods=3))
+    assert np.array_equal(result["value"], [0.0, np.nan, 2.0], equal_nan=True)
@@ -0,0 +1,75 @@
+"""
+Test the functions in controllers.dedup.py.
+
+"""
+
+import hashlib
+
+import numpy as np
+import pandas as pd
+
+from src.controllers.dedup import (
+    dedup_cards,
+    find_near_duplicates,
+    load_or_build_mapping,
+    minhash_signatures,
+    normalize_text,
+)
+from src.utils.cache import MemoryCache
+
+
+def test_normalize_text():
+    assert normalize_text("  Color-Theory!! ") == "color theory"
+    assert normalize_text("\uff24\uff32\uff21\uff27\uff2f\uff2e") == "dragon"
+
+
+def test_minhash_signatures():
+    signatures = minhash_signatures(["dragon", "dragon", "zebra"], num_perm=32)
+    assert signatures.shape == (3, 32)
+    assert np.array_equal(signatures[0], signatures[1])
+    assert not np.array_equal(signatures[0], signatures[2])
+
+
+def test_find_near_duplicates():
+    labels = find_near_duplicates(["color theory", "colour theory", "zebra"])
+    assert labels[0] == labels[1]
+    assert labels[0] != labels[2]
+
+    # Embeddings veto matches that are not semantically close
+    embeddings = np.array([[1.0, 0.0], [0.0, 1.0], [1.0, 1.0]])
+    labels = find_near_duplicates(
+        ["color theory", "colour theory", "zebra"], embeddings=embeddings
+    )
+    assert len(set(labels)) == 3
+
+
+def test_dedup_cards(tmp_path, mocker):
+    mocker.patch("utils.constants.CACHE_DIR", str(tmp_path))
+    df = pd.DataFrame(
+        {
+            "name": ["Dragon", "dragon", "Dragon", "Zebra", None],
+            "flavorText": ["A fiery beast.", "a fiery beast", "x", "y", None],
+        }
+    )
+    df, report = dedup_cards(df)
+
+    assert df["concept"].tolist()[:4] == ["Dragon", "Dragon", "Dragon", "Zebra"]
+    assert df["flavorGroup"].iloc[0] == df["flavorGroup"].iloc[1]
+    assert report["names"] == 3
+    assert report["concepts"] == 2
+    assert list((tmp_path / "dedup").glob("concepts-*.json"))
+
+
+def test_mapping_memo_keyed_on_version(tmp_path, mocker):
+    mocker.patch("utils.constants.CACHE_DIR", str(tmp_path))
+    mocker.patch("src.controllers.dedup.memory_cache", MemoryCache(2**20))
+    names = pd.Series(["Dragon", "dragon", "Zebra"])
+    mapping = load_or_build_mapping(names, "concepts", version="v1")
+    assert mapping["dragon"] == "Dragon"
+
+    # A known version is served without reading its values again
+    blake2b = mocker.spy(hashlib, "blake2b")
+    assert load_or_build_mapping(names, "concepts", version="v1") is mapping
+    blake2b.assert_not_called()
+    assert load_or_build_mapping(names, "concepts", version="v2") == mapping
+    blake2b.assert_called_once()
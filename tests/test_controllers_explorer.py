@@ -0,0 +1,116 @@
+"""
+Test the raw data explorer in controllers/explorer.py.
+
+"""
+
+import pandas as pd
+import pytest
+
+from src.controllers import explorer
+from src.utils.cache import MemoryCache
+
+
+@pytest.fixture
+def cards(monkeypatch):
+    # A cache of its own, so results of other tests are not served
+    monkeypatch.setattr("utils.cache.memory_cache", MemoryCache(2**20))
+    df = pd.DataFrame(
+        {
+            "name": ["Oracle", "dragon", "Dragon Lord", None, "Sphinx"],
+            "type": pd.Categorical(
+                ["Instant", "Creature", "Creature", "Sorcery", None],
+                categories=["Sorcery", "Instant", "Creature"],
+            ),
+            "colors": [["U"], ["R"], ["R", "B"], [], ["U"]],
+            "retrievalCount": [5, 3, 9, 1, 7],
+            "flavorText": ["x" * 300, "short", "", None, "quiet"],
+        }
+    )
+    df.attrs["version"] = "v1"
+    return df
+
+
+def test_filter_and_sort(cards):
+    rows, total = explorer.explore_cards(cards, "name", " DRAGON ", "retrievalCount")
+    assert total == 2
+    assert rows["name"].tolist() == ["dragon", "Dragon Lord"]
+
+    # Categoricals match on their values and sort by them, missing last
+    rows, total = explorer.explore_cards(cards, "type", "r", "type", ascending=False)
+    assert rows["type"].tolist() == ["Sorcery", "Creature", "Creature"]
+    rows, _ = explorer.explore_cards(cards, sort_by="type")
+    assert rows["type"].tolist() == ["Creature", "Creature", "Instant", "Sorcery", ""]
+
+    # Lists match on their joined values
+    rows, total = explorer.explore_cards(cards, "colors", "b")
+    assert total == 1 and rows["colors"].tolist() == ["R, B"]
+
+
+def test_pages(cards):
+    rows, total = explorer.explore_cards(
+        cards, sort_by="retrievalCount", ascending=False, page=1, page_size=2
+    )
+    assert total == 5
+    assert rows["retrievalCount"].tolist() == [5, 3]
+
+    # Past the last page, the last page is returned
+    rows, _ = explorer.explore_cards(cards, page=10, page_size=2)
+    assert rows["retrievalCount"].tolist() == [7]
+
+    rows, total = explorer.explore_cards(cards, "name", "missing")
+    assert total == 0 and rows.empty
+
+
+def test_long_texts_are_shortened(cards):
+    rows, _ = explorer.explore_cards(cards)
+    assert len(rows["flavorText"].iloc[0]) == explorer.constants.EXPLORER_MAX_CHARS
+    assert rows["flavorText"].iloc[0].endswith("…")
+    assert rows["flavorText"].tolist()[1:] == ["short", "", "", "quiet"]
+
+
+def test_order_is_cached_per_version(cards, monkeypatch):
+    calls = []
+    contains = explorer._contains
+    monkeypatch.setattr(
+        explorer, "_contains", lambda *args: calls.append(args) or contains(*args)
+    )
+
+    explorer.explore_cards(cards, "name", "dragon", page=0, page_size=1)
+    explorer.explore_cards(cards, "name", "dragon", page=1, page_size=1)
+    assert len(calls) == 1
+
+    cards.attrs["version"] = "v2"
+    explorer.explore_cards(cards, "name", "dragon")
+    assert len(calls) == 2
+
+
+def test_raw_cards_joins_stored_columns_on_id(cards, monkeypatch):
+    cards["_id"] = ["a", "b", "c", "d", "e"]
+    cards["concept"] = ["x", "y", "y", "z", "x"]
+    loads = []
+
+    def get_cards_df():
+        loads.append(1)
+        # Stored in another order, with a column the sections do not load
+        return pd.DataFrame(
+            {
+                "_id": ["e", "d", "c", "b", "a"],
+                "name": ["Sphinx", None, "Dragon Lord", "dragon", "Oracle"],
+                "chatId": ["5", "4", "3", "2", "1"],
+            }
+        )
+
+    monkeypatch.setattr(explorer, "get_cards_df", get_cards_df)
+    df = explorer.raw_cards(cards, version="v1")
+
+    # The stored columns first, then those only the dashboard's cards have
+    assert df.columns.tolist()[:3] == ["_id", "name", "chatId"]
+    assert set(df.columns) == {"chatId", *cards.columns}
+    assert df["_id"].tolist() == ["a", "b", "c", "d", "e"]
+    assert df["chatId"].tolist() == ["1", "2", "3", "4", "5"]
+    assert df["concept"].tolist() == cards["concept"].tolist()
+    assert df.attrs["version"] == "v1"
+
+    # Loaded once per version, not on every page
+    explorer.raw_cards(cards, version="v1")
+    assert len(loads) == 1
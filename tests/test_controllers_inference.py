@@ -0,0 +1,154 @@
+"""
+Test the micro-batching inference server in controllers.inference.py.
+
+"""
+
+import threading
+
+import numpy as np
+import pytest
+
+from src.controllers.inference import (
+    InferenceClient,
+    InferenceServer,
+    InferenceUnavailable,
+    MicroBatcher,
+)
+
+
+class FakeModels:
+    """
+    Models answering from the texts, recording the size of every batch.
+    """
+
+    def __init__(self):
+        self.batches = []
+
+    def embed(self, texts, model_name):
+        self.batches.append(len(texts))
+        return [np.full(3, len(text), dtype=np.float32) for text in texts]
+
+    def sentiment(self, texts):
+        self.batches.append(len(texts))
+        if "fail" in texts:
+            raise RuntimeError("model failed")
+        return [{"label": "Positive", "score": len(text) / 10} for text in texts]
+
+
+@pytest.fixture
+def server():
+    server = InferenceServer(("127.0.0.1", 0), FakeModels(), max_wait=0.05)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+def test_batcher_coalesces_concurrent_requests():
+    sizes = []
+
+    def double(texts):
+        sizes.append(len(texts))
+        return [text * 2 for text in texts]
+
+    batcher = MicroBatcher(double, max_batch_size=64, max_wait=0.2)
+    results = {}
+    barrier = threading.Barrier(4)
+
+    def submit(i):
+        barrier.wait()
+        results[i] = batcher.submit([f"{i}a", f"{i}b"], timeout=5)
+
+    threads = [threading.Thread(target=submit, args=(i,)) for i in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert results == {i: [f"{i}a" * 2, f"{i}b" * 2] for i in range(4)}
+    # Eight texts from four requests in fewer than four model calls
+    assert sum(sizes) == 8
+    assert len(sizes) < 4
+    assert batcher.stats()["items"] == 8
+
+
+def test_batcher_splits_at_max_batch_size():
+    sizes = []
+    batcher = MicroBatcher(
+        lambda texts: sizes.append(len(texts)) or texts, max_batch_size=3, max_wait=0
+    )
+    assert batcher.submit(list("abcdefg"), timeout=5) == list("abcdefg")
+    assert max(sizes) <= 3
+
+
+def test_batcher_propagates_errors():
+    def fail(texts):
+        raise RuntimeError("model failed")
+
+    batcher = MicroBatcher(fail, max_wait=0)
+    with pytest.raises(RuntimeError, match="model failed"):
+        batcher.submit(["a"], timeout=5)
+    assert batcher.submit([], timeout=5) == []
+
+
+def test_batcher_survives_wrong_result_count():
+    # Drops the result of "bad"
+    batcher = MicroBatcher(
+        lambda texts: [text for text in texts if text != "bad"], max_wait=0
+    )
+    with pytest.raises(ValueError, match="0 results for 1 texts"):
+        batcher.submit(["bad"], timeout=5)
+    assert batcher.submit(["a", "b"], timeout=5) == ["a", "b"]
+
+
+def test_batcher_isolates_failing_texts():
+    def upper(texts):
+        if "bad" in texts:
+            raise RuntimeError("model failed")
+        return [text.upper() for text in texts]
+
+    batcher = MicroBatcher(upper, max_batch_size=64, max_wait=0.2)
+    results, errors = {}, {}
+    barrier = threading.Barrier(2)
+
+    def submit(i, texts):
+        barrier.wait()
+        try:
+            results[i] = batcher.submit(texts, timeout=5)
+        except RuntimeError as e:
+            errors[i] = e
+
+    threads = [
+        threading.Thread(target=submit, args=(0, ["a", "b"])),
+        threading.Thread(target=submit, args=(1, ["c", "bad"])),
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    # Both requests shared the failed batch; only the one with "bad" fails
+    assert batcher.stats()["batches"] == 1
+    assert results == {0: ["A", "B"]}
+    assert list(errors) == [1]
+
+
+def test_client_roundtrip(server):
+    client = InferenceClient(f"http://127.0.0.1:{server.server_port}")
+
+    embeddings = client.embed(["a", "abc"], "model")
+    assert embeddings.dtype == np.float32
+    np.testing.assert_array_equal(embeddings, [[1, 1, 1], [3, 3, 3]])
+
+    sentiments = client.sentiment(["ab"])
+    assert sentiments == [{"label": "Positive", "score": 0.2}]
+
+    with pytest.raises(InferenceUnavailable, match="500"):
+        client.sentiment(["fail"])
+
+
+def test_client_unreachable():
+    client = InferenceClient("http://127.0.0.1:9", timeout=1)
+    with pytest.raises(InferenceUnavailable):
+        client.embed(["a"])
@@ -0,0 +1,171 @@
+"""
+Test the job runner in controllers.jobs.py.
+
+"""
+
+import threading
+import time
+
+from src.controllers.jobs import CANCELLED, DONE, FAILED, JobRunner, scaled
+
+
+def wait_for(job, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while not job.finished and time.monotonic() < deadline:
+        time.sleep(0.01)
+    return job
+
+
+def blocking_stage(release, steps=100):
+    """
+    A stage reporting progress until `release` is set, then returning.
+    """
+
+    def stage(value, _progress):
+        done = []
+        for step in range(steps):
+            done.append(step)
+            _progress(step / steps, partial=done)
+            if release.wait(0.01):
+                break
+        return value * 2
+
+    return stage
+
+
+def test_submit_runs_stage():
+    runner = JobRunner(max_workers=1)
+    job = wait_for(runner.submit("double", lambda x, _progress: x * 2, 21))
+    assert job.status == DONE
+    assert job.result == 42
+    assert job.progress == 1.0
+
+
+def test_identical_jobs_are_deduplicated():
+    runner = JobRunner(max_workers=2)
+    release = threading.Event()
+    calls = []
+
+    def stage(value, _progress):
+        calls.append(value)
+        release.wait(5)
+        return value
+
+    first = runner.submit("key", stage, 1, session_id="a")
+    second = runner.submit("key", stage, 1, session_id="b")
+    assert first is second
+    assert set(first.subscribers) == {"a", "b"}
+
+    release.set()
+    wait_for(first)
+    assert calls == [1]
+    # Finished jobs are shared too
+    assert runner.submit("key", stage, 1, session_id="c").result == 1
+    assert calls == [1]
+
+
+def test_progress_and_partial_results():
+    runner = JobRunner(max_workers=1)
+    release = threading.Event()
+    job = runner.submit("partial", blocking_stage(release), 1)
+
+    deadline = time.monotonic() + 5
+    while job.partial is None and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert job.status == "running"
+    assert 0 <= job.progress < 1
+    assert len(job.partial) >= 1
+
+    release.set()
+    assert wait_for(job).result == 2
+
+
+def test_cancel_stops_stage():
+    runner = JobRunner(max_workers=1)
+    job = runner.submit("cancel", blocking_stage(threading.Event(), steps=10**6), 1)
+    runner.cancel("cancel")
+    assert wait_for(job).status == CANCELLED
+    assert job.result is None
+
+    # A cancelled job is started again on the next submit
+    again = runner.submit("cancel", lambda x, _progress: x, 1)
+    assert again is not job
+    assert wait_for(again).status == DONE
+
+
+def test_failed_job_records_error():
+    calls = []
+
+    def stage(_progress):
+        calls.append(1)
+        raise ValueError("boom")
+
+    runner = JobRunner(max_workers=1)
+    job = wait_for(runner.submit("fail", stage))
+    assert job.status == FAILED
+    assert isinstance(job.error, ValueError)
+
+    # Reruns keep seeing the failure instead of running the stage again
+    for _ in range(5):
+        assert runner.submit("fail", stage) is job
+    assert len(calls) == 1
+
+    runner.retry("fail")
+    again = wait_for(runner.submit("fail", stage))
+    assert again is not job and again.status == FAILED
+    assert len(calls) == 2
+
+
+def test_failed_job_retried_after_backoff():
+    runner = JobRunner(max_workers=1, retry_backoff=0.1)
+    job = wait_for(runner.submit("fail", lambda _progress: 1 / 0))
+    assert runner.submit("fail", lambda _progress: 1) is job
+    time.sleep(0.15)
+    assert wait_for(runner.submit("fail", lambda _progress: 1)).result == 1
+
+
+def test_finished_jobs_are_dropped():
+    runner = JobRunner(max_workers=1, result_ttl=0.1)
+    job = wait_for(runner.submit("read", lambda _progress: 1, session_id="a"))
+    runner.submit("read", lambda _progress: 1, session_id="b")
+
+    # Dropped once every waiting session has read the result
+    runner.release("read", "a")
+    assert runner.poll("read", "b") is job
+    runner.release("read", "b")
+    assert runner.poll("read", "b") is None
+
+    # Or once its result has been kept for long enough
+    wait_for(runner.submit("unread", lambda _progress: 1, session_id="a"))
+    runner.reap()
+    assert runner.stats() == {DONE: 1}
+    time.sleep(0.15)
+    runner.reap()
+    assert runner.stats() == {}
+
+
+def test_abandoned_job_is_cancelled():
+    runner = JobRunner(max_workers=1, heartbeat_timeout=0.2)
+    stage = blocking_stage(threading.Event(), steps=10**6)
+    job = runner.submit("abandoned", stage, 1, session_id="a")
+    runner.submit("abandoned", stage, 1, session_id="b")
+
+    # One session leaves, the other keeps polling: the job goes on
+    runner.unsubscribe("abandoned", "a")
+    assert not job.cancelled
+    runner.poll("abandoned", "b")
+    assert runner.reap() == []
+
+    # Once the last session stops polling, the job is cancelled
+    time.sleep(0.3)
+    assert runner.reap() == ["abandoned"]
+    assert wait_for(job).status == CANCELLED
+
+
+def test_scaled_progress():
+    reports = []
+    report = scaled(lambda p, m=None, partial=None: reports.append(p), 0.5, 1.0)
+    report(0.0)
+    report(0.5)
+    report(1.0)
+    assert reports == [0.5, 0.75, 1.0]
@@ -0,0 +1,67 @@
+"""
+Test the functions in controllers.sentiment.py.
+
+"""
+
+import numpy as np
+
+from src.controllers.sentiment import (
+    LinearSentimentHead,
+    sentiment_agreement,
+    train_sentiment_head,
+)
+
+
+def _labelled_embeddings():
+    rng = np.random.default_rng(0)
+    labels = ["Very Negative", "Negative", "Neutral", "Positive", "Very Positive"]
+    centers = np.eye(5, 8) * 5
+    targets = rng.integers(0, 5, size=200)
+    embeddings = centers[targets] + rng.normal(scale=0.5, size=(200, 8))
+    return embeddings, [{"label": labels[t], "score": 1.0} for t in targets]
+
+
+def test_train_sentiment_head():
+    embeddings, sentiments = _labelled_embeddings()
+    head = train_sentiment_head(embeddings, sentiments, "test-model")
+
+    predictions = head.predict(embeddings)
+    assert len(predictions) == len(sentiments)
+    assert set(predictions[0]) == {"label", "score"}
+    assert head.agreement > 0.95
+
+    report = sentiment_agreement(head, embeddings, sentiments)
+    assert report["mean_abs_error"] < 0.1
+    assert set(report["recall"]) == set(head.labels)
+
+
+def test_sentiment_head_l2():
+    embeddings, sentiments = _labelled_embeddings()
+    weak = train_sentiment_head(embeddings, sentiments, "test-model", l2=0.01)
+    strong = train_sentiment_head(embeddings, sentiments, "test-model", l2=100.0)
+    # A larger l2 strength shrinks the weights
+    assert np.abs(strong.weights).sum() < np.abs(weak.weights).sum()
+
+
+def test_sentiment_head_missing_classes():
+    embeddings, sentiments = _labelled_embeddings()
+    kept_labels = {"Neutral", "Positive"}
+    keep = [i for i, s in enumerate(sentiments) if s["label"] in kept_labels]
+    head = train_sentiment_head(
+        embeddings[keep], [sentiments[i] for i in keep], "test-model"
+    )
+    labels = {p["label"] for p in head.predict(embeddings)}
+    assert labels <= kept_labels
+
+
+def test_sentiment_head_save_load(tmp_path):
+    embeddings, sentiments = _labelled_embeddings()
+    head = train_sentiment_head(embeddings, sentiments, "test-model")
+    path = str(tmp_path / "head.npz")
+    head.save(path)
+
+    loaded = LinearSentimentHead.load(path)
+    assert loaded.model_name == "test-model"
+    assert loaded.agreement == head.agreement
+    assert np.allclose(loaded.predict_proba(embeddings), head.predict_proba(embeddings))
+    assert LinearSentimentHead.load(str(tmp_path / "missing.npz")) is None
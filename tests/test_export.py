@@ -0,0 +1,87 @@
+"""
+Test the static snapshot export in export.py.
+
+"""
+
+import json
+
+import pandas as pd
+import pytest
+
+from src import export
+from src.models.rollups import RollupStore
+
+
+@pytest.fixture
+def cards(monkeypatch, tmp_path):
+    timestamps = pd.to_datetime(
+        ["2024-01-01 12:00", "2024-01-01 13:00", "2024-01-02 12:00"]
+    )
+    df = pd.DataFrame(
+        {
+            "_id": ["a", "b", "c"],
+            "createdAt": timestamps,
+            "updatedAt": timestamps,
+            "concept": ["Dragon", "Dragon", "Oracle"],
+            "type": ["Creature", "Instant", "Creature"],
+            "retrievalCount": [1, 2, 3],
+            "flavorGroup": ["Happy", "Happy", "Sad"],
+        }
+    )
+    df.attrs["version"] = "v1"
+    report = {"names": 3, "concepts": 2, "reduction": 1 / 3}
+    store = RollupStore(str(tmp_path / "rollups"))
+
+    monkeypatch.setattr(export, "load_cards", lambda: (df, report))
+    monkeypatch.setattr(export, "get_rollup_store", lambda: store)
+    monkeypatch.setattr(export, "load_sentiment_head", lambda: None)
+    return df
+
+
+def test_export_snapshot(cards, monkeypatch, tmp_path):
+    scored = []
+
+    def fake_sentiment(texts, *, version, _progress=None):
+        scored.append(list(texts))
+        return [{"label": "Positive", "score": 1.0} for _ in texts]
+
+    def failing_stage(df_cards):
+        raise RuntimeError("no model")
+
+    monkeypatch.setattr(export, "analyze_sentiment_emotion", fake_sentiment)
+    monkeypatch.setitem(
+        export.SECTIONS, "similarity", ("Similarity Graph", failing_stage)
+    )
+
+    output = tmp_path / "snapshot"
+    sections = ["overview", "similarity", "sentiment"]
+    snapshot = export.export_snapshot(str(output), sections)
+
+    assert snapshot["kpis"] == {
+        "Total Cards": 3,
+        "Total Retrievals": 6,
+        "Total Concepts": 2,
+    }
+    assert list(snapshot["sections"]) == ["Overview", "Sentiment"]
+    assert snapshot["errors"] == {"Similarity Graph": "RuntimeError: no model"}
+    assert scored == [["Happy", "Sad"]]
+
+    document = json.loads((output / "snapshot.json").read_text())
+    assert document["version"] == "v1"
+    assert set(document["sections"]["Overview"]) == {
+        "Cards Created Over Time",
+        "Concepts Over Time",
+        "Types",
+        "Popular Concepts",
+    }
+    assert "data" in document["sections"]["Sentiment"]["Average Mood Over Time"]
+
+    page = (output / "snapshot.html").read_text()
+    assert page.count("<h3>") == 5
+    # Plotly.js is inlined once
+    assert page.count("plotly.js v") == 1
+    assert "Not exported: RuntimeError: no model" in page
+
+    # The next export reuses the rolled up scores
+    export.build_snapshot(["sentiment"])
+    assert len(scored) == 1
@@ -3,11 +3,24 @@ Tests for the views.graphs module.
 
 """
 
+import networkx as nx
+import numpy as np
 import pandas as pd
 import pytest
 
 from src.utils import constants
-from src.views import make_bar_chart, make_line_chart, make_pie_chart
+from src.views import (
+    make_bar_chart,
+    make_line_chart,
+    make_pie_chart,
+    make_sentiment_over_time,
+)
+from src.views.graphs import (
+    density_image,
+    edge_coordinates,
+    visualize_graph,
+    visualize_tsne,
+)
 
 
 def test_make_bar_chart():
@@ -56,3 +69,87 @@ def test_make_line_chart():
     df = pd.DataFrame({"count": [1, 2], "target": ["2020-10-10", "2021-01-01"]})
     fig = make_line_chart(data=df, x="count", y="target")
     assert fig is not None
+
+
+def test_edge_coordinates():
+    node_xy = np.array([[0.0, 0.0], [1.0, 1.0], [2.0, 0.0]])
+    edges = np.array([[0, 1], [1, 2]])
+    edge_x, edge_y = edge_coordinates(node_xy, edges)
+    assert np.array_equal(edge_x, [0.0, 1.0, np.nan, 1.0, 2.0, np.nan], equal_nan=True)
+    assert np.array_equal(edge_y, [0.0, 1.0, np.nan, 1.0, 0.0, np.nan], equal_nan=True)
+
+
+def test_visualize_graph(tmp_path, mocker):
+    mocker.patch("utils.constants.CACHE_DIR", str(tmp_path))
+    G = nx.gnm_random_graph(150, 3000, seed=1)
+    concepts = [f"concept {i}" for i in range(150)]
+
+    fig = visualize_graph(G, concepts)
+    assert fig.data[0].type == "scattergl"
+    assert len(fig.data[0].x) == 3 * 3000
+    assert len(fig.data[1].x) == 150
+
+    fig = visualize_graph(G, concepts, highlight_node=0)
+    assert fig.data[0].type == "scatter"
+    assert len(fig.data[1].x) == G.degree(0) + 1
+    assert "concept 0" in fig.layout.title.text
+
+
+def test_visualize_graph_communities(tmp_path, mocker):
+    mocker.patch("utils.constants.CACHE_DIR", str(tmp_path))
+    G = nx.connected_caveman_graph(10, 30)
+    concepts = [f"concept {i}" for i in range(300)]
+
+    # Large graphs open as one super-node per community
+    fig = visualize_graph(G, concepts)
+    assert len(fig.data[1].x) == 10
+    assert "30 concepts" in fig.data[1].hovertext[0]
+
+    fig = visualize_graph(G, concepts, community=0)
+    assert len(fig.data[1].x) == 30
+    assert "Community 0" in fig.layout.title.text
+
+
+def test_density_image():
+    points = np.array([[0.1, 0.1], [0.1, 0.1], [0.9, 0.9]])
+    labels = np.array([0, 0, 1])
+    image = density_image(
+        points, labels, [(1.0, 0.0, 0.0), (0.0, 0.0, 1.0)], 2, ((0, 1), (0, 1))
+    )
+    assert image.shape == (2, 2, 3)
+    assert image[0, 0].tolist() == [255, 0, 0]
+    assert image[1, 1, 2] > 0 and image[1, 1, 0] == 0
+    assert image[0, 1].tolist() == [0, 0, 0]
+
+
+def test_visualize_tsne_raster(mocker):
+    mocker.patch("utils.constants.TSNE_RASTER_THRESHOLD", 100)
+    mocker.patch("utils.constants.TSNE_HOVER_POINTS", 50)
+    rng = np.random.default_rng(0)
+    points = rng.uniform(0, 10, (1000, 2))
+    labels = pd.Series(rng.integers(0, 3, 1000))
+    names = [f"concept {i}" for i in range(1000)]
+
+    fig = visualize_tsne(points, labels, names)
+    assert fig.layout.images[0].source.startswith("data:image/png")
+    assert all(trace.hovertext is None for trace in fig.data)
+
+    fig = visualize_tsne(points, labels, names, viewport=((0, 1), (0, 1)))
+    hover = fig.data[-1]
+    assert 0 < len(hover.x) <= 50
+    assert np.all(hover.x <= 1)
+
+
+def test_charts_from_rollups():
+    days = pd.date_range("2024-01-01", periods=3)
+    fig = make_line_chart(
+        y="createdAt",
+        x="_id",
+        aggregated=pd.DataFrame({"createdAt": days, "count": [1, 2, 3]}),
+    )
+    assert list(fig.data[0].y) == [1, 2, 3]
+
+    fig = make_sentiment_over_time(
+        daily=pd.DataFrame({"createdAt": days, "sentiment_score": [0.5, -1, 0]})
+    )
+    assert list(fig.data[0].y) == [0.5, -1, 0]
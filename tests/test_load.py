@@ -0,0 +1,51 @@
+"""
+Test the concurrent-session load test in benchmarks/load.py.
+
+"""
+
+import json
+import os
+import subprocess
+import sys
+from pathlib import Path
+
+LOAD_SCRIPT = Path(__file__).resolve().parents[1] / "benchmarks" / "load.py"
+
+
+def test_load_runs_concurrent_sessions(tmp_path):
+    # A fresh interpreter, as the harness patches the Streamlit runtime and
+    # Mongo client for the whole process
+    output = tmp_path / "load.json"
+    env = {
+        **os.environ,
+        "MONGO_URI": os.environ.get("MONGO_URI", "mongodb://x"),
+        "CACHE_DIR": str(tmp_path / "cache"),
+    }
+    subprocess.run(  # noqa: S603
+        [
+            sys.executable,
+            str(LOAD_SCRIPT),
+            "--sessions",
+            "2",
+            "--cards",
+            "50",
+            "--sections",
+            "Overview",
+            "Raw Data",
+            "--timeout",
+            "120",
+            "--output",
+            str(output),
+        ],
+        cwd=tmp_path,
+        env=env,
+        capture_output=True,
+        text=True,
+        check=True,
+        timeout=300,
+    )
+    report = json.loads(output.read_text())
+
+    assert report["errors"] == []
+    for section in ("(page load)", "Overview", "Raw Data"):
+        assert report["latency_s"][section]["complete"]["count"] == 2
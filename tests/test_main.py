@@ -0,0 +1,252 @@
+"""
+Test the startup path of the app in main.py.
+
+"""
+
+import os
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+import networkx as nx
+import numpy as np
+import pandas as pd
+import pytest
+from streamlit.testing.v1 import AppTest
+
+from src.models.rollups import RollupStore
+
+SRC_DIR = Path(__file__).resolve().parents[1] / "src"
+
+# Loaded by the stages needing them, never by `import main`
+HEAVY_MODULES = [
+    "torch",
+    "sentence_transformers",
+    "transformers",
+    "sklearn",
+    "networkx",
+    "plotly.express",
+]
+
+
+def test_import_main_does_not_load_heavy_modules():
+    # A fresh interpreter, as modules imported by other tests would leak in
+    probe = (
+        "import sys, main; "
+        f"print(','.join(m for m in {HEAVY_MODULES!r} if m in sys.modules))"
+    )
+    env = {**os.environ, "MONGO_URI": os.environ.get("MONGO_URI", "mongodb://x")}
+    result = subprocess.run(  # noqa: S603
+        [sys.executable, "-c", probe],
+        cwd=SRC_DIR,
+        env=env,
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    assert result.stdout.strip() == ""
+
+
+def test_tsne_extent():
+    from src.main import tsne_extent
+
+    assert tsne_extent(np.array([3.0, -1.0, 2.0])) == (-1.0, 3.0)
+    # Every point on one coordinate still gives a usable slider range
+    assert tsne_extent(np.full(5, 2.0)) == (1.0, 3.0)
+
+
+# A subheader or header only each section renders
+SECTION_MARKERS = {
+    "Overview": "Cards Created Over Time",
+    "Similarity Graph": "Concept Similarity Graph",
+    "Embedding Clusters": "Embedding Clustering",
+    "Sentiment": "Average Mood Over Time",
+    "Raw Data": "Raw Data",
+}
+
+
+def _app():
+    import main
+
+    main.main()
+
+
+@pytest.fixture
+def app(monkeypatch, tmp_path):
+    """
+    The dashboard on 60 cards, with stand-ins for Mongo and the NLP models.
+    """
+    import main
+
+    n = 60
+    timestamps = pd.date_range("2024-01-01", periods=n, freq="6h")
+    cards = pd.DataFrame(
+        {
+            "_id": [f"id{i}" for i in range(n)],
+            "name": [f"concept {i % 20}" for i in range(n)],
+            "flavorText": [f"text {i % 7}" for i in range(n)],
+            "type": ["Creature", "Instant", "Sorcery"] * (n // 3),
+            "retrievalCount": np.ones(n, dtype=int),
+            "createdAt": timestamps,
+            "updatedAt": timestamps,
+        }
+    )
+
+    def get_cards_df(columns=None):
+        df = cards[columns].copy() if columns else cards.copy()
+        df.attrs["version"] = f"apptest:{tmp_path.name}"
+        return df
+
+    rng = np.random.default_rng(0)
+    monkeypatch.setattr("utils.constants.CACHE_DIR", str(tmp_path))
+    monkeypatch.setattr(main, "get_cards_df", get_cards_df)
+    monkeypatch.setattr("controllers.explorer.get_cards_df", get_cards_df)
+    monkeypatch.setattr(main, "start_metrics_server", lambda: None)
+    monkeypatch.setattr(main, "load_sentiment_head", lambda: None)
+    store = RollupStore(str(tmp_path / "rollups"))
+    monkeypatch.setattr(main, "get_rollup_store", lambda: store)
+    monkeypatch.setattr(
+        main,
+        "compute_embeddings",
+        lambda names, *, version, _progress=None: (
+            rng.normal(size=(len(names), 8)),
+            None,
+        ),
+    )
+    monkeypatch.setattr(
+        main,
+        "build_similarity_graph",
+        lambda names, embeddings, **kwargs: nx.path_graph(len(names)),
+    )
+    monkeypatch.setattr(
+        main,
+        "cluster_concepts",
+        lambda embeddings, num_clusters, *, version: np.arange(len(embeddings)) % 3,
+    )
+    monkeypatch.setattr(
+        main,
+        "reduce_embeddings_tsne",
+        lambda embeddings, *, version: embeddings[:, :2],
+    )
+    monkeypatch.setattr(
+        main,
+        "analyze_sentiment_emotion",
+        lambda texts, *, version, _progress=None: [
+            {"label": "Positive", "score": 1.0} for _ in texts
+        ],
+    )
+    return AppTest.from_function(_app, default_timeout=60)
+
+
+def _headings(at: AppTest) -> set:
+    return {h.value for h in at.header} | {h.value for h in at.subheader}
+
+
+def _wait_for_jobs(at: AppTest) -> None:
+    deadline = time.monotonic() + 30
+    while at.get("progress") and time.monotonic() < deadline:
+        time.sleep(0.2)
+        at.run()
+
+
+def test_sections_render_on_demand(app):
+    at = app.run()
+    assert not at.exception
+    assert at.metric[0].value == "60"
+    # No section runs before one is opened
+    assert not _headings(at) & set(SECTION_MARKERS.values())
+
+    for section, marker in SECTION_MARKERS.items():
+        at.radio[0].set_value(section).run()
+        # Background jobs keep a section in progress across a few reruns
+        deadline = time.monotonic() + 30
+        while at.get("progress") and time.monotonic() < deadline:
+            time.sleep(0.2)
+            at.run()
+
+        assert not at.exception, section
+        assert not at.error, section
+        headings = _headings(at)
+        assert marker in headings, section
+        others = set(SECTION_MARKERS.values()) - {marker}
+        assert not headings & others, section
+
+
+def test_failed_stage_is_not_rerun(app, monkeypatch):
+    import main
+
+    calls = []
+
+    def failing_graph(names, embeddings, **kwargs):
+        calls.append(1)
+        raise RuntimeError("no model")
+
+    monkeypatch.setattr(main, "build_similarity_graph", failing_graph)
+    at = app.run()
+    at.radio[0].set_value("Similarity Graph").run()
+    _wait_for_jobs(at)
+
+    # The failure stays on screen across reruns without running the stage
+    for _ in range(3):
+        at.run()
+        assert "no model" in at.error[0].value
+    assert len(calls) == 1
+
+    next(b for b in at.button if b.label == "Retry").click().run()
+    _wait_for_jobs(at)
+    assert len(calls) == 2
+
+
+def test_cancelled_stage_is_not_resubmitted(app, monkeypatch):
+    import main
+
+    calls = []
+
+    def slow_graph(names, embeddings, _progress, **kwargs):
+        calls.append(1)
+        for step in range(600):
+            _progress(step / 600)
+            time.sleep(0.05)
+        return nx.path_graph(len(names))
+
+    monkeypatch.setattr(main, "build_similarity_graph", slow_graph)
+    at = app.run()
+    at.radio[0].set_value("Similarity Graph").run()
+    assert at.get("progress")
+
+    next(b for b in at.button if b.label == "Cancel").click().run()
+    # The reruns after the cancel neither restart the stage nor wait for it
+    for _ in range(3):
+        at.run()
+        assert not at.get("progress")
+    assert any(b.label == "Start" for b in at.button)
+    assert len(calls) == 1
+
+    next(b for b in at.button if b.label == "Start").click().run()
+    assert at.get("progress")
+    assert len(calls) == 2
+
+
+def test_finished_stage_is_not_resubmitted(app, monkeypatch):
+    from controllers.jobs import JobRunner
+
+    at = app.run()
+    at.radio[0].set_value("Similarity Graph").run()
+    _wait_for_jobs(at)
+    assert "Concept Similarity Graph" in _headings(at)
+
+    submitted = []
+    submit = JobRunner.submit
+    monkeypatch.setattr(
+        JobRunner,
+        "submit",
+        lambda self, key, *args, **kwargs: (
+            submitted.append(key) or submit(self, key, *args, **kwargs)
+        ),
+    )
+    # Searching reruns the section from the session's result
+    at.text_input[0].input("concept 1").run()
+    at.run()
+    assert not at.exception
+    assert submitted == []
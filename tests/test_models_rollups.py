@@ -0,0 +1,116 @@
+"""
+Test the functions in models.rollups.py.
+
+"""
+
+import numpy as np
+import pandas as pd
+
+from src.models.rollups import RollupStore
+
+
+def make_cards(ids, days):
+    timestamps = pd.to_datetime([f"2024-01-{day:02d} 12:00" for day in days])
+    return pd.DataFrame(
+        {
+            "_id": ids,
+            "createdAt": timestamps,
+            "updatedAt": timestamps,
+            "concept": [f"concept {i % 2}" for i in ids],
+        }
+    )
+
+
+def test_update_cards(tmp_path):
+    store = RollupStore(str(tmp_path))
+    assert store.update_cards(make_cards([1, 2, 3], [1, 1, 2])) == 3
+    # Known cards are not counted twice
+    assert store.update_cards(make_cards([1, 2, 3, 4], [1, 1, 2, 2])) == 1
+
+    cards = store.cards_per_day()
+    assert cards["count"].tolist() == [2, 2]
+    assert cards["createdAt"].tolist() == list(pd.date_range("2024-01-01", periods=2))
+    assert store.concepts_per_day()["count"].tolist() == [2, 2]
+
+    # Rollups persist across stores
+    reloaded = RollupStore(str(tmp_path))
+    pd.testing.assert_frame_equal(reloaded.cards_per_day(), cards)
+
+
+def test_update_cards_version(tmp_path):
+    store = RollupStore(str(tmp_path))
+    cards = make_cards([1], [1])
+    cards.attrs["version"] = "v1"
+    store.update_cards(cards)
+    store.rebuild()
+    assert store.update_cards(cards) == 1
+    assert store.update_cards(cards) == 0
+
+
+def test_update_sentiments(tmp_path):
+    store = RollupStore(str(tmp_path))
+    cards = make_cards([1, 2, 3], [1, 1, 3])
+    assert store.update_sentiments(cards["_id"], cards["createdAt"], [2, 0, -1]) == 3
+    assert store.update_sentiments(cards["_id"], cards["createdAt"], [2, 0, -1]) == 0
+    store.update_sentiments(cards["_id"], cards["createdAt"], [0, 0, 0], source="fast")
+
+    daily = store.sentiment_per_day()
+    assert np.array_equal(daily["sentiment_score"], [1.0, np.nan, -1.0], equal_nan=True)
+    fast = store.sentiment_per_day("fast")["sentiment_score"]
+    assert np.array_equal(fast, [0.0, np.nan, 0.0], equal_nan=True)
+
+    store.update_cards(cards)
+    assert store.daily()[["cards", "sentiment_count"]].to_numpy().tolist() == [
+        [2, 2],
+        [1, 1],
+    ]
+
+
+def test_changed_and_deleted_cards(tmp_path):
+    store = RollupStore(str(tmp_path))
+    cards = make_cards([1, 2, 3], [1, 1, 2])
+    store.update_cards(cards)
+    store.update_sentiments(cards["_id"], cards["createdAt"], [1, 1, 1])
+
+    # Card 2 moves to day 3, card 3 is deleted
+    cards = make_cards([1, 2], [1, 3])
+    assert store.update_cards(cards) == 2
+    created = store.cards_per_day()
+    assert created["createdAt"].dt.day.tolist() == [1, 3]
+    assert created["count"].tolist() == [1, 1]
+    updated = store.concepts_per_day()
+    assert updated["updatedAt"].dt.day.tolist() == [1, 3]
+    assert updated["count"].tolist() == [1, 1]
+    # The score of the deleted card is gone
+    assert store.daily()["sentiment_count"].sum() == 2
+
+    # Unchanged cards are not folded in again
+    assert store.update_cards(cards) == 0
+    assert not list(tmp_path.glob("*.tmp"))
+
+
+def test_sentiment_revisions(tmp_path):
+    store = RollupStore(str(tmp_path))
+    cards = make_cards([1, 2], [1, 1])
+    args = (cards["_id"], cards["createdAt"])
+    assert store.update_sentiments(*args, [2, 0], revisions=cards["updatedAt"]) == 2
+
+    # An updated card is scored again; its previous score is replaced
+    revisions = cards["updatedAt"] + pd.to_timedelta([0, 1], unit="h")
+    assert store.unscored(cards["_id"], revisions=revisions).tolist() == [False, True]
+    assert store.update_sentiments(*args, [2, -2], revisions=revisions) == 1
+    daily = store.sentiment_per_day()
+    assert daily["sentiment_score"].tolist() == [0.0]
+    assert store.daily()["sentiment_count"].tolist() == [2]
+
+
+def test_outdated_tables_are_rebuilt(tmp_path):
+    # Tables of the append-only rollups, without the ledger of each card
+    pd.DataFrame({"day": [19723], "cards": [5]}).to_parquet(tmp_path / "cards.parquet")
+    pd.DataFrame({"day": [19723], "concept": ["old"]}).to_parquet(
+        tmp_path / "concepts.parquet"
+    )
+    store = RollupStore(str(tmp_path))
+    assert store.cards_per_day().empty
+    store.update_cards(make_cards([1], [1]))
+    assert store.cards_per_day()["count"].tolist() == [1]
@@ -0,0 +1,89 @@
+"""
+Test the card snapshots in models.snapshot.py.
+
+"""
+
+import json
+import os
+
+import pandas as pd
+import pytest
+
+from src.models.snapshot import CardSnapshots, SnapshotError
+
+
+class ObjectId:
+    """
+    Stand-in for bson.ObjectId: a scalar Arrow has no type for.
+    """
+
+    def __init__(self, value):
+        self.value = value
+
+    def __str__(self):
+        return self.value
+
+
+def make_cards(version="v1", count=6):
+    df = pd.DataFrame(
+        {
+            "_id": [ObjectId(f"id{i}") for i in range(count)],
+            "name": ["Dragon", "Oracle"] * (count // 2),
+            "colors": [["R"], ["U", "G"]] * (count // 2),
+            "retrievalCount": range(count),
+            "createdAt": pd.date_range("2024-01-01", periods=count),
+        }
+    )
+    df.attrs["version"] = version
+    return df
+
+
+def test_write_and_load(tmp_path):
+    snapshots = CardSnapshots(str(tmp_path))
+    assert snapshots.load() is None
+
+    snapshots.write(make_cards())
+    df = snapshots.load()
+
+    assert df.attrs["version"] == "v1"
+    assert df["_id"].tolist() == [f"id{i}" for i in range(6)]
+    # Repetitive strings are dictionary-encoded
+    assert isinstance(df["name"].dtype, pd.CategoricalDtype)
+    assert df["name"].tolist() == ["Dragon", "Oracle"] * 3
+    assert df["_id"].dtype == object
+    assert df["colors"].iloc[1] == ["U", "G"]
+    assert df["createdAt"].iloc[0] == pd.Timestamp("2024-01-01")
+
+
+def test_column_pruning_and_max_age(tmp_path):
+    snapshots = CardSnapshots(str(tmp_path))
+    snapshots.write(make_cards())
+
+    df = snapshots.load(["name", "retrievalCount", "missing"])
+    assert list(df.columns) == ["name", "retrievalCount"]
+    assert df["retrievalCount"].sum() == 15
+
+    # Too old to be served
+    assert snapshots.load(max_age=-1) is None
+
+
+def test_versions_are_pruned(tmp_path, monkeypatch):
+    monkeypatch.setattr("src.models.snapshot.constants.CARDS_SNAPSHOT_KEEP", 2)
+    snapshots = CardSnapshots(str(tmp_path))
+    for i in range(4):
+        path = snapshots.write(make_cards(version=f"v{i}", count=2 * (i + 1)))
+        # Distinct modification times order the versions
+        os.utime(path, (i, i))
+
+    assert len(list(tmp_path.glob("cards-*.arrow"))) == 2
+    assert snapshots.load().attrs["version"] == "v3"
+    assert len(snapshots.load()) == 8
+    latest = json.loads((tmp_path / "latest.json").read_text())
+    assert latest["rows"] == 8
+
+
+def test_unstorable_columns(tmp_path):
+    df = make_cards()
+    df["mixed"] = [["a"], "b", 1, None, ["c"], "d"]
+    with pytest.raises(SnapshotError):
+        CardSnapshots(str(tmp_path)).write(df)
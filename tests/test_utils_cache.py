@@ -0,0 +1,108 @@
+"""
+Test the memory-bounded stage cache in utils.cache.py.
+
+"""
+
+import networkx as nx
+import numpy as np
+import pandas as pd
+import pytest
+
+from src.utils import cache as cache_module
+from src.utils.cache import MemoryCache, estimate_nbytes, memory_cached
+
+
+def test_estimate_nbytes():
+    array = np.zeros((100, 8), dtype=np.float32)
+    assert estimate_nbytes(array) == 3200
+
+    df = pd.DataFrame({"a": np.arange(1000), "b": ["text"] * 1000})
+    assert estimate_nbytes(df) == df.memory_usage(index=True, deep=True).sum()
+
+    # Shared objects are counted once
+    assert estimate_nbytes([array, array]) < 2 * array.nbytes
+
+    small, large = nx.path_graph(10), nx.path_graph(1000)
+    assert 0 < estimate_nbytes(small) < estimate_nbytes(large)
+
+
+def test_lru_eviction_within_budget():
+    cache = MemoryCache(max_bytes=1000, policy="lru")
+    cache.put("a", "a", nbytes=400)
+    cache.put("b", "b", nbytes=400)
+    assert cache.get("a") == "a"
+    cache.put("c", "c", nbytes=400)
+
+    # "b" was the least recently used
+    assert cache.get("b") is None
+    assert cache.get("a") == "a"
+    assert cache.get("c") == "c"
+    stats = cache.stats()
+    assert stats["bytes"] == 800
+    assert stats["evictions"] == 1
+    assert cache.evictions[-1]["reason"] == "budget"
+
+
+def test_greedydual_keeps_expensive_entries():
+    cache = MemoryCache(max_bytes=1000, policy="greedydual")
+    cache.put("expensive", 1, cost=10.0, nbytes=400)
+    cache.put("cheap", 2, cost=0.01, nbytes=400)
+    cache.put("new", 3, cost=1.0, nbytes=400)
+
+    assert cache.get("cheap") is None
+    assert cache.get("expensive") == 1
+    assert cache.get("new") == 3
+
+
+def test_expired_and_oversize_entries():
+    cache = MemoryCache(max_bytes=1000)
+    cache.put("old", 1, ttl=-1, nbytes=10)
+    assert cache.get("old") is None
+    assert not cache.put("huge", 2, nbytes=2000)
+    assert cache.get("huge") is None
+
+    reasons = list(cache.recent_evictions()["reason"])
+    assert reasons == ["oversize", "expired"]
+    # The metric the cache module reports to
+    evictions = cache_module.CACHE_EVICTIONS
+    assert evictions.value(cache="memory", reason="oversize") >= 1
+
+    with pytest.raises(ValueError):
+        MemoryCache(policy="fifo")
+
+
+def test_resident_bytes_per_cache():
+    # The registry the cache module reports to
+    from utils.metrics import registry
+
+    cache = MemoryCache(max_bytes=1000)
+    cache.put("plain", 1, nbytes=10)
+    cache.put("vectors", 2, cache="embeddings_test", nbytes=30)
+    registry.render()
+
+    # Each byte is reported once, under the cache holding it
+    resident = cache_module.CACHE_BYTES
+    assert resident.value(cache="memory") == 10
+    assert resident.value(cache="embeddings_test") == 30
+
+
+def test_memory_cached_decorator():
+    cache = MemoryCache(max_bytes=10**6)
+    calls = []
+
+    @memory_cached(copy=True, cache=cache)
+    def compute(_data, scale, *, version):
+        calls.append(version)
+        return _data * scale
+
+    data = np.ones(4)
+    first = compute(data, 2, version="v1")
+    first[:] = 0  # Copies: the cached value is untouched
+    np.testing.assert_array_equal(compute(np.zeros(4), 2, version="v1"), 2 * data)
+    compute(data, 2, version="v2")
+    assert calls == ["v1", "v2"]
+    assert cache.stats()["bytes_by_cache"] == {"compute": 64}
+
+    compute.clear()
+    compute(data, 2, version="v1")
+    assert calls == ["v1", "v2", "v1"]
@@ -0,0 +1,132 @@
+"""
+Test the metrics registry and endpoint in utils.metrics.py.
+
+"""
+
+import urllib.request
+
+import pytest
+
+from src.utils import metrics
+from src.utils.metrics import MetricsRegistry, record_span
+from src.utils.spans import cache_miss, start_collection, traced
+
+
+def test_counter_and_gauge_exposition():
+    registry = MetricsRegistry()
+    requests = registry.counter("requests_total", "Requests.", ("cache", "result"))
+    requests.inc(cache="embed", result="hit")
+    requests.inc(2, cache="embed", result="hit")
+    requests.inc(cache="embed", result="miss")
+    size = registry.gauge("resident_bytes", 'Bytes "held".', ("cache",))
+    size.set(1.5, cache='a"b')
+
+    text = registry.render()
+    assert "# TYPE requests_total counter" in text
+    assert 'requests_total{cache="embed",result="hit"} 3' in text
+    assert 'requests_total{cache="embed",result="miss"} 1' in text
+    assert '# HELP resident_bytes Bytes \\"held\\".' in text
+    assert 'resident_bytes{cache="a\\"b"} 1.5' in text
+
+    with pytest.raises(ValueError):
+        requests.inc(cache="embed")
+    with pytest.raises(ValueError):
+        requests.inc(-1, cache="embed", result="hit")
+    # Registering again returns the same family
+    assert registry.counter("requests_total", "", ("cache", "result")) is requests
+
+
+def test_histogram_exposition():
+    registry = MetricsRegistry()
+    latency = registry.histogram("latency_seconds", "Latency.", ("stage",), (0.1, 1))
+    for value in (0.05, 0.5, 2):
+        latency.observe(value, stage="embed")
+
+    lines = registry.render().splitlines()
+    assert 'latency_seconds_bucket{stage="embed",le="0.1"} 1' in lines
+    assert 'latency_seconds_bucket{stage="embed",le="1"} 2' in lines
+    assert 'latency_seconds_bucket{stage="embed",le="+Inf"} 3' in lines
+    assert 'latency_seconds_sum{stage="embed"} 2.55' in lines
+    assert 'latency_seconds_count{stage="embed"} 3' in lines
+
+
+def test_collectors_run_on_scrape():
+    registry = MetricsRegistry()
+    gauge = registry.gauge("entries", "Entries.")
+    entries = {"a": 1}
+    registry.add_collector(lambda: gauge.set(len(entries)))
+    assert "entries 1" in registry.render()
+    entries["b"] = 2
+    assert "entries 2" in registry.render()
+
+
+def test_record_span_updates_stage_metrics():
+    record = {
+        "name": "embed",
+        "function": "compute_embeddings",
+        "duration_ms": 200.0,
+        "depth": 0,
+        "size": 64,
+        "cached": False,
+    }
+    items = metrics.INFERENCE_ITEMS.value(stage="embed") or 0
+    misses = (
+        metrics.CACHE_REQUESTS.value(cache="compute_embeddings", result="miss") or 0
+    )
+    record_span(record)
+    record_span({**record, "cached": True, "duration_ms": 1.0})
+    record_span({"name": "Overview", "kind": "section", "duration_ms": 1.0})
+
+    assert metrics.INFERENCE_ITEMS.value(stage="embed") == items + 64
+    assert (
+        metrics.CACHE_REQUESTS.value(cache="compute_embeddings", result="miss")
+        == misses + 1
+    )
+    assert metrics.CACHE_REQUESTS.value(cache="compute_embeddings", result="hit")
+    assert "Overview" not in metrics.registry.render()
+
+
+def test_traced_cache_hits_and_misses():
+    cache = {}
+
+    def cached(func):
+        # Stand-in for st.cache_data, with its `clear` method
+        def wrapper(key):
+            if key not in cache:
+                cache[key] = func(key)
+            return cache[key]
+
+        wrapper.clear = cache.clear
+        return wrapper
+
+    @traced("embed", size="key")
+    @cached
+    @cache_miss
+    def embed(key):
+        return key * 2
+
+    collector = start_collection()
+    embed("ab")
+    embed("ab")
+    assert [record["cached"] for record in collector.records] == [False, True]
+
+
+def test_metrics_server(monkeypatch):
+    monkeypatch.setattr(metrics, "_server", None)
+    server = metrics.start_metrics_server(port=0)
+    try:
+        assert metrics.start_metrics_server(port=0) is server
+        url = f"http://127.0.0.1:{server.server_port}"
+        with urllib.request.urlopen(f"{url}/metrics") as response:  # noqa: S310
+            assert response.headers["Content-Type"].startswith("text/plain")
+            assert "nerdash_stage_duration_seconds" in response.read().decode()
+        with pytest.raises(urllib.error.HTTPError):
+            urllib.request.urlopen(f"{url}/other")  # noqa: S310
+    finally:
+        server.shutdown()
+        server.server_close()
+
+
+def test_metrics_server_disabled(monkeypatch):
+    monkeypatch.setattr(metrics, "_server", None)
+    assert metrics.start_metrics_server(port=None) is None
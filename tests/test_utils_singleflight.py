@@ -0,0 +1,140 @@
+"""
+Test the single-flight layer in utils.singleflight.py.
+
+"""
+
+import threading
+import time
+
+import numpy as np
+import pytest
+
+from src.utils.singleflight import SingleFlight, call_key, singleflight
+
+
+def run_concurrently(func, num_threads):
+    results = [None] * num_threads
+    errors = [None] * num_threads
+
+    def target(index):
+        try:
+            results[index] = func()
+        except Exception as e:
+            errors[index] = e
+
+    threads = [threading.Thread(target=target, args=(i,)) for i in range(num_threads)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join(5)
+    return results, errors
+
+
+def test_concurrent_calls_share_one_execution():
+    flight = SingleFlight("test")
+    executions = []
+
+    def slow():
+        executions.append(1)
+        time.sleep(0.2)
+        return object()
+
+    results, errors = run_concurrently(lambda: flight.do("key", slow), 8)
+    assert errors == [None] * 8
+    assert len(executions) == 1
+    assert all(result is results[0] for result in results)
+    assert flight.stats() == {
+        "calls": 8,
+        "executions": 1,
+        "coalesced": 7,
+        "in_flight": 0,
+    }
+
+
+def test_sequential_calls_run_again():
+    flight = SingleFlight("test")
+    assert flight.do("key", lambda: 1) == 1
+    assert flight.do("key", lambda: 2) == 2
+    assert flight.stats()["coalesced"] == 0
+
+
+def test_different_keys_run_separately():
+    flight = SingleFlight("test")
+    results, _ = run_concurrently(
+        lambda: flight.do(threading.current_thread().name, time.sleep, 0.05), 4
+    )
+    assert flight.stats()["executions"] == 4
+
+
+def test_exception_is_shared():
+    flight = SingleFlight("test")
+
+    def failing():
+        time.sleep(0.2)
+        raise ValueError("boom")
+
+    _, errors = run_concurrently(lambda: flight.do("key", failing), 4)
+    assert all(isinstance(error, ValueError) for error in errors)
+    assert flight.stats()["executions"] == 1
+    # The failure is not remembered
+    assert flight.do("key", lambda: "ok") == "ok"
+
+
+def test_call_key():
+    texts = ["a", "b"]
+    assert call_key({"texts": texts}) == call_key({"texts": ["a", "b"]})
+    assert call_key({"texts": texts}) != call_key({"texts": ["a", "c"]})
+    assert call_key({"texts": texts, "threshold": 0.5}) != call_key({"texts": texts})
+
+    embeddings = np.arange(6.0).reshape(3, 2)
+    assert call_key({"embeddings": embeddings}) == call_key(
+        {"embeddings": embeddings.copy()}
+    )
+    assert call_key({"embeddings": embeddings}) != call_key(
+        {"embeddings": embeddings + 1}
+    )
+
+    # Underscore parameters, such as data identified by a version argument
+    # and progress callbacks, are not part of the key
+    assert call_key({"_texts": texts, "version": "1"}) == call_key(
+        {"_texts": ["c"], "version": "1", "_progress": print}
+    )
+
+
+def test_singleflight_decorator():
+    calls = []
+
+    @singleflight(name="test_decorated")
+    def stage(texts, threshold=0.5):
+        calls.append(texts)
+        time.sleep(0.2)
+        return len(texts)
+
+    results, _ = run_concurrently(lambda: stage(["a", "b"], threshold=0.7), 5)
+    assert results == [2] * 5
+    assert len(calls) == 1
+    assert stage.flight.stats()["coalesced"] == 4
+    assert stage.__name__ == "stage"
+
+
+def test_singleflight_keys_by_parameter_name():
+    calls = []
+
+    @singleflight(name="test_versioned")
+    def stage(_texts, version=None):
+        calls.append(version)
+        time.sleep(0.2)
+        return version
+
+    # Positional underscore arguments are left out of the key too
+    results, _ = run_concurrently(lambda: stage(["a"] * 1000, "v1"), 3)
+    assert results == ["v1"] * 3
+    assert calls == ["v1"]
+    assert stage(["b"], version="v2") == "v2"
+
+
+def test_leader_error_does_not_leak_in_flight_entry():
+    flight = SingleFlight("test")
+    with pytest.raises(KeyError):
+        flight.do("key", {}.__getitem__, "missing")
+    assert flight.stats()["in_flight"] == 0
@@ -0,0 +1,123 @@
+"""
+Test the timing spans in utils.spans.py.
+
+"""
+
+import json
+import threading
+import time
+
+import pytest
+
+from src.utils import spans
+from src.utils.spans import current_collector, span, start_collection, traced
+
+
+@pytest.fixture(autouse=True)
+def span_log(tmp_path, monkeypatch):
+    path = tmp_path / "span_logs.jsonl"
+    monkeypatch.setattr(spans, "SPAN_LOG_PATH", str(path))
+    monkeypatch.setattr(spans, "_handler", None)
+    yield path
+    if spans._handler is not None:
+        spans._handler.close()
+        spans._span_logger.removeHandler(spans._handler)
+
+
+def test_span_records_duration_and_nesting():
+    collector = start_collection()
+    with span("Overview"):
+        with span("fetch", size=3) as fetch:
+            time.sleep(0.01)
+            fetch.set(db="ragDB")
+
+    inner, outer = collector.records
+    assert inner["name"] == "fetch"
+    assert inner["size"] == 3
+    assert inner["db"] == "ragDB"
+    assert inner["parent"] == "Overview"
+    assert inner["section"] == "Overview"
+    assert inner["depth"] == 1
+    assert inner["duration_ms"] >= 10
+    assert outer["depth"] == 0
+    assert outer["duration_ms"] >= inner["duration_ms"]
+
+
+def test_spans_are_logged_as_json(span_log):
+    start_collection()
+    with pytest.raises(ValueError):
+        with span("embed", size=2):
+            raise ValueError("boom")
+
+    record = json.loads(span_log.read_text().splitlines()[-1])
+    assert record["name"] == "embed"
+    assert record["size"] == 2
+    assert record["error"] == "ValueError"
+    assert "ts" in record
+
+
+def test_traced_records_input_size():
+    @traced("embed", size="texts")
+    def embed(texts, model="small"):
+        return [len(text) for text in texts]
+
+    collector = start_collection()
+    assert embed(["a", "bb", "ccc"]) == [1, 2, 3]
+    record = collector.records[-1]
+    assert record["name"] == "embed"
+    assert record["function"] == "embed"
+    assert record["size"] == 3
+
+
+def test_traced_defaults_to_result_size():
+    @traced("fetch")
+    def fetch():
+        return list(range(5))
+
+    collector = start_collection()
+    fetch()
+    assert collector.records[-1]["size"] == 5
+
+
+def test_collection_is_per_thread():
+    collector = start_collection()
+
+    def worker():
+        with span("sentiment"):
+            pass
+
+    thread = threading.Thread(target=worker)
+    thread.start()
+    thread.join()
+    assert collector.records == []
+    assert current_collector() is collector
+
+
+def test_breakdown_per_section():
+    collector = start_collection()
+    with span("Loading data"):
+        with span("fetch", size=10):
+            pass
+        with span("fetch", size=20):
+            pass
+        with span("dedup", size=30):
+            pass
+    with span("Overview"):
+        with span("figure"):
+            pass
+
+    breakdown = collector.breakdown()
+    rows = {(row.section, row.stage): row for row in breakdown.itertuples(index=False)}
+    assert set(rows) == {
+        ("Loading data", "fetch"),
+        ("Loading data", "dedup"),
+        ("Loading data", "total"),
+        ("Overview", "figure"),
+        ("Overview", "total"),
+    }
+    assert rows["Loading data", "fetch"].calls == 2
+    assert rows["Loading data", "fetch"].size == 30
+    assert (
+        rows["Loading data", "total"].seconds >= rows["Loading data", "fetch"].seconds
+    )
+    assert start_collection().breakdown().empty
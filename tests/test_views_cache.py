@@ -0,0 +1,50 @@
+"""
+Test the functions in views.cache.py.
+
+"""
+
+import pandas as pd
+import plotly.graph_objects as go
+
+from src.views.cache import FigureCache, dataset_version, fingerprint, memoize_figure
+
+
+def test_dataset_version():
+    df = pd.DataFrame({"a": [1, 2], "b": [["x"], ["y"]]})
+    assert dataset_version(df) == dataset_version(df.copy())
+    assert dataset_version(df) != dataset_version(df.iloc[::-1])
+
+    df.attrs["version"] = "v1"
+    assert dataset_version(df) == "v1"
+    # Slices keep the version but not the shape
+    assert fingerprint(df) != fingerprint(df[["a"]])
+
+
+def test_figure_cache():
+    cache = FigureCache(max_entries=1)
+    assert cache.get("a") is None
+    cache.put("a", go.Figure(go.Bar(y=[1, 2])))
+    assert list(cache.get("a").data[0].y) == [1, 2]
+    cache.put("b", go.Figure())
+    assert cache.get("a") is None
+    stats = cache.stats()
+    assert stats.pop("bytes") == len(go.Figure().to_json())
+    assert stats == {"hits": 1, "misses": 2, "evictions": 1, "entries": 1}
+
+
+def test_memoize_figure(mocker):
+    mocker.patch("src.views.cache.figure_cache", FigureCache())
+    calls = []
+
+    @memoize_figure
+    def make_chart(data, column=None):
+        calls.append(column)
+        return go.Figure(go.Bar(y=data[column]))
+
+    df = pd.DataFrame({"a": [1, 2], "b": [3, 4]})
+    make_chart(df, column="a")
+    fig = make_chart(df, column="a")
+    make_chart(df, column="b")
+
+    assert calls == ["a", "b"]
+    assert list(fig.data[0].y) == [1, 2]
@@ -0,0 +1,59 @@
+"""
+Test the functions in views.communities.py.
+
+"""
+
+import networkx as nx
+import numpy as np
+
+from src.utils.cache import MemoryCache
+from src.views.communities import (
+    coarsen_graph,
+    community_summary,
+    detect_communities,
+    label_propagation,
+)
+
+
+def test_label_propagation():
+    # Two 6-cliques joined by a single edge
+    edges = np.array(nx.barbell_graph(6, 0).edges())
+    labels = label_propagation(12, edges)
+    assert len(set(labels[:6])) == 1
+    assert len(set(labels[6:])) == 1
+    assert labels[0] != labels[6]
+
+    # Isolated nodes keep their own community
+    labels = label_propagation(3, np.empty((0, 2), dtype=int))
+    assert sorted(labels.tolist()) == [0, 1, 2]
+
+
+def test_coarsen_graph():
+    labels = np.array([0, 0, 1, 1, 2])
+    edges = np.array([[0, 1], [1, 2], [0, 3], [3, 4]])
+    sizes, super_edges, super_weights = coarsen_graph(labels, edges)
+    assert sizes.tolist() == [2, 2, 1]
+    assert super_edges.tolist() == [[0, 1], [1, 2]]
+    assert super_weights.tolist() == [2.0, 1.0]
+
+
+def test_community_summary():
+    labels = np.array([0, 0, 0, 1])
+    edges = np.array([[0, 1], [1, 2]])
+    summary = community_summary(labels, [0, 1, 2, 3], edges, "abcd", top_n=2)
+    assert summary["size"].tolist() == [3, 1]
+    assert summary["top_concepts"].tolist() == ["b, a", "d"]
+
+
+def test_detect_communities(mocker):
+    cache = mocker.patch("src.views.communities.memory_cache", MemoryCache(2**20))
+    G = nx.connected_caveman_graph(6, 20)
+    nodes, labels = detect_communities(G)
+    assert len(nodes) == len(labels) == 120
+    assert len(set(labels)) == 6
+    # Labels are ordered by decreasing community size
+    assert np.all(np.diff(np.bincount(labels)) <= 0)
+
+    # The same graph version reuses the labels
+    assert detect_communities(G)[1] is labels
+    assert cache.stats()["bytes_by_cache"]["communities"] == labels.nbytes
@@ -0,0 +1,52 @@
+"""
+Test the functions in views.downsample.py.
+
+"""
+
+import numpy as np
+import pandas as pd
+
+from src.views.downsample import downsample, lttb_indices, point_budget
+
+
+def test_point_budget():
+    assert point_budget(600) == 300
+    assert point_budget(1) == 3
+
+
+def test_lttb_indices():
+    x = np.arange(1000)
+    y = np.sin(x / 50.0)
+    y[437] = 10.0  # spike
+    y[601] = -10.0  # dip
+
+    indices = lttb_indices(x, y, 50)
+    assert len(indices) <= 52
+    assert indices[0] == 0 and indices[-1] == 999
+    assert {437, 601} <= set(indices)
+    assert np.all(np.diff(indices) > 0)
+
+    # Within budget nothing is dropped
+    assert len(lttb_indices(x[:40], y[:40], 50)) == 40
+
+
+def test_lttb_indices_gaps():
+    y = np.arange(100, dtype=float)
+    y[20:60] = np.nan
+    indices = lttb_indices(np.arange(100), y, 10)
+    # Gaps are kept, but never preferred over values
+    assert np.isnan(y[indices]).any()
+    assert np.isfinite(y[indices]).sum() >= 5
+
+
+def test_downsample():
+    df = pd.DataFrame(
+        {
+            "createdAt": pd.date_range("2015-01-01", periods=3650),
+            "count": np.random.default_rng(0).integers(0, 100, 3650),
+        }
+    )
+    result = downsample(df, "createdAt", "count", viewport_width=400)
+    assert len(result) <= point_budget(400) + 2
+    assert result["count"].max() == df["count"].max()
+    assert downsample(df.head(10), "createdAt", "count") is not None
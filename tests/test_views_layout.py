@@ -0,0 +1,92 @@
+"""
+Tests for the views.layout module.
+
+"""
+
+import networkx as nx
+import numpy as np
+
+from src.utils.cache import MemoryCache
+from src.views import layout
+from src.views.layout import (
+    force_layout,
+    force_layout_array,
+    global_layout,
+    graph_arrays,
+    graph_fingerprint,
+    refine_layout,
+)
+
+
+def test_graph_arrays():
+    G = nx.Graph()
+    G.add_edge("a", "b", weight=0.5)
+    G.add_edge("b", "c")
+    nodes, edges, weights = graph_arrays(G)
+    assert nodes == ["a", "b", "c"]
+    assert edges.tolist() == [[0, 1], [1, 2]]
+    assert weights.tolist() == [0.5, 1.0]
+
+
+def test_force_layout_array():
+    assert force_layout_array(0, np.empty((0, 2))).shape == (0, 2)
+    assert force_layout_array(1, np.empty((0, 2))).tolist() == [[0.0, 0.0]]
+
+    G = nx.connected_caveman_graph(20, 10)
+    _, edges, _ = graph_arrays(G)
+    pos = force_layout_array(G.number_of_nodes(), edges, iterations=30)
+    assert pos.shape == (200, 2)
+    assert np.isfinite(pos).all()
+    assert np.abs(pos).max() <= 1.0 + 1e-9
+
+    # Connected nodes end up closer than random pairs
+    edge_length = np.linalg.norm(pos[edges[:, 0]] - pos[edges[:, 1]], axis=1)
+    pairs = np.random.default_rng(0).integers(0, 200, (1000, 2))
+    pair_length = np.linalg.norm(pos[pairs[:, 0]] - pos[pairs[:, 1]], axis=1)
+    assert edge_length.mean() < pair_length.mean() / 2
+
+
+def test_force_layout_deterministic():
+    G = nx.gnm_random_graph(300, 600, seed=1)
+    first = force_layout(G, iterations=10, seed=7)
+    second = force_layout(G, iterations=10, seed=7)
+    assert first.keys() == set(G.nodes())
+    assert all(np.array_equal(first[n], second[n]) for n in G.nodes())
+
+
+def test_global_layout_cache(tmp_path, mocker):
+    mocker.patch("utils.constants.CACHE_DIR", str(tmp_path))
+    cache = mocker.patch.object(layout, "memory_cache", MemoryCache(2**20))
+    G = nx.connected_caveman_graph(15, 10)
+
+    first = global_layout(G)
+    assert len(list((tmp_path / "layouts").glob("*.npy"))) == 1
+
+    # The same graph reuses the stored positions
+    spy = mocker.spy(layout, "force_layout")
+    second = global_layout(G)
+    assert spy.call_count == 0
+    assert all(np.array_equal(first[n], second[n]) for n in G.nodes())
+    assert cache.stats()["bytes_by_cache"]["layout"] > 0
+
+    # A new graph version gets its own layout
+    G.add_edge(0, 75)
+    global_layout(G)
+    assert spy.call_count == 1
+    assert graph_fingerprint(G) != graph_fingerprint(nx.connected_caveman_graph(15, 10))
+
+
+def test_refine_layout():
+    G = nx.connected_caveman_graph(15, 10)
+    pos = force_layout(G, iterations=10)
+    sub = G.subgraph(range(20))
+
+    assert all(
+        np.array_equal(refine_layout(sub, pos, iterations=0)[n], pos[n]) for n in sub
+    )
+
+    refined = refine_layout(sub, pos, iterations=5)
+    start = np.array([pos[n] for n in sub])
+    end = np.array([refined[n] for n in sub])
+    assert np.allclose(end.mean(axis=0), start.mean(axis=0))
+    assert np.abs(end - start).max() < np.abs(start).max()